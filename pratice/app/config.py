@@ -8,3 +8,83 @@ PINECONE_ENV = os.getenv("PINECONE_ENV")
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
 
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+
+# Size of the shared Pinecone connection pool used by the long-lived RAG service
+PINECONE_POOL_THREADS = int(os.getenv("PINECONE_POOL_THREADS", "8"))
+
+# Threads available for blocking SDK calls (Pinecone queries, PDF parsing, file I/O)
+RAG_EXECUTOR_WORKERS = int(os.getenv("RAG_EXECUTOR_WORKERS", "16"))
+
+# Intent backend: "tiered" (local rules, Gemini below the threshold), "local" or "gemini"
+INTENT_BACKEND = os.getenv("INTENT_BACKEND", "tiered")
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.75"))
+
+# Query-embedding cache: in-memory LRU with TTL, plus an optional SQLite file shared by workers
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))
+EMBEDDING_CACHE_TTL = float(os.getenv("EMBEDDING_CACHE_TTL", "3600"))
+EMBEDDING_CACHE_DB = os.getenv("EMBEDDING_CACHE_DB", "")
+
+# Semantic answer cache for /ask: entries matched by cosine similarity of the question embedding
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))  # 0 disables the cache
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+
+# Vector backend: "pinecone" (remote) or "local" (memory-mapped NumPy index on disk)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "index")
+LOCAL_INDEX_DTYPE = os.getenv("LOCAL_INDEX_DTYPE", "float32")  # or float16 to halve the file
+LOCAL_INDEX_ANN_THRESHOLD = int(os.getenv("LOCAL_INDEX_ANN_THRESHOLD", "50000"))  # rows before IVF is built
+LOCAL_INDEX_NPROBE = int(os.getenv("LOCAL_INDEX_NPROBE", "8"))
+
+# Processes used to extract PDF text (0 = one per CPU, 1 = extract inline)
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "0")) or None
+
+# Background ingestion jobs processed concurrently by /upload workers
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+
+# Ingestion embedding pipeline: batch size, concurrent embedding requests, quota pacing, 429 retries
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_MAX_IN_FLIGHT = int(os.getenv("EMBED_MAX_IN_FLIGHT", "4"))
+EMBED_REQUESTS_PER_MINUTE = float(os.getenv("EMBED_REQUESTS_PER_MINUTE", "0"))  # 0 = no client-side limit
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+
+# Store of paid-for chunk embeddings, so rebuilds and re-uploads do not re-call the embedding API ("" disables);
+# embeddings no index uses are dropped once unused for the retention window (0 keeps them)
+EMBEDDING_STORE_DIR = os.getenv("EMBEDDING_STORE_DIR", "embeddings")
+EMBEDDING_STORE_RETENTION_SECONDS = float(os.getenv("EMBEDDING_STORE_RETENTION_SECONDS", "604800"))
+
+# Hybrid retrieval: BM25 index built at ingestion ("" disables), fused with dense results by weighted RRF
+LEXICAL_INDEX_DIR = os.getenv("LEXICAL_INDEX_DIR", "lexical")
+
+# Chunk deduplication at ingestion ("" disables it): exact copies are always dropped,
+# near copies when their estimated word-shingle Jaccard similarity reaches the threshold (1 = exact only)
+DEDUP_INDEX_DIR = os.getenv("DEDUP_INDEX_DIR", "dedup")
+DEDUP_NEAR_THRESHOLD = float(os.getenv("DEDUP_NEAR_THRESHOLD", "0.9"))
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "3"))
+HYBRID_DENSE_WEIGHT = float(os.getenv("HYBRID_DENSE_WEIGHT", "1.0"))
+HYBRID_LEXICAL_WEIGHT = float(os.getenv("HYBRID_LEXICAL_WEIGHT", "1.0"))
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))  # results taken from each retriever before fusion
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Estimated prompt tokens of retrieved context sent to Gemini (overlapping chunk text is deduplicated first)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+
+# Admission control: concurrent upstream calls, waiting /ask callers before 429, queue wait before 503, per-call timeout
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "64"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "10"))
+LLM_CALL_TIMEOUT = float(os.getenv("LLM_CALL_TIMEOUT", "60"))
+EMBED_MAX_CONCURRENCY = int(os.getenv("EMBED_MAX_CONCURRENCY", "8"))
+EMBED_MAX_QUEUE = int(os.getenv("EMBED_MAX_QUEUE", "128"))
+EMBED_QUEUE_TIMEOUT = float(os.getenv("EMBED_QUEUE_TIMEOUT", "5"))
+EMBED_CALL_TIMEOUT = float(os.getenv("EMBED_CALL_TIMEOUT", "30"))
+
+# POST /ask/batch: questions per request, and questions answered concurrently within one batch
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "256"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+# Namespaces (per-tenant / per-session uploads) idle this long are evicted (0 keeps them), checked every sweep interval
+NAMESPACE_TTL_SECONDS = float(os.getenv("NAMESPACE_TTL_SECONDS", "86400"))
+NAMESPACE_SWEEP_SECONDS = float(os.getenv("NAMESPACE_SWEEP_SECONDS", "600"))
+
+# Add a Server-Timing header (per-stage milliseconds) to every response
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", "false").lower() in ("1", "true", "yes")
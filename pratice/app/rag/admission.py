@@ -0,0 +1,272 @@
+# app/rag/admission.py
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from app.config import (
+    LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT, LLM_CALL_TIMEOUT,
+    EMBED_MAX_CONCURRENCY, EMBED_MAX_QUEUE, EMBED_QUEUE_TIMEOUT, EMBED_CALL_TIMEOUT
+)
+
+INTERACTIVE = 0  # /ask and friends
+BACKGROUND = 1  # ingestion
+
+
+class Overloaded(Exception):
+    """Admission was refused; the router turns this into an HTTP error with Retry-After."""
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueueFull(Overloaded):
+    status_code = 429
+
+
+class QueueTimeout(Overloaded):
+    status_code = 503
+
+
+class CallTimeout(Overloaded):
+    status_code = 503
+
+
+class _Waiter:
+    def __init__(self, loop=None):
+        self.loop = loop
+        self.future = loop.create_future() if loop else None
+        self.event = None if loop else threading.Event()
+        self.granted = False
+        self.abandoned = False
+
+    def grant(self):
+        # Called with the limiter lock held, possibly from another thread than the waiter's
+        self.granted = True
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._resolve)
+        else:
+            self.event.set()
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class PriorityLimiter:
+    """
+    Shared concurrency limit for one kind of upstream call, usable from the
+    event loop and from worker threads alike.
+
+    At most `limit` calls run at once; the rest wait in a priority queue where
+    interactive callers go before background ones. `reserve` slots are kept for
+    interactive callers, so ingestion can never take every slot. Interactive
+    callers are refused at once when `max_queue` of them are already waiting,
+    and after `queue_timeout` seconds in the queue; background callers just
+    wait. Calls made through run() are bounded by `call_timeout`.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, queue_timeout: float,
+                 call_timeout: float, reserve: int = None, sample_size: int = 1024):
+        self.name = name
+        self.limit = max(1, limit)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.call_timeout = call_timeout
+        self.reserve = min(self.limit - 1, max(0, self.limit // 4 if reserve is None else reserve))
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters = []  # heap of (priority, seq, waiter)
+        self._queued = [0, 0]  # waiting callers per priority
+        self._seq = itertools.count()
+        self._waits = deque(maxlen=sample_size)  # recent queue waits in seconds
+        self.stats = {
+            "admitted": 0, "rejected_queue_full": 0, "rejected_queue_timeout": 0,
+            "call_timeouts": 0, "max_wait_ms": 0.0,
+        }
+
+    # ---------- slot bookkeeping (lock held) ----------
+    def _free_for(self, priority: int) -> bool:
+        capacity = self.limit if priority == INTERACTIVE else self.limit - self.reserve
+        return self._active < capacity
+
+    def _try_enter(self, priority: int, loop=None):
+        """Take a slot now (returns None) or queue a waiter (returns it); raises QueueFull."""
+        # Don't overtake callers of equal or higher priority that are already queued
+        if self._free_for(priority) and not any(
+            entry[0] <= priority and not entry[2].abandoned for entry in self._waiters
+        ):
+            self._active += 1
+            self._admitted(0.0)
+            return None
+        if priority == INTERACTIVE and self._queued[INTERACTIVE] >= self.max_queue:
+            self.stats["rejected_queue_full"] += 1
+            raise QueueFull(f"{self.name} queue is full ({self.max_queue} waiting)")
+        waiter = _Waiter(loop)
+        heapq.heappush(self._waiters, (priority, next(self._seq), waiter))
+        self._queued[priority] += 1
+        return waiter
+
+    def _admitted(self, waited: float):
+        self.stats["admitted"] += 1
+        self._waits.append(waited)
+        self.stats["max_wait_ms"] = max(self.stats["max_wait_ms"], round(waited * 1000, 2))
+
+    def _dispatch(self):
+        """Hand free slots to the best waiters that fit."""
+        while self._waiters:
+            priority, _, waiter = self._waiters[0]
+            if waiter.abandoned:
+                heapq.heappop(self._waiters)
+                continue
+            if not self._free_for(priority):
+                return
+            heapq.heappop(self._waiters)
+            self._queued[priority] -= 1
+            self._active += 1
+            waiter.grant()
+
+    def _abandon(self, waiter, priority: int):
+        """A waiter gave up; returns True if it had been granted a slot meanwhile."""
+        if waiter.granted:
+            return True
+        waiter.abandoned = True
+        self._queued[priority] -= 1
+        return False
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+            self._dispatch()
+
+    def _timeout(self, priority: int):
+        return self.queue_timeout if priority == INTERACTIVE else None
+
+    # ---------- acquire ----------
+    def acquire(self, priority: int = INTERACTIVE):
+        """Blocking acquire for worker threads (e.g. the ingestion pipeline)."""
+        started = time.perf_counter()
+        with self._lock:
+            waiter = self._try_enter(priority)
+            if waiter is None:
+                return
+        waiter.event.wait(self._timeout(priority))
+        with self._lock:
+            if not waiter.granted:
+                self._abandon(waiter, priority)
+                self.stats["rejected_queue_timeout"] += 1
+                raise QueueTimeout(f"{self.name} queue wait exceeded {self.queue_timeout}s")
+            self._admitted(time.perf_counter() - started)
+
+    async def aacquire(self, priority: int = INTERACTIVE):
+        """Acquire from the event loop; waiting holds no thread."""
+        started = time.perf_counter()
+        with self._lock:
+            waiter = self._try_enter(priority, asyncio.get_running_loop())
+            if waiter is None:
+                return
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self._timeout(priority))
+        except asyncio.TimeoutError:
+            with self._lock:
+                granted = self._abandon(waiter, priority)
+                if not granted:
+                    self.stats["rejected_queue_timeout"] += 1
+            if not granted:
+                raise QueueTimeout(f"{self.name} queue wait exceeded {self.queue_timeout}s")
+            # Granted just as the wait timed out: keep the slot
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = self._abandon(waiter, priority)
+            if granted:
+                self.release()
+            raise
+        with self._lock:
+            self._admitted(time.perf_counter() - started)
+
+    # ---------- helpers ----------
+    @contextmanager
+    def slot(self, priority: int = INTERACTIVE):
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def aslot(self, priority: int = INTERACTIVE):
+        await self.aacquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def run(self, func, *args, priority: int = INTERACTIVE, **kwargs):
+        """Await func(*args, **kwargs) inside a slot, bounded by call_timeout."""
+        async with self.aslot(priority):
+            try:
+                return await asyncio.wait_for(func(*args, **kwargs), self.call_timeout)
+            except asyncio.TimeoutError:
+                self.stats["call_timeouts"] += 1
+                raise CallTimeout(f"{self.name} call exceeded {self.call_timeout}s")
+
+    async def stream(self, agen, priority: int = INTERACTIVE):
+        """Iterate an async generator inside a slot; call_timeout bounds the wait for each item."""
+        async with self.aslot(priority):
+            iterator = agen.__aiter__()
+            while True:
+                try:
+                    item = await asyncio.wait_for(iterator.__anext__(), self.call_timeout)
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError:
+                    self.stats["call_timeouts"] += 1
+                    raise CallTimeout(f"{self.name} stream stalled for {self.call_timeout}s")
+                yield item
+
+    def summary(self) -> dict:
+        with self._lock:
+            waits = sorted(self._waits)
+            active, queued = self._active, list(self._queued)
+
+        def percentile(p):
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))] * 1000, 2) if waits else 0.0
+
+        return {
+            **self.stats,
+            "limit": self.limit,
+            "active": active,
+            "queued_interactive": queued[INTERACTIVE],
+            "queued_background": queued[BACKGROUND],
+            "queue_wait_p50_ms": percentile(0.5),
+            "queue_wait_p95_ms": percentile(0.95),
+        }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name: str) -> PriorityLimiter:
+    """Process-wide limiter for "llm" (Gemini generate_content) or "embedding" calls."""
+    with _limiters_lock:
+        if name not in _limiters:
+            if name == "llm":
+                _limiters[name] = PriorityLimiter(
+                    "llm", LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT, LLM_CALL_TIMEOUT
+                )
+            elif name == "embedding":
+                _limiters[name] = PriorityLimiter(
+                    "embedding", EMBED_MAX_CONCURRENCY, EMBED_MAX_QUEUE, EMBED_QUEUE_TIMEOUT, EMBED_CALL_TIMEOUT
+                )
+            else:
+                raise ValueError(f"Unknown limiter: {name}")
+        return _limiters[name]
+
+
+def admission_stats() -> dict:
+    return {name: limiter.summary() for name, limiter in _limiters.items()}
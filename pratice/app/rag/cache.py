@@ -0,0 +1,206 @@
+# app/rag/cache.py
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+import numpy as np
+
+
+def normalize_query(text: str) -> str:
+    """Case- and whitespace-insensitive form used for cache keys."""
+    return re.sub(r"\s+", " ", text.strip().lower())
+
+
+class EmbeddingCache:
+    """
+    Query-embedding cache keyed by (embedding model, normalized query).
+
+    Tier 1 is an in-process LRU with TTL. Tier 2 is an optional SQLite file
+    that every uvicorn worker on the host can share.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 3600, db_path: str = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path or None
+        self._entries = OrderedDict()  # key -> (stored_at, vector)
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        if self.db_path:
+            self._init_db()
+
+    @property
+    def has_disk(self) -> bool:
+        return self.db_path is not None
+
+    def key(self, model: str, query: str) -> str:
+        return hashlib.sha256(f"{model}\x00{normalize_query(query)}".encode("utf-8")).hexdigest()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def _init_db(self):
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            # WAL lets several workers read while one writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings "
+                "(key TEXT PRIMARY KEY, stored_at REAL NOT NULL, vector BLOB NOT NULL)"
+            )
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - stored_at > self.ttl_seconds
+
+    def _get_memory(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry[0]):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def _put_memory(self, key: str, vector, stored_at: float):
+        with self._lock:
+            self._entries[key] = (stored_at, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def _get_disk(self, key: str):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT stored_at, vector FROM query_embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or self._expired(row[0]):
+            return None
+        vector = array("f")
+        vector.frombytes(row[1])
+        # Promote to memory with the original timestamp so the TTL still holds
+        self._put_memory(key, list(vector), row[0])
+        return list(vector)
+
+    def get(self, key: str):
+        """Return the cached vector or None."""
+        vector = self._get_memory(key)
+        if vector is not None:
+            self.stats["memory_hits"] += 1
+            return vector
+        if self.has_disk:
+            vector = self._get_disk(key)
+            if vector is not None:
+                self.stats["disk_hits"] += 1
+                return vector
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, key: str, vector):
+        stored_at = time.time()
+        vector = list(vector)
+        self._put_memory(key, vector, stored_at)
+        if self.has_disk:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (key, stored_at, vector) VALUES (?, ?, ?)",
+                    (key, stored_at, array("f", vector).tobytes())
+                )
+
+    def summary(self) -> dict:
+        lookups = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["misses"]
+        hits = lookups - self.stats["misses"]
+        return {
+            **self.stats,
+            "size": len(self._entries),
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class AnswerCache:
+    """
+    Semantic answer cache: returns a stored response when a new question's
+    embedding is within a cosine-similarity threshold of a cached question.
+
+    Entries are tied to a corpus version; when ingestion changes the index
+    the version moves and the whole cache is dropped.
+    """
+
+    def __init__(self, max_size: int = 512, threshold: float = 0.95):
+        self.max_size = max_size
+        self.threshold = threshold
+        self.version = None
+        self._entries = OrderedDict()  # entry id -> (unit vector, response)
+        self._matrix = None  # stacked unit vectors, rebuilt lazily after changes
+        self._matrix_ids = []
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def _unit(self, vector):
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def _check_version(self, version):
+        if version != self.version:
+            if self._entries:
+                self.stats["invalidations"] += 1
+            self._entries.clear()
+            self._matrix = None
+            self.version = version
+
+    def get(self, vector, version, accept=None):
+        """
+        Best cached response above the threshold, or None.
+        accept: optional predicate a cached response must satisfy (e.g. has intent).
+        """
+        with self._lock:
+            self._check_version(version)
+            if not self._entries:
+                self.stats["misses"] += 1
+                return None
+            if self._matrix is None:
+                self._matrix_ids = list(self._entries)
+                self._matrix = np.stack([self._entries[i][0] for i in self._matrix_ids])
+
+            scores = self._matrix @ self._unit(vector)
+            for idx in np.argsort(-scores):
+                if scores[idx] < self.threshold:
+                    break
+                entry_id = self._matrix_ids[idx]
+                response = self._entries[entry_id][1]
+                if accept is None or accept(response):
+                    self._entries.move_to_end(entry_id)
+                    self.stats["hits"] += 1
+                    return response
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, vector, version, response):
+        with self._lock:
+            self._check_version(version)
+            self._entries[self._next_id] = (self._unit(vector), response)
+            self._next_id += 1
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+            self._matrix = None
+
+    def summary(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "size": len(self._entries),
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+        }
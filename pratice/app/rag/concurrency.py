@@ -0,0 +1,33 @@
+# app/rag/concurrency.py
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from app.config import RAG_EXECUTOR_WORKERS
+
+_executor = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Process-wide bounded pool for SDK calls that have no native async API."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=RAG_EXECUTOR_WORKERS, thread_name_prefix="rag-io")
+    return _executor
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Run a blocking call on the bounded pool so it never stalls the event loop.
+    Like asyncio.to_thread, the call sees the caller's context variables (e.g. the request trace).
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_executor(), functools.partial(context.run, func, *args, **kwargs))
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,105 @@
+# app/rag/context.py
+import hashlib
+import math
+from typing import List, NamedTuple
+
+PASSAGE_SEPARATOR = "\n\n"
+MIN_PIECE_CHARS = 40  # leftover slivers of a partly covered chunk aren't worth a passage
+
+
+def estimate_tokens(text: str, chars_per_token: float = 4.0) -> int:
+    """Cheap local token estimate (Gemini averages about 4 characters per token on English text)."""
+    return math.ceil(len(text) / chars_per_token) if text else 0
+
+
+class PackedContext(NamedTuple):
+    text: str
+    tokens: int  # estimated prompt tokens of text
+    passages: int
+    dropped: int  # retrieved chunks left out as duplicates or over budget
+
+
+def _uncovered(start: int, end: int, covered):
+    """Parts of [start, end) not inside any of the covered intervals."""
+    pieces = [(start, end)]
+    for c_start, c_end in covered:
+        next_pieces = []
+        for p_start, p_end in pieces:
+            if c_end <= p_start or c_start >= p_end:
+                next_pieces.append((p_start, p_end))
+                continue
+            if p_start < c_start:
+                next_pieces.append((p_start, c_start))
+            if c_end < p_end:
+                next_pieces.append((c_end, p_end))
+        pieces = next_pieces
+    return pieces
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(" ", 0, max_chars)
+    return text[:cut if cut > max_chars // 2 else max_chars].rstrip()
+
+
+def pack_context(results, token_budget: int, chars_per_token: float = 4.0) -> PackedContext:
+    """
+    Assemble the prompt context from (Document, score) pairs.
+
+    Passages are taken in descending score order. Text a higher-scored chunk
+    already covered is dropped: chunks with source/offset metadata (see
+    app/rag_emb/chunking.py) keep only their uncovered spans, dropping slivers
+    shorter than MIN_PIECE_CHARS (a chunk nothing covers is kept whole); others are
+    deduplicated by exact content. Passages are added until token_budget is
+    reached; the last one is cut at a word boundary to fit.
+    """
+    covered = {}  # source -> [(start, end), ...] already in the context
+    seen = set()
+    passages: List[str] = []
+    tokens, dropped = 0, 0
+    separator_tokens = estimate_tokens(PASSAGE_SEPARATOR, chars_per_token)
+
+    for doc, _ in sorted(results, key=lambda pair: pair[1] if pair[1] is not None else 0.0, reverse=True):
+        text = doc.page_content.strip()
+        metadata = doc.metadata or {}
+        source, start, end = metadata.get("source"), metadata.get("start_offset"), metadata.get("end_offset")
+
+        if source is not None and start is not None and end is not None:
+            start, end = int(start), int(end)
+            spans = covered.setdefault(source, [])
+            uncovered = _uncovered(start, end, spans)
+            if uncovered == [(start, end)]:
+                # Nothing of it is in the context yet: kept whole, however short
+                pieces = [text]
+            else:
+                pieces = [
+                    text[p_start - start:p_end - start].strip()
+                    for p_start, p_end in uncovered
+                    if p_end - p_start >= MIN_PIECE_CHARS
+                ]
+            spans.append((start, end))
+        else:
+            digest = hashlib.sha256(" ".join(text.split()).encode("utf-8")).digest()
+            pieces = [] if digest in seen else [text]
+            seen.add(digest)
+
+        pieces = [piece for piece in pieces if piece]
+        if not pieces:
+            dropped += 1
+            continue
+
+        passage = " ... ".join(pieces)
+        cost = estimate_tokens(passage, chars_per_token) + (separator_tokens if passages else 0)
+        if tokens + cost > token_budget:
+            remaining = token_budget - tokens - (separator_tokens if passages else 0)
+            passage = _truncate(passage, int(remaining * chars_per_token)) if remaining > 0 else ""
+            if not passage:
+                dropped += 1
+                continue
+            cost = estimate_tokens(passage, chars_per_token) + (separator_tokens if passages else 0)
+        passages.append(passage)
+        tokens += cost
+
+    text = PASSAGE_SEPARATOR.join(passages)
+    return PackedContext(text, estimate_tokens(text, chars_per_token), len(passages), dropped)
@@ -0,0 +1,25 @@
+# app/rag/fusion.py
+
+
+def result_key(doc):
+    """Chunk ID when the store returns one, else the text, so both retrievers agree on identity."""
+    return getattr(doc, "id", None) or doc.page_content
+
+
+def reciprocal_rank_fusion(result_lists, weights, k: int = 3, rrf_k: int = 60):
+    """
+    Merge ranked [(Document, score), ...] lists with weighted reciprocal-rank fusion:
+    score(d) = sum over lists of weight / (rrf_k + rank). Raw scores are ignored, so
+    BM25 and cosine scores never need to be put on the same scale.
+    Returns the top-k (Document, fused score) pairs.
+    """
+    fused, docs = {}, {}
+    for results, weight in zip(result_lists, weights):
+        if not weight:
+            continue
+        for rank, (doc, _) in enumerate(results, start=1):
+            key = result_key(doc)
+            fused[key] = fused.get(key, 0.0) + weight / (rrf_k + rank)
+            docs.setdefault(key, doc)
+    ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+    return [(docs[key], score) for key, score in ranked]
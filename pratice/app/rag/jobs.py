@@ -0,0 +1,153 @@
+# app/rag/jobs.py
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from app.rag.concurrency import run_blocking
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_STAGES = ("pages", "chunks", "deduplicated", "embedded", "upserted")
+
+
+async def sweep_namespaces(embedder, jobs, ttl_seconds: float, interval_seconds: float):
+    """
+    Periodically evict namespaces (abandoned chat sessions) nobody uploaded to or
+    asked in for ttl_seconds, then compact the embedding store they leave behind.
+    """
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            evicted = await run_blocking(
+                embedder.evict_expired_namespaces, ttl_seconds, keep=jobs.active_namespaces()
+            )
+            for result in evicted:
+                logger.info("Evicted idle namespace %s (%d chunks)", result["namespace"], result["chunks_deleted"])
+            dropped = await run_blocking(embedder.compact_embedding_store)
+            if dropped:
+                logger.info("Compacted the embedding store (%d unused embeddings dropped)", dropped)
+        except Exception:
+            logger.exception("Namespace sweep failed")
+
+
+class IngestionJob:
+    def __init__(self, filename: str, content_hash: str, namespace: str = None):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.content_hash = content_hash
+        self.namespace = namespace
+        self.status = "queued"  # queued -> running -> succeeded | failed
+        self.progress = {stage: 0 for stage in PROGRESS_STAGES}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def report(self, stage: str, count: int):
+        # Called from the ingestion thread; plain int updates are safe to read from the loop
+        self.progress[stage] = self.progress.get(stage, 0) + count
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "namespace": self.namespace,
+            "status": self.status,
+            "progress": dict(self.progress),
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IngestionJobQueue:
+    """
+    Background ingestion: /upload enqueues a job and returns immediately,
+    a fixed pool of worker tasks runs PDFEmbedder.process_and_store off the
+    event loop. Identical uploads (same file name and content) that are still
+    queued or running share one job; uploads to different namespaces never do.
+    """
+
+    def __init__(self, embedder, workers: int = 2, max_jobs: int = 1000):
+        self.embedder = embedder
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self.jobs = OrderedDict()  # job id -> IngestionJob, oldest first
+        self._active = {}  # (namespace, filename, content hash) -> job
+        self._queue = asyncio.Queue()
+        self._tasks = []
+
+    async def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, filename: str, content_hash: str, namespace: str = None):
+        """Queue a job for <filename> in the namespace's data directory; returns (job, created)."""
+        key = (namespace, filename, content_hash)
+        existing = self._active.get(key)
+        if existing is not None and existing.active:
+            return existing, False
+
+        job = IngestionJob(filename, content_hash, namespace)
+        self.jobs[job.id] = job
+        self._active[key] = job
+        self._evict_finished()
+        self._queue.put_nowait(job)
+        return job, True
+
+    def get(self, job_id: str):
+        return self.jobs.get(job_id)
+
+    def active_namespaces(self) -> set:
+        """Namespaces with an ingestion still queued or running; they must not be evicted meanwhile."""
+        return {namespace for namespace, _, _ in self._active if namespace is not None}
+
+    def _evict_finished(self):
+        # Keep a bounded history; never drop jobs that are still in flight
+        for job_id in list(self.jobs):
+            if len(self.jobs) <= self.max_jobs:
+                break
+            if not self.jobs[job_id].active:
+                del self.jobs[job_id]
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                job.result = await run_blocking(
+                    self.embedder.process_and_store, files=[job.filename], progress=job.report,
+                    namespace=job.namespace
+                )
+                job.status = "succeeded"
+            except Exception as e:
+                logger.exception("Ingestion job %s for %s failed", job.id, job.filename)
+                job.status = "failed"
+                job.error = str(e)
+            finally:
+                job.finished_at = time.time()
+                self._active.pop((job.namespace, job.filename, job.content_hash), None)
+                self._queue.task_done()
+            if job.status == "failed" and not self._pending(job.namespace, job.filename):
+                try:
+                    await run_blocking(self.embedder.discard_upload, job.filename, job.content_hash, job.namespace)
+                except Exception:
+                    logger.exception("Could not remove %s after its ingestion failed", job.filename)
+
+    def _pending(self, namespace: str, filename: str) -> bool:
+        """Whether a newer upload of the same file is queued or running."""
+        return any(key[:2] == (namespace, filename) for key in self._active)
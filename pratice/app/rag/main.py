@@ -1,16 +1,110 @@
 # app/rag/main.py - Clean version with only necessary endpoints
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.rag.router import router
+from app.rag.concurrency import run_blocking, shutdown_executor
+from app.rag.metrics import REGISTRY, TimingMiddleware, record
+from app.config import INGEST_WORKERS, SERVER_TIMING_HEADER, NAMESPACE_TTL_SECONDS, NAMESPACE_SWEEP_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def build_service():
+    """Import the Gemini / LangChain / Pinecone SDKs, build the RAG service and open its connections."""
+    from app.rag.services import RAGService
+    service = RAGService()
+    service.warmup()
+    return service
+
+
+async def start_service(app: FastAPI):
+    """
+    Background startup: the heavy imports and warmup run on a worker thread
+    while the app already answers / (liveness). /ready (readiness) turns 200
+    once the service and ingestion workers are in place.
+    """
+    from app.rag.jobs import IngestionJobQueue, sweep_namespaces
+    started = time.perf_counter()
+    try:
+        service = await run_blocking(build_service)
+    except Exception as e:
+        logger.exception("RAG service failed to start")
+        app.state.startup = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+        return
+    jobs = IngestionJobQueue(service.pdf_embedder, workers=INGEST_WORKERS)
+    await jobs.start()
+    if NAMESPACE_TTL_SECONDS > 0:
+        app.state.namespace_sweeper = asyncio.create_task(sweep_namespaces(
+            service.pdf_embedder, jobs, NAMESPACE_TTL_SECONDS, NAMESPACE_SWEEP_SECONDS
+        ))
+    app.state.ingestion_jobs = jobs
+    app.state.rag_service = service
+    seconds = time.perf_counter() - started
+    record("startup", seconds)
+    app.state.startup = {"status": "ready", "seconds": round(seconds, 3)}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Build the RAG service once per process and share it across requests.
+    It is built in the background, so the worker accepts connections at once;
+    until it is ready, routes that need it answer 503 with Retry-After.
+    """
+    app.state.rag_service = None
+    app.state.ingestion_jobs = None
+    app.state.namespace_sweeper = None
+    app.state.startup = {"status": "starting"}
+    startup = asyncio.create_task(start_service(app))
+    yield
+    startup.cancel()
+    await asyncio.gather(startup, return_exceptions=True)
+    if app.state.namespace_sweeper is not None:
+        app.state.namespace_sweeper.cancel()
+        await asyncio.gather(app.state.namespace_sweeper, return_exceptions=True)
+    if app.state.ingestion_jobs is not None:
+        await app.state.ingestion_jobs.stop()
+    service, app.state.rag_service = app.state.rag_service, None
+    if service is not None:
+        service.pdf_embedder.close()
+    shutdown_executor()
+
 
 app = FastAPI(
     title="RAG API",
     description="RAG Application with JSON Responses",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Per-stage spans for every request; optional Server-Timing breakdown header
+app.add_middleware(TimingMiddleware, header=SERVER_TIMING_HEADER)
+
 # Include the router with only /upload and /ask endpoints
 app.include_router(router)
 
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus scrape endpoint: stage latency histograms, answer outcomes and error counters"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/")
 def root():
-    return {"message": "RAG API is running"}
\ No newline at end of file
+    """Liveness: answers as soon as the process serves requests, even while the service is starting"""
+    return {"message": "RAG API is running"}
+
+
+@app.get("/ready")
+def ready():
+    """Readiness: 200 once questions and uploads can be served, 503 while starting or after a failed startup"""
+    startup = getattr(app.state, "startup", None) or {"status": "starting"}
+    if getattr(app.state, "rag_service", None) is not None:
+        return {**startup, "status": "ready"}
+    headers = {"Retry-After": "1"} if startup["status"] == "starting" else None
+    return JSONResponse(status_code=503, content=startup, headers=headers)
\ No newline at end of file
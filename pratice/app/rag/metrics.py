@@ -0,0 +1,217 @@
+# app/rag/metrics.py
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Seconds; spans range from sub-millisecond lexical lookups to minute-long ingestions
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}  # label values -> count
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0.0)
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for key, value in values:
+            yield f"{self.name}{_labels(self.labelnames, key)} {value}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._values = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def count(self, **labels) -> int:
+        series = self._values.get(tuple(str(labels[name]) for name in self.labelnames))
+        return sum(series[:-1]) if series else 0
+
+    def render(self):
+        with self._lock:
+            values = sorted((key, list(series)) for key, series in self._values.items())
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for key, series in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, [('le', le)])} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {round(series[-1], 6)}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        return "\n".join(line for metric in self._metrics for line in metric.render()) + "\n"
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "rag_stage_duration_seconds", "Time spent in one pipeline stage (embedding, search, LLM call, ingestion step).",
+    ("stage",)
+))
+STAGE_ERRORS = REGISTRY.register(Counter(
+    "rag_stage_errors_total", "Pipeline stages that raised, by exception class.", ("stage", "error")
+))
+ANSWERS = REGISTRY.register(Counter(
+    "rag_answers_total", "Answers returned to clients, by outcome (ok, cache_hit, error, overloaded).", ("outcome",)
+))
+ANSWER_ERRORS = REGISTRY.register(Counter(
+    "rag_answer_errors_total", "Failed answers, by the exception class that caused them.", ("error",)
+))
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "rag_http_requests_total", "HTTP requests, by route and status code.", ("method", "route", "status")
+))
+HTTP_SECONDS = REGISTRY.register(Histogram(
+    "rag_http_request_duration_seconds", "Time until the response is complete (streams included).", ("method", "route")
+))
+
+
+# ---------- per-request spans ----------
+# Stage -> milliseconds for the request being handled; set by TimingMiddleware.
+# Tasks and run_blocking() calls started by the request inherit it.
+_trace = ContextVar("rag_trace", default=None)
+
+
+def start_trace() -> dict:
+    trace = {}
+    _trace.set(trace)
+    return trace
+
+
+def record(stage: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    trace = _trace.get()
+    if trace is not None:
+        trace[stage] = round(trace.get(stage, 0.0) + seconds * 1000, 2)
+
+
+def record_error(stage: str, error: BaseException):
+    STAGE_ERRORS.inc(stage=stage, error=type(error).__name__)
+
+
+@contextmanager
+def span(stage: str):
+    """Time a block as one stage; exceptions are counted by class and re-raised."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        record_error(stage, e)
+        raise
+    finally:
+        record(stage, time.perf_counter() - started)
+
+
+def record_answer(result: dict):
+    """Count one answer sent to a client (a RAGResponse dict)."""
+    if (result.get("intent") or {}).get("I") == "error":
+        outcome = "error"
+    else:
+        outcome = "cache_hit" if result.get("cache_hit") else "ok"
+    ANSWERS.inc(outcome=outcome)
+
+
+def record_overloaded(error: BaseException):
+    ANSWERS.inc(outcome="overloaded")
+    ANSWER_ERRORS.inc(error=type(error).__name__)
+
+
+def server_timing(trace: dict) -> str:
+    """Server-Timing header value, e.g. "embed_query;dur=41.2, generation;dur=812.0"."""
+    return ", ".join(f"{stage};dur={ms}" for stage, ms in trace.items())
+
+
+class TimingMiddleware:
+    """
+    ASGI middleware: per-route request counts and durations, and (with
+    header=True) a Server-Timing response header listing the stages the
+    request went through. For streaming responses the header can only carry
+    the stages finished before the first byte.
+    """
+
+    def __init__(self, app, header: bool = False):
+        self.app = app
+        self.header = header
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = start_trace()
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if self.header:
+                    headers = list(message.get("headers", []))
+                    total = round((time.perf_counter() - started) * 1000, 2)
+                    value = server_timing({**trace, "total": total})
+                    headers.append((b"server-timing", value.encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope.get("method", "")
+            HTTP_REQUESTS.inc(method=method, route=route, status=status["code"])
+            HTTP_SECONDS.observe(time.perf_counter() - started, method=method, route=route)
@@ -0,0 +1,21 @@
+# app/rag/options.py
+from typing import Optional
+from pydantic import BaseModel
+from app.config import RETRIEVAL_K, HYBRID_DENSE_WEIGHT, HYBRID_LEXICAL_WEIGHT
+
+
+class RetrievalOptions(BaseModel):
+    """Per-request retrieval knobs; the defaults come from config."""
+    k: int = RETRIEVAL_K
+    dense_weight: float = HYBRID_DENSE_WEIGHT
+    lexical_weight: float = HYBRID_LEXICAL_WEIGHT
+    filter: Optional[dict] = None  # metadata filter, e.g. {"sources": {"$in": ["cv.pdf"]}}
+    namespace: Optional[str] = None  # tenant / session partition to search; None is the shared corpus
+
+    @property
+    def weights(self):
+        return self.dense_weight, self.lexical_weight
+
+    def cacheable(self) -> bool:
+        # Cached answers were produced with the default retrieval settings
+        return self == RetrievalOptions()
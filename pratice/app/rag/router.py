@@ -1,53 +1,260 @@
 # app/rag/router.py - Fixed version with only 2 endpoints
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from pydantic import BaseModel
-import shutil
+from fastapi import APIRouter, Depends, Request, Response, UploadFile, File, Form, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Optional
+import hashlib
+import json
+import math
 import os
+import uuid
+from app.rag.admission import Overloaded, admission_stats
+from app.config import BATCH_MAX_QUESTIONS
+from app.rag.concurrency import run_blocking
+from app.rag.metrics import record_answer, record_overloaded
+from app.rag.options import RetrievalOptions
+from app.rag_emb.manifest import NAMESPACE_PATTERN, document_id, valid_namespace
 
 router = APIRouter()
 
 
 # Request models
-class QuestionRequest(BaseModel):
+class AskOptions(BaseModel):
+    include_intent: bool = True  # False skips the intent LLM call entirely
+    source: Optional[str] = None  # restrict retrieval to one uploaded PDF
+    document_id: Optional[str] = None  # or to one document, by the ID /upload returned
+    namespace: Optional[str] = Field(None, pattern=NAMESPACE_PATTERN)  # search only this tenant's / session's uploads
+    k: Optional[int] = Field(None, ge=1, le=20)  # chunks given to the LLM
+    dense_weight: Optional[float] = Field(None, ge=0)  # hybrid fusion weights
+    lexical_weight: Optional[float] = Field(None, ge=0)
+
+    def retrieval_options(self):
+        overrides = {
+            name: value for name, value in
+            (("k", self.k), ("dense_weight", self.dense_weight), ("lexical_weight", self.lexical_weight))
+            if value is not None
+        }
+        # A deduplicated chunk lists every file that uses it, so match any of them
+        scope = {"sources": self.source, "document_ids": self.document_id}
+        if any(scope.values()):
+            overrides["filter"] = {key: {"$in": [value]} for key, value in scope.items() if value}
+        if self.namespace:
+            overrides["namespace"] = self.namespace
+        return RetrievalOptions(**overrides)
+
+
+class QuestionRequest(AskOptions):
     question: str
 
 
-@router.post("/upload")
-async def upload_pdf(file: UploadFile = File(...)):
-    """Upload and process PDF file for RAG"""
+class BatchQuestionRequest(AskOptions):
+    questions: List[str] = Field(..., min_length=1, max_length=BATCH_MAX_QUESTIONS)
+
+
+def save_upload(fileobj, path, block_size=1 << 20):
+    """
+    Stream an upload to disk, hashing it on the way.
+    Written to a temp file and renamed, so concurrent uploads and running
+    ingestions never see a half-written PDF.
+    """
+    digest = hashlib.sha256()
+    tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+    try:
+        with open(tmp_path, "wb") as buffer:
+            for block in iter(lambda: fileobj.read(block_size), b""):
+                digest.update(block)
+                buffer.write(block)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return digest.hexdigest()
+
+
+def overloaded_error(e: Overloaded) -> HTTPException:
+    """429 when the queue is full, 503 when waiting or the call timed out; clients should back off."""
+    record_overloaded(e)
+    return HTTPException(
+        status_code=e.status_code, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))}
+    )
+
+
+# Dependencies - the service is built once, in the background, by the lifespan hook (see main.py)
+def not_ready() -> HTTPException:
+    return HTTPException(status_code=503, detail="RAG service is starting", headers={"Retry-After": "1"})
+
+
+def get_rag_service(request: Request):
+    service = getattr(request.app.state, "rag_service", None)
+    if service is None:
+        raise not_ready()
+    return service
+
+
+def get_embedder(request: Request):
+    return get_rag_service(request).pdf_embedder
+
+
+def get_ingestion_jobs(request: Request):
+    jobs = getattr(request.app.state, "ingestion_jobs", None)
+    if jobs is None:
+        raise not_ready()
+    return jobs
+
+
+def check_namespace(request: AskOptions, service):
+    """404 for a namespace nothing was uploaded to; otherwise mark it as in use so it is not evicted as idle."""
+    if request.namespace:
+        if not service.pdf_embedder.has_namespace(request.namespace):
+            raise HTTPException(status_code=404, detail=f"Unknown namespace: {request.namespace}")
+        service.pdf_embedder.touch_namespace(request.namespace)
+
+
+@router.post("/upload", status_code=202)
+async def upload_pdf(file: UploadFile = File(...), namespace: Optional[str] = Form(None),
+                     embedder=Depends(get_embedder), jobs=Depends(get_ingestion_jobs)):
+    """
+    Upload a PDF and queue it for ingestion; poll /upload/{job_id} for progress.
+    With a namespace (tenant or chat session) the PDF is only searchable by /ask
+    requests in that namespace, and is deleted with DELETE /namespaces/{namespace}.
+    """
+    namespace = namespace or None
+    if not valid_namespace(namespace):
+        raise HTTPException(status_code=422, detail="namespace may only contain letters, digits, '_' and '-' (max 64)")
+    # Only PDFs are ingested; this also keeps uploads from overwriting the ingestion manifest
+    filename = os.path.basename(file.filename or "")
+    if not filename.endswith(".pdf"):
+        raise HTTPException(status_code=422, detail="Only .pdf files can be uploaded")
     try:
         # Ensure data directory exists
-        os.makedirs("data", exist_ok=True)
+        data_dir = embedder.namespace_dir(namespace)
+        os.makedirs(data_dir, exist_ok=True)
 
-        path = f"data/{file.filename}"
-        with open(path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        path = os.path.join(data_dir, filename)
+        content_hash = await run_blocking(save_upload, file.file, path)
 
-        # Process with embedder
-        from app.rag_emb.embedding import PDFEmbedder
-        embedder = PDFEmbedder()
-        embedder.process_and_store()
+        job, created = jobs.submit(filename, content_hash, namespace)
 
         return {
-            "message": f"{file.filename} uploaded and processed successfully.",
-            "filename": file.filename,
-            "status": "success"
+            "message": f"{filename} uploaded and queued for processing.",
+            "filename": filename,
+            "namespace": namespace,
+            "document_id": document_id(filename, namespace),
+            "status": job.status,
+            "job_id": job.id,
+            "deduplicated": not created
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/upload/{job_id}")
+def upload_status(job_id: str, jobs=Depends(get_ingestion_jobs)):
+    """Status and per-stage progress (pages, chunks, embedded, upserted) of an ingestion job"""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    return job.to_dict()
+
+
+@router.delete("/namespaces/{namespace}")
+async def evict_namespace(namespace: str, embedder=Depends(get_embedder), jobs=Depends(get_ingestion_jobs)):
+    """Delete a namespace's PDFs and every chunk indexed for them, e.g. when a chat session ends"""
+    if not valid_namespace(namespace) or not embedder.has_namespace(namespace):
+        raise HTTPException(status_code=404, detail=f"Unknown namespace: {namespace}")
+    if namespace in jobs.active_namespaces():
+        raise HTTPException(status_code=409, detail="An upload to this namespace is still being ingested")
+    return await run_blocking(embedder.evict_namespace, namespace)
+
+
 @router.post("/ask")
-async def ask_question(request: QuestionRequest):
+async def ask_question(request: QuestionRequest, response: Response, service=Depends(get_rag_service)):
     """Ask a question and get structured RAG response"""
+    check_namespace(request, service)
     try:
-        from app.rag.services import RAGService
-        service = RAGService()
-        result = service.answer_with_context(request.question)
+        result = await service.aanswer_with_context(
+            request.question, include_intent=request.include_intent, retrieval=request.retrieval_options()
+        )
+        response.headers["X-Cache"] = "HIT" if getattr(result, "cache_hit", False) else "MISS"
 
         # Convert to dict if it's a pydantic model
         if hasattr(result, 'dict'):
-            return result.dict()
+            result = result.dict()
+        record_answer(result)
         return result
+    except Overloaded as e:
+        raise overloaded_error(e)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/ask/stream")
+async def ask_question_stream(request: QuestionRequest, service=Depends(get_rag_service)):
+    """Ask a question and receive retrieval results, answer tokens and intent as Server-Sent Events"""
+    check_namespace(request, service)
+    events = service.astream_answer(
+        request.question, include_intent=request.include_intent, retrieval=request.retrieval_options()
+    )
+    # Admission happens before the first event, so an overloaded server can still answer 429 / 503
+    try:
+        first = await events.__anext__()
+    except Overloaded as e:
+        raise overloaded_error(e)
+
+    def sse(event, data):
+        if event in ("done", "error"):
+            record_answer(data)
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    async def event_stream():
+        yield sse(*first)
+        async for event, data in events:
+            yield sse(event, data)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Stop reverse proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/ask/batch")
+async def ask_batch(request: BatchQuestionRequest, service=Depends(get_rag_service)):
+    """
+    Answer a list of questions; results stream back as NDJSON, one line per question in order:
+    {"index": i, "question": ..., "result": <same shape as /ask>} or {"index": i, "question": ..., "error": {...}}
+    """
+    check_namespace(request, service)
+    async def lines():
+        async for index, result in service.abatch_answer(
+            request.questions, include_intent=request.include_intent, retrieval=request.retrieval_options()
+        ):
+            item = {"index": index, "question": request.questions[index]}
+            if isinstance(result, Overloaded):
+                record_overloaded(result)
+                item["error"] = {"status_code": result.status_code, "detail": str(result)}
+            else:
+                item["result"] = result.dict()
+                record_answer(item["result"])
+            yield json.dumps(item) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+
+@router.get("/intent/stats")
+def intent_stats(service=Depends(get_rag_service)):
+    """How many questions the local intent classifier answered vs. sent to Gemini"""
+    return service.intent_stats()
+
+
+@router.get("/admission/stats")
+def admission_stats_route():
+    """Active / queued upstream calls, rejections and queue wait times per limiter"""
+    return admission_stats()
+
+
+@router.get("/cache/stats")
+def cache_stats(service=Depends(get_rag_service)):
+    """Hit rates of the query caches"""
+    return service.cache_stats()
@@ -1,9 +1,24 @@
 # app/rag/services.py
-from app.rag.vector import VectorHandler, LLMHandler
-from app.rag_emb.embedding import PDFEmbedder
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
+from app.rag.admission import Overloaded
+from app.rag.cache import AnswerCache, normalize_query
+from app.rag.singleflight import SingleFlight
+from app.config import (
+    ANSWER_CACHE_SIZE, ANSWER_CACHE_THRESHOLD, INTENT_BACKEND, INTENT_CONFIDENCE_THRESHOLD,
+    CONTEXT_TOKEN_BUDGET, BATCH_CONCURRENCY
+)
+from app.rag.options import RetrievalOptions
+from app.rag.context import pack_context
+from app.rag.metrics import ANSWER_ERRORS
+import asyncio
 import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+NO_CONTEXT_ANSWER = "I don't have any relevant information in my knowledge base to answer this question."
 
 
 # Pydantic models for structured responses
@@ -17,83 +32,567 @@ class IntentClassification(BaseModel):
 class SourceDocument(BaseModel):
     content: str
     relevance_score: Optional[float] = None
-    page_number: Optional[int] = None
+    page_number: Optional[int] = None  # first page the chunk comes from
+    page_end: Optional[int] = None
+    source: Optional[str] = None  # PDF file name
+
+
+def to_source_documents(results) -> List[SourceDocument]:
+    """(Document, score) pairs from the vector store -> SourceDocument list."""
+    sources = []
+    for doc, score in results:
+        metadata = doc.metadata
+        # Pinecone hands numeric metadata back as floats
+        page_start, page_end = metadata.get("page_start"), metadata.get("page_end")
+        sources.append(SourceDocument(
+            content=doc.page_content,
+            relevance_score=score,
+            page_number=int(page_start) if page_start is not None else None,
+            page_end=int(page_end) if page_end is not None else None,
+            source=metadata.get("source")
+        ))
+    return sources
 
 
 class RAGResponse(BaseModel):
     question: str
     answer: str
-    intent: IntentClassification
+    intent: Optional[IntentClassification] = None  # None when the caller skipped intent
+    cache_hit: bool = False  # True when served from the semantic answer cache
+    sources: List[SourceDocument] = []  # retrieved chunks the answer was grounded on
+    retrieval_ms: Dict[str, float] = {}  # latency per retriever (dense_ms, lexical_ms)
+    context_tokens: int = 0  # estimated prompt tokens of the packed context
+    coalesced: bool = False  # True when this request shared an identical in-flight request's result
+
+
+def parse_intent_json(intent_json: str) -> IntentClassification:
+    try:
+        # Clean the response - remove any formatting
+        clean_json = intent_json.strip()
+        if clean_json.startswith('```json'):
+            clean_json = clean_json.replace('```json', '').replace('```', '')
+
+        # Parse the JSON response
+        intent_data = json.loads(clean_json)
+        return IntentClassification(**intent_data)
+    except (json.JSONDecodeError, TypeError) as e:
+        # Fallback if JSON parsing fails
+        return IntentClassification(
+            Q="Query about information",
+            R="Request for answer",
+            I="general_query",
+            Reason=f"JSON parsing failed, using fallback classification"
+        )
+
+
+# Intent backends - every backend exposes classify / aclassify returning IntentClassification
+class GeminiIntentClassifier:
+    """Full LLM round trip; accurate but costs one generate_content call per question."""
+
+    def __init__(self, llm_handler):
+        self.llm_handler = llm_handler
+
+    def classify(self, user_message: str) -> IntentClassification:
+        return parse_intent_json(self.llm_handler.classify_intent(user_message))
+
+    async def aclassify(self, user_message: str) -> IntentClassification:
+        return parse_intent_json(await self.llm_handler.aclassify_intent(user_message))
+
+
+class IntentRule:
+    def __init__(self, intent: str, query: str, request: str, patterns: List[str]):
+        self.intent = intent
+        self.query = query
+        self.request = request
+        self.patterns = [re.compile(p, re.IGNORECASE) for p in patterns]
+
+    def matches(self, text: str) -> List[str]:
+        return [p.pattern for p in self.patterns if p.search(text)]
+
+
+# Intents that cover most of the traffic on a CV / document corpus
+DEFAULT_INTENT_RULES = [
+    IntentRule("greeting", "Greeting or small talk", "Acknowledge the user",
+               [r"^\s*(hi|hello|hey|good (morning|afternoon|evening))\b", r"^\s*(thanks|thank you)\b"]),
+    IntentRule("summary_request", "Overview of a document or candidate", "Summarize the document",
+               [r"\bsummar(y|ise|ize)\b", r"\boverview\b", r"\btell me about\b", r"\bwho is\b"]),
+    IntentRule("skills_query", "Question about skills or technologies", "List the relevant skills",
+               [r"\bskills?\b", r"\btechnolog(y|ies)\b", r"\bprogramming languages?\b",
+                r"\b(proficient|experienced) (in|with)\b", r"\btech stack\b"]),
+    IntentRule("experience_query", "Question about work history", "Describe the work experience",
+               [r"\b(work|job|professional) (experience|history)\b", r"\bexperience\b",
+                r"\bworked (at|for|on)\b", r"\byears of\b", r"\bprevious (role|job|employer)s?\b"]),
+    IntentRule("education_query", "Question about education", "Describe the education background",
+               [r"\beducation\b", r"\bdegree\b", r"\buniversity\b", r"\bstud(y|ied)\b",
+                r"\b(bachelor|master|phd)\b"]),
+    IntentRule("contact_query", "Question about contact details", "Provide the contact information",
+               [r"\bcontact\b", r"\bemail\b", r"\bphone\b", r"\blinkedin\b", r"\baddress\b"]),
+    IntentRule("project_query", "Question about projects", "Describe the projects",
+               [r"\bprojects?\b", r"\bportfolio\b", r"\bbuilt\b"]),
+    IntentRule("comparison", "Comparison between candidates or documents", "Compare the items",
+               [r"\bcompare\b", r"\bcomparison\b", r"\bbetter\b", r"\bvs\.?\b", r"\bdifference\b"]),
+]
+
+
+class RuleIntentClassifier:
+    """
+    Cheap local classifier: regex rules over the question text.
+    Returns an intent with a confidence score; no network call.
+    """
+
+    def __init__(self, rules: List[IntentRule] = None):
+        self.rules = rules or DEFAULT_INTENT_RULES
+
+    def score(self, user_message: str):
+        """Return (IntentClassification or None, confidence in [0, 1])."""
+        scored = []
+        for rule in self.rules:
+            matched = rule.matches(user_message)
+            if matched:
+                scored.append((len(matched), rule, matched))
+        if not scored:
+            return None, 0.0
+
+        scored.sort(key=lambda item: item[0], reverse=True)
+        best_hits, rule, matched = scored[0]
+        runner_up = scored[1][0] if len(scored) > 1 else 0
+
+        # One pattern is a decent signal, each extra pattern adds more; a close
+        # second intent means the question is ambiguous and lowers confidence.
+        confidence = min(0.99, 0.8 + 0.1 * (best_hits - 1))
+        if runner_up:
+            confidence -= 0.15 * runner_up / best_hits
+        confidence = max(0.0, round(confidence, 3))
+
+        intent = IntentClassification(
+            Q=rule.query,
+            R=rule.request,
+            I=rule.intent,
+            Reason=f"Local rule match on {', '.join(matched)} (confidence {confidence})"
+        )
+        return intent, confidence
+
+    def classify(self, user_message: str) -> IntentClassification:
+        intent, _ = self.score(user_message)
+        return intent or IntentClassification(
+            Q="Query about information",
+            R="Request for answer",
+            I="general_query",
+            Reason="No local rule matched"
+        )
+
+    async def aclassify(self, user_message: str) -> IntentClassification:
+        return self.classify(user_message)
+
+
+class TieredIntentClassifier:
+    """Local rules first; fall back to the LLM only when confidence is below the threshold."""
+
+    def __init__(self, local, fallback, threshold: float = INTENT_CONFIDENCE_THRESHOLD):
+        self.local = local
+        self.fallback = fallback
+        self.threshold = threshold
+        self.stats = {"local_hits": 0, "llm_fallbacks": 0, "degraded": 0}
+
+    def _local(self, user_message: str):
+        intent, confidence = self.local.score(user_message)
+        if intent is not None and confidence >= self.threshold:
+            self.stats["local_hits"] += 1
+            return intent
+        self.stats["llm_fallbacks"] += 1
+        return None
+
+    def classify(self, user_message: str) -> IntentClassification:
+        intent = self._local(user_message)
+        if intent is not None:
+            return intent
+        try:
+            return self.fallback.classify(user_message)
+        except Overloaded:
+            self.stats["degraded"] += 1
+            return self.local.classify(user_message)
+
+    async def aclassify(self, user_message: str) -> IntentClassification:
+        intent = self._local(user_message)
+        if intent is not None:
+            return intent
+        try:
+            return await self.fallback.aclassify(user_message)
+        except Overloaded:
+            # Under load a low-confidence local guess beats failing the whole request
+            self.stats["degraded"] += 1
+            return self.local.classify(user_message)
+
+
+def build_intent_classifier(llm_handler, backend: str = INTENT_BACKEND):
+    """Pick the intent backend from config: "tiered" (default), "local" or "gemini"."""
+    if backend == "gemini":
+        return GeminiIntentClassifier(llm_handler)
+    if backend == "local":
+        return RuleIntentClassifier()
+    return TieredIntentClassifier(RuleIntentClassifier(), GeminiIntentClassifier(llm_handler))
 
 
 class RAGService:
-    def __init__(self):
+    """
+    Long-lived service: built once per process in the FastAPI lifespan hook
+    and shared by every request, so clients and connection pools are reused.
+    """
+
+    def __init__(self, data_dir="data"):
+        # The Gemini / LangChain SDKs load here, during background startup, not when the app is imported
+        from app.rag.vector import VectorHandler, LLMHandler
+        from app.rag_emb.embedding import PDFEmbedder
+
         # Create embedder instance and ensure embedding is initialized
-        self.pdf_embedder = PDFEmbedder()
+        self.pdf_embedder = PDFEmbedder(data_dir=data_dir)
 
-        # Pass the initialized embedding to vector handler
-        self.vector_handler = VectorHandler(self.pdf_embedder.embedding)
+        # Pass the initialized embedding and the configured store (pooled Pinecone index or local) to vector handler
+        self.vector_handler = VectorHandler(
+            self.pdf_embedder.embedding,
+            vector_store=self.pdf_embedder.get_vector_store(),
+            lexical_index=self.pdf_embedder.get_lexical_index(),
+            scoped_stores=self.pdf_embedder.scoped_stores
+        )
         self.llm_handler = LLMHandler()
+        self.intent_classifier = build_intent_classifier(self.llm_handler)
+        self.answer_cache = AnswerCache(max_size=ANSWER_CACHE_SIZE, threshold=ANSWER_CACHE_THRESHOLD)
+        self.single_flight = SingleFlight()
+
+    def warmup(self):
+        """Pay TLS handshakes, lazy client setup and the extraction pool at startup instead of on first use."""
+        for handler in (self.vector_handler, self.llm_handler, self.pdf_embedder.extractor):
+            try:
+                handler.warmup()
+            except Exception as e:
+                # Warmup is best effort; a failure here must not stop the API from starting
+                logger.warning("Warmup of %s failed: %s", type(handler).__name__, e)
 
     def run_intent_classification(self, user_message: str) -> IntentClassification:
         """Classify the intent of the user message and return structured data."""
-        intent_json = self.llm_handler.classify_intent(user_message)
+        return self.intent_classifier.classify(user_message)
 
-        try:
-            # Clean the response - remove any formatting
-            clean_json = intent_json.strip()
-            if clean_json.startswith('```json'):
-                clean_json = clean_json.replace('```json', '').replace('```', '')
-
-            # Parse the JSON response
-            intent_data = json.loads(clean_json)
-            return IntentClassification(**intent_data)
-        except (json.JSONDecodeError, TypeError) as e:
-            # Fallback if JSON parsing fails
-            return IntentClassification(
-                Q="Query about information",
-                R="Request for answer",
-                I="general_query",
-                Reason=f"JSON parsing failed, using fallback classification"
+    async def arun_intent_classification(self, user_message: str) -> IntentClassification:
+        return await self.intent_classifier.aclassify(user_message)
+
+    def intent_stats(self) -> dict:
+        """Local-hit / LLM-fallback counters (empty for single-tier backends)."""
+        return dict(getattr(self.intent_classifier, "stats", {}))
+
+    def cache_stats(self) -> dict:
+        return {
+            "query_embeddings": self.vector_handler.embedding_cache.summary(),
+            "answers": self.answer_cache.summary(),
+            "coalescing": self.single_flight.summary(),
+        }
+
+    def _cached_answer(self, user_message: str, vector, version, include_intent: bool) -> Optional[RAGResponse]:
+        # A cached answer without intent can't serve a request that wants one
+        cached = self.answer_cache.get(
+            vector, version, accept=lambda r: r.intent is not None or not include_intent
+        )
+        if cached is None:
+            return None
+        return cached.copy(update={
+            "question": user_message,
+            "intent": cached.intent if include_intent else None,
+            "cache_hit": True,
+            "retrieval_ms": {},
+            "context_tokens": 0,
+        })
+
+    def _store_answer(self, vector, version, response: RAGResponse):
+        # Never cache failures
+        if response.intent is not None and response.intent.I == "error":
+            return
+        self.answer_cache.put(vector, version, response)
+
+    def _error_response(self, user_message: str, e: Exception) -> RAGResponse:
+        # The exception only survives as text in the answer, so count its class here
+        ANSWER_ERRORS.inc(error=type(e).__name__)
+        # Return error response in proper format
+        return RAGResponse(
+            question=user_message,
+            answer=f"Sorry, there was an error processing your question: {str(e)}",
+            intent=IntentClassification(
+                Q="Error occurred",
+                R="System error",
+                I="error",
+                Reason="Exception during processing"
             )
+        )
 
-    def answer_with_context(self, user_message: str) -> RAGResponse:
+    def answer_with_context(self, user_message: str, include_intent: bool = True,
+                            retrieval: Optional[RetrievalOptions] = None) -> RAGResponse:
+        """
+        Answer from the semantic cache when a close enough question was already answered.
+        retrieval: optional per-request k, fusion weights and metadata filter;
+                   non-default settings bypass the answer cache.
+        """
+        retrieval = retrieval or RetrievalOptions()
+        if not self.answer_cache.enabled or not retrieval.cacheable():
+            return self._answer_with_context(user_message, include_intent, retrieval)
+        try:
+            vector = self.vector_handler.embed_query(user_message)
+        except Overloaded:
+            # Surfaced as 429 / 503 by the router instead of a generic error answer
+            raise
+        except Exception as e:
+            return self._error_response(user_message, e)
+
+        version = self.pdf_embedder.corpus_version()
+        cached = self._cached_answer(user_message, vector, version, include_intent)
+        if cached is not None:
+            return cached
+
+        response = self._answer_with_context(user_message, include_intent)
+        self._store_answer(vector, version, response)
+        return response
+
+    async def aanswer_with_context(self, user_message: str, include_intent: bool = True,
+                                   retrieval: Optional[RetrievalOptions] = None) -> RAGResponse:
+        """
+        Async version of answer_with_context. Concurrent requests for the same
+        normalized question with the same options share one pipeline run.
+        """
+        retrieval = retrieval or RetrievalOptions()
+        key = (normalize_query(user_message), include_intent, json.dumps(retrieval.dict(), sort_keys=True))
+        response, shared = await self.single_flight.do(
+            key, lambda: self._acached_answer_with_context(user_message, include_intent, retrieval)
+        )
+        if shared:
+            return response.copy(update={"question": user_message, "coalesced": True})
+        return response
+
+    async def abatch_answer(self, questions: List[str], include_intent: bool = True,
+                            retrieval: Optional[RetrievalOptions] = None, concurrency: int = BATCH_CONCURRENCY):
+        """
+        Answer many questions; yields (index, RAGResponse or Overloaded) in question order.
+
+        All query embeddings are fetched up front in one batched request, which
+        fills the query-embedding cache, so each item's search skips its own
+        embedding round trip. Items then run through aanswer_with_context
+        (answer cache, coalescing, admission control) with at most
+        `concurrency` in flight, and each result is yielded as soon as it and
+        every earlier one are done.
+        """
+        try:
+            await self.vector_handler.aembed_queries(questions)
+        except Exception as e:
+            # Not fatal: every item falls back to embedding its own question
+            logger.warning("Batched query embedding failed, embedding per question: %s", e)
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def answer(question):
+            async with semaphore:
+                return await self.aanswer_with_context(question, include_intent, retrieval)
+
+        tasks = [asyncio.create_task(answer(question)) for question in questions]
+        try:
+            for index, task in enumerate(tasks):
+                try:
+                    yield index, await task
+                except Overloaded as e:
+                    yield index, e
+        finally:
+            # The client went away: don't keep generating answers nobody will read
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _acached_answer_with_context(self, user_message: str, include_intent: bool,
+                                           retrieval: RetrievalOptions) -> RAGResponse:
+        if not self.answer_cache.enabled or not retrieval.cacheable():
+            return await self._aanswer_with_context(user_message, include_intent, retrieval)
+        try:
+            # Same embedding the search will use; the second lookup hits the embedding cache
+            vector = await self.vector_handler.aembed_query(user_message)
+        except Overloaded:
+            # Surfaced as 429 / 503 by the router instead of a generic error answer
+            raise
+        except Exception as e:
+            return self._error_response(user_message, e)
+
+        version = self.pdf_embedder.corpus_version()
+        cached = self._cached_answer(user_message, vector, version, include_intent)
+        if cached is not None:
+            return cached
+
+        response = await self._aanswer_with_context(user_message, include_intent)
+        self._store_answer(vector, version, response)
+        return response
+
+    def _answer_with_context(self, user_message: str, include_intent: bool = True,
+                             retrieval: Optional[RetrievalOptions] = None) -> RAGResponse:
         """
         1. Retrieve context from Pinecone
         2. Pass it to Gemini LLM with structured output
         3. Return the structured RAG response
         """
+        retrieval = retrieval or RetrievalOptions()
+        timings = {}
         try:
             # Retrieve top documents
-            docs = self.vector_handler.search(user_message, k=3)
-
-            context = "\n\n".join([doc.page_content for doc in docs])
+            results = self.vector_handler.search_with_score(
+                user_message, k=retrieval.k, filter=retrieval.filter, weights=retrieval.weights, timings=timings,
+                namespace=retrieval.namespace
+            )
+            packed = pack_context(results, CONTEXT_TOKEN_BUDGET)
+            context = packed.text
             has_context = bool(context.strip())
 
             # Get intent classification
-            intent = self.run_intent_classification(user_message)
+            intent = self.run_intent_classification(user_message) if include_intent else None
 
             if has_context:
                 # Generate structured answer using context
                 answer = self.llm_handler.generate_structured_answer(user_message, context)
             else:
-                answer = "I don't have any relevant information in my knowledge base to answer this question."
+                answer = NO_CONTEXT_ANSWER
 
             return RAGResponse(
                 question=user_message,
                 answer=answer,
-                intent=intent
+                intent=intent,
+                sources=to_source_documents(results),
+                retrieval_ms=timings,
+                context_tokens=packed.tokens
             )
 
+        except Overloaded:
+            # Surfaced as 429 / 503 by the router instead of a generic error answer
+            raise
         except Exception as e:
-            # Return error response in proper format
+            return self._error_response(user_message, e)
+
+    async def _aanswer_with_context(self, user_message: str, include_intent: bool = True,
+                                    retrieval: Optional[RetrievalOptions] = None) -> RAGResponse:
+        """
+        Async version of _answer_with_context, scheduled as a small dependency graph:
+
+            search ──> generate_structured_answer
+            classify_intent (independent, runs alongside both)
+
+        so the intent round trip overlaps retrieval + generation instead of adding to them.
+        """
+        retrieval = retrieval or RetrievalOptions()
+        timings = {}
+        intent_task = None
+        try:
+            if include_intent:
+                intent_task = asyncio.create_task(self.arun_intent_classification(user_message))
+
+            results = await self.vector_handler.asearch_with_score(
+                user_message, k=retrieval.k, filter=retrieval.filter, weights=retrieval.weights, timings=timings,
+                namespace=retrieval.namespace
+            )
+            packed = pack_context(results, CONTEXT_TOKEN_BUDGET)
+            context = packed.text
+            has_context = bool(context.strip())
+
+            if has_context:
+                answer = await self.llm_handler.agenerate_structured_answer(user_message, context)
+            else:
+                answer = NO_CONTEXT_ANSWER
+
+            intent = await intent_task if intent_task else None
+
             return RAGResponse(
                 question=user_message,
-                answer=f"Sorry, there was an error processing your question: {str(e)}",
-                intent=IntentClassification(
-                    Q="Error occurred",
-                    R="System error",
-                    I="error",
-                    Reason="Exception during processing"
-                )
-            )
\ No newline at end of file
+                answer=answer,
+                intent=intent,
+                sources=to_source_documents(results),
+                retrieval_ms=timings,
+                context_tokens=packed.tokens
+            )
+
+        except Overloaded:
+            # Surfaced as 429 / 503 by the router instead of a generic error answer
+            raise
+        except Exception as e:
+            return self._error_response(user_message, e)
+        finally:
+            # Don't leave an orphaned Gemini call running if another stage failed
+            if intent_task and not intent_task.done():
+                intent_task.cancel()
+
+    async def astream_answer(self, user_message: str, include_intent: bool = True,
+                             retrieval: Optional[RetrievalOptions] = None):
+        """
+        Streaming variant of aanswer_with_context. Yields (event, data) pairs:
+
+            retrieval  {"sources": [SourceDocument, ...]}
+            token      {"text": "..."}            (repeated, as Gemini generates)
+            intent     IntentClassification       (as soon as it is ready)
+            done       RAGResponse                (full answer, same shape as /ask)
+            error      RAGResponse                (instead of done)
+        """
+        retrieval = retrieval or RetrievalOptions()
+        timings = {}
+        intent_task = None
+        intent_sent = False
+        streaming = False  # once events are out, overload can only be reported in-stream
+        try:
+            vector = await self.vector_handler.aembed_query(user_message)
+            version = self.pdf_embedder.corpus_version()
+            if self.answer_cache.enabled and retrieval.cacheable():
+                cached = self._cached_answer(user_message, vector, version, include_intent)
+                if cached is not None:
+                    yield "token", {"text": cached.answer}
+                    if cached.intent is not None:
+                        yield "intent", cached.intent.dict()
+                    yield "done", cached.dict()
+                    return
+
+            if include_intent:
+                intent_task = asyncio.create_task(self.arun_intent_classification(user_message))
+
+            results = await self.vector_handler.asearch_with_score(
+                user_message, k=retrieval.k, filter=retrieval.filter, weights=retrieval.weights, timings=timings,
+                namespace=retrieval.namespace
+            )
+            sources = to_source_documents(results)
+            packed = pack_context(results, CONTEXT_TOKEN_BUDGET)
+            yield "retrieval", {
+                "sources": [source.dict() for source in sources],
+                "retrieval_ms": timings,
+                "context_tokens": packed.tokens
+            }
+            streaming = True
+
+            context = packed.text
+            pieces = []
+            if context.strip():
+                async for piece in self.llm_handler.astream_structured_answer(user_message, context):
+                    pieces.append(piece)
+                    yield "token", {"text": piece}
+                    if intent_task and not intent_sent and intent_task.done():
+                        intent_sent = True
+                        yield "intent", intent_task.result().dict()
+            else:
+                pieces.append(NO_CONTEXT_ANSWER)
+                yield "token", {"text": NO_CONTEXT_ANSWER}
+
+            intent = await intent_task if intent_task else None
+            if intent is not None and not intent_sent:
+                yield "intent", intent.dict()
+
+            response = RAGResponse(
+                question=user_message, answer="".join(pieces).strip(), intent=intent,
+                sources=sources, retrieval_ms=timings, context_tokens=packed.tokens
+            )
+            if self.answer_cache.enabled and retrieval.cacheable():
+                self._store_answer(vector, version, response)
+            yield "done", response.dict()
+
+        except Overloaded as e:
+            # Before the first event the router can still answer 429 / 503
+            if not streaming:
+                raise
+            yield "error", self._error_response(user_message, e).dict()
+        except Exception as e:
+            yield "error", self._error_response(user_message, e).dict()
+        finally:
+            if intent_task and not intent_task.done():
+                intent_task.cancel()
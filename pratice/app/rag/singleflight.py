@@ -0,0 +1,44 @@
+# app/rag/singleflight.py
+import asyncio
+
+
+class SingleFlight:
+    """
+    Request coalescing for the async path: while a call for a key is in
+    flight, further calls with the same key await the same task instead of
+    starting their own. Waiters only hold an awaiting coroutine, never a
+    thread. The shared task is shielded, so a caller that disconnects does
+    not cancel the work the others are waiting for.
+    """
+
+    def __init__(self):
+        self._in_flight = {}  # key -> asyncio.Task
+        self.stats = {"executions": 0, "coalesced": 0}
+
+    def __len__(self):
+        return len(self._in_flight)
+
+    async def do(self, key, func):
+        """Run func() (a coroutine function) once per key at a time; returns (result, shared)."""
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(task), True
+
+        task = asyncio.ensure_future(func())
+        self._in_flight[key] = task
+        self.stats["executions"] += 1
+        task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task), False
+
+    def _forget(self, key, task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+    def summary(self) -> dict:
+        calls = self.stats["executions"] + self.stats["coalesced"]
+        return {
+            **self.stats,
+            "in_flight": len(self._in_flight),
+            "coalesced_rate": round(self.stats["coalesced"] / calls, 4) if calls else 0.0,
+        }
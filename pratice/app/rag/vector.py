@@ -1,26 +1,216 @@
 # app/rag/vector.py
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_pinecone import PineconeVectorStore
-from app.config import GOOGLE_API_KEY, PINECONE_INDEX_NAME
+from app.config import (
+    GOOGLE_API_KEY, PINECONE_INDEX_NAME, EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_TTL, EMBEDDING_CACHE_DB,
+    HYBRID_DENSE_WEIGHT, HYBRID_LEXICAL_WEIGHT, HYBRID_CANDIDATES, RRF_K, LLM_CALL_TIMEOUT
+)
+from app.rag.admission import get_limiter
+from app.rag.cache import EmbeddingCache
+from app.rag.concurrency import run_blocking
+from app.rag.fusion import reciprocal_rank_fusion
+from app.rag.metrics import span
 import google.generativeai as genai
+import asyncio
 import json
+import time
+
+
+def _record(timings, name, started):
+    if timings is not None:
+        timings[name] = round((time.perf_counter() - started) * 1000, 2)
 
 
 class VectorHandler:
-    def __init__(self, embedding_model):
+    def __init__(self, embedding_model, index=None, embedding_cache=None, vector_store=None, lexical_index=None,
+                 scoped_stores=None):
         """
         embedding_model: Instance of GoogleGenerativeAIEmbeddings
                          passed from embedding.py so we reuse the same settings.
+        index:           Optional Pinecone index handle from a shared, pooled client.
+        embedding_cache: Optional EmbeddingCache; one is built from config if omitted.
+        vector_store:    Optional ready-made store (e.g. LocalVectorStore); wins over index.
+        lexical_index:   Optional BM25Index over the same chunk IDs; enables hybrid search.
+        scoped_stores:   Optional callable(namespace) -> (vector store, lexical index or None)
+                         for searches scoped to a tenant / session namespace.
         """
+        self.lexical_index = lexical_index
+        self.scoped_stores = scoped_stores
+        # Shared with every other embedding call in the process (ingestion included)
+        self.limiter = get_limiter("embedding")
         self.embedding_model = embedding_model
-        self.vector_store = PineconeVectorStore.from_existing_index(
-            index_name=PINECONE_INDEX_NAME,
-            embedding=self.embedding_model
+        self.embedding_cache = embedding_cache or EmbeddingCache(
+            max_size=EMBEDDING_CACHE_SIZE,
+            ttl_seconds=EMBEDDING_CACHE_TTL,
+            db_path=EMBEDDING_CACHE_DB
         )
+        if vector_store is None:
+            # Only the Pinecone backend needs the (slow to import) Pinecone SDKs
+            from langchain_pinecone import PineconeVectorStore
+            if index is not None:
+                vector_store = PineconeVectorStore(index=index, embedding=self.embedding_model)
+            else:
+                vector_store = PineconeVectorStore.from_existing_index(
+                    index_name=PINECONE_INDEX_NAME,
+                    embedding=self.embedding_model
+                )
+        self.vector_store = vector_store
+
+    def warmup(self):
+        """Open the embedding and vector store connections before the first request."""
+        self.embedding_model.embed_query("warmup")
+        if hasattr(self.vector_store, "warmup"):
+            self.vector_store.warmup()
+        else:
+            self.vector_store.index.describe_index_stats()
+
+    def _cache_key(self, query: str) -> str:
+        return self.embedding_cache.key(getattr(self.embedding_model, "model", ""), query)
+
+    def embed_query(self, query: str):
+        """Query embedding, served from the cache when the same question was seen recently."""
+        key = self._cache_key(query)
+        vector = self.embedding_cache.get(key)
+        if vector is None:
+            with span("embed_query"), self.limiter.slot():
+                vector = self.embedding_model.embed_query(query)
+            self.embedding_cache.put(key, vector)
+        return vector
+
+    async def aembed_query(self, query: str):
+        key = self._cache_key(query)
+        # The SQLite tier is blocking I/O; the memory-only cache is not
+        if self.embedding_cache.has_disk:
+            vector = await run_blocking(self.embedding_cache.get, key)
+        else:
+            vector = self.embedding_cache.get(key)
+        if vector is None:
+            with span("embed_query"):
+                vector = await self.limiter.run(self.embedding_model.aembed_query, query)
+            if self.embedding_cache.has_disk:
+                await run_blocking(self.embedding_cache.put, key, vector)
+            else:
+                self.embedding_cache.put(key, vector)
+        return vector
+
+    async def aembed_queries(self, queries):
+        """
+        Embeddings for many queries: cache hits are served locally, the misses
+        go out in one batched embedding request and are added to the cache.
+        """
+        keys = [self._cache_key(query) for query in queries]
+        if self.embedding_cache.has_disk:
+            cached = await run_blocking(lambda: [self.embedding_cache.get(key) for key in keys])
+        else:
+            cached = [self.embedding_cache.get(key) for key in keys]
 
-    def search(self, query: str, k: int = 3):
+        missing = {}  # cache key -> query, deduplicated
+        for key, query, vector in zip(keys, queries, cached):
+            if vector is None:
+                missing.setdefault(key, query)
+        if missing:
+            with span("embed_query_batch"):
+                vectors = await self.limiter.run(
+                    self.embedding_model.aembed_documents, list(missing.values()), task_type="RETRIEVAL_QUERY"
+                )
+            fresh = dict(zip(missing, vectors))
+            if self.embedding_cache.has_disk:
+                await run_blocking(lambda: [self.embedding_cache.put(key, vector) for key, vector in fresh.items()])
+            else:
+                for key, vector in fresh.items():
+                    self.embedding_cache.put(key, vector)
+            cached = [vector if vector is not None else fresh[key] for key, vector in zip(keys, cached)]
+        return cached
+
+    def search(self, query: str, k: int = 3, filter: dict = None, weights=None, namespace=None):
         """Retrieve top-k most relevant documents from Pinecone."""
-        return self.vector_store.similarity_search(query, k=k)
+        return [
+            doc for doc, _ in self.search_with_score(query, k=k, filter=filter, weights=weights, namespace=namespace)
+        ]
+
+    def _stores(self, namespace):
+        """(vector store, lexical index) holding a namespace's chunks; None is the shared corpus."""
+        if namespace is None:
+            return self.vector_store, self.lexical_index
+        if self.scoped_stores is None:
+            raise ValueError("This vector handler has no namespaced stores.")
+        return self.scoped_stores(namespace)
+
+    def _plan(self, k: int, weights, lexical_index):
+        """(dense weight, lexical weight, candidates per retriever) for one search."""
+        dense_weight, lexical_weight = weights or (HYBRID_DENSE_WEIGHT, HYBRID_LEXICAL_WEIGHT)
+        if lexical_index is None or not lexical_weight:
+            return 1.0, 0.0, k
+        return dense_weight, lexical_weight, max(k, HYBRID_CANDIDATES)
+
+    def search_with_score(self, query: str, k: int = 3, filter: dict = None, weights=None, timings=None,
+                          namespace=None):
+        """
+        Top-k (Document, score) pairs. filter is a Pinecone-style metadata
+        filter, e.g. {"sources": {"$in": ["cv.pdf"]}}, applied by the vector
+        store. namespace searches only that tenant's / session's partition.
+
+        With a lexical index, dense and BM25 candidates are merged by weighted
+        reciprocal-rank fusion; weights is (dense, lexical) and the score is the
+        fused one. timings, if given, is filled with per-retriever milliseconds.
+        """
+        vector_store, lexical_index = self._stores(namespace)
+        with span("retrieval"):
+            dense_weight, lexical_weight, depth = self._plan(k, weights, lexical_index)
+            dense, lexical = [], []
+            if dense_weight:
+                started = time.perf_counter()
+                vector = self.embed_query(query)
+                with span("vector_search"):
+                    dense = vector_store.similarity_search_by_vector_with_score(vector, k=depth, filter=filter)
+                _record(timings, "dense_ms", started)
+            if not lexical_weight:
+                return dense
+            started = time.perf_counter()
+            with span("lexical_search"):
+                lexical = lexical_index.search_with_score(query, k=depth, filter=filter)
+            _record(timings, "lexical_ms", started)
+            return reciprocal_rank_fusion([dense, lexical], (dense_weight, lexical_weight), k=k, rrf_k=RRF_K)
+
+    async def asearch(self, query: str, k: int = 3, filter: dict = None, weights=None, namespace=None):
+        results = await self.asearch_with_score(query, k=k, filter=filter, weights=weights, namespace=namespace)
+        return [doc for doc, _ in results]
+
+    async def asearch_with_score(self, query: str, k: int = 3, filter: dict = None, weights=None, timings=None,
+                                 namespace=None):
+        """
+        Async search: the query is embedded with the native async client,
+        the Pinecone query (sync-only SDK) runs on the bounded executor.
+        Dense and lexical retrieval run concurrently.
+        """
+        vector_store, lexical_index = self._stores(namespace)
+        dense_weight, lexical_weight, depth = self._plan(k, weights, lexical_index)
+
+        async def dense_search():
+            if not dense_weight:
+                return []
+            started = time.perf_counter()
+            vector = await self.aembed_query(query)
+            with span("vector_search"):
+                results = await run_blocking(
+                    vector_store.similarity_search_by_vector_with_score, vector, k=depth, filter=filter
+                )
+            _record(timings, "dense_ms", started)
+            return results
+
+        async def lexical_search():
+            if not lexical_weight:
+                return []
+            started = time.perf_counter()
+            with span("lexical_search"):
+                results = await run_blocking(lexical_index.search_with_score, query, k=depth, filter=filter)
+            _record(timings, "lexical_ms", started)
+            return results
+
+        with span("retrieval"):
+            dense, lexical = await asyncio.gather(dense_search(), lexical_search())
+        if not lexical_weight:
+            return dense
+        return reciprocal_rank_fusion([dense, lexical], (dense_weight, lexical_weight), k=k, rrf_k=RRF_K)
 
 
 class LLMHandler:
@@ -33,13 +223,25 @@ class LLMHandler:
         )
         # Separate Gemini model for JSON responses
         self.structured_model = genai.GenerativeModel("gemini-1.5-flash")
+        # Every generate_content call goes through the shared admission limiter
+        self.limiter = get_limiter("llm")
+
+    def _generate(self, prompt: str):
+        with self.limiter.slot():
+            return self.structured_model.generate_content(prompt, request_options={"timeout": LLM_CALL_TIMEOUT})
+
+    async def _agenerate(self, prompt: str):
+        return await self.limiter.run(self.structured_model.generate_content_async, prompt)
 
     def get_llm(self):
         return self.llm
 
-    def classify_intent(self, user_message: str) -> str:
-        """Returns structured JSON with Q, R, I, Reason."""
-        prompt = f"""
+    def warmup(self):
+        """Open the Gemini channel with a cheap call that does not generate tokens."""
+        self.structured_model.count_tokens("warmup")
+
+    def _intent_prompt(self, user_message: str) -> str:
+        return f"""
         You are an intent classification system.
         For the given message, classify it into:
         Q = Query meaning, R = Request meaning, I = Intent, Reason = Why you classified it that way.
@@ -55,12 +257,8 @@ class LLMHandler:
         Message: "{user_message}"
         """
 
-        response = self.structured_model.generate_content(prompt)
-        return response.text.strip()
-
-    def generate_structured_answer(self, question: str, context: str) -> str:
-        """Generate a comprehensive answer using the retrieved context."""
-        prompt = f"""
+    def _answer_prompt(self, question: str, context: str) -> str:
+        return f"""
         You are a helpful AI assistant. Use the following context to answer the user's question comprehensively.
 
         Guidelines:
@@ -78,9 +276,42 @@ class LLMHandler:
         Answer:
         """
 
-        response = self.structured_model.generate_content(prompt)
+    def classify_intent(self, user_message: str) -> str:
+        """Returns structured JSON with Q, R, I, Reason."""
+        with span("intent"):
+            response = self._generate(self._intent_prompt(user_message))
+        return response.text.strip()
+
+    async def aclassify_intent(self, user_message: str) -> str:
+        with span("intent"):
+            response = await self._agenerate(self._intent_prompt(user_message))
         return response.text.strip()
 
+    def generate_structured_answer(self, question: str, context: str) -> str:
+        """Generate a comprehensive answer using the retrieved context."""
+        with span("generation"):
+            response = self._generate(self._answer_prompt(question, context))
+        return response.text.strip()
+
+    async def agenerate_structured_answer(self, question: str, context: str) -> str:
+        with span("generation"):
+            response = await self._agenerate(self._answer_prompt(question, context))
+        return response.text.strip()
+
+    async def astream_structured_answer(self, question: str, context: str):
+        """Yield answer text pieces as Gemini produces them; the limiter slot is held for the whole stream."""
+        async def pieces():
+            response = await self.structured_model.generate_content_async(
+                self._answer_prompt(question, context), stream=True
+            )
+            async for chunk in response:
+                if chunk.text:
+                    yield chunk.text
+
+        with span("generation"):
+            async for piece in self.limiter.stream(pieces()):
+                yield piece
+
     def generate_json_response(self, question: str, context: str = None) -> str:
         """
         Generate a fully structured JSON response similar to Google GenAI example
@@ -97,5 +328,5 @@ class LLMHandler:
 
         # This would be used if you want to implement Google's structured response format
         # You'll need to set up response_schema similar to the Google example
-        response = self.structured_model.generate_content(base_prompt)
+        response = self._generate(base_prompt)
         return response.text
\ No newline at end of file
@@ -0,0 +1,86 @@
+# app/rag_emb/chunking.py
+from bisect import bisect_right
+from langchain_core.documents import Document
+
+SEPARATORS = ("\n\n", "\n", " ")
+PAGE_JOINER = "\n"  # keeps the last word of a page apart from the first word of the next
+
+
+def _break_point(text: str, limit: int) -> int:
+    """Cut position <= limit, preferring paragraph, then line, then word boundaries."""
+    if len(text) <= limit:
+        return len(text)
+    for separator in SEPARATORS:
+        # Only accept a boundary in the second half, so chunks don't degenerate
+        at = text.rfind(separator, limit // 2, limit)
+        if at != -1:
+            return at + len(separator)
+    return limit
+
+
+def iter_chunks(pages, chunk_size: int = 1000, chunk_overlap: int = 200):
+    """
+    Stream chunks out of an iterable of PageText, consuming pages lazily.
+
+    Only the unread tail of the document (at most one page plus one chunk) is
+    held in memory. Each chunk is a Document whose metadata carries the source
+    file, the first and last page it spans (1-based) and its character offsets
+    in the page-joined document text.
+    """
+    buffer = ""
+    buffer_start = 0  # document offset of buffer[0]
+    page_starts, page_numbers = [], []  # document offset -> page number, ascending
+    emitted_end = 0  # document offset where the last emitted chunk ended
+    index = 0
+    source = None
+
+    def page_at(offset):
+        return page_numbers[max(0, bisect_right(page_starts, offset) - 1)]
+
+    def make_chunk(start, end):
+        # Strip surrounding whitespace without losing track of the offsets
+        text = buffer[start:end]
+        lead = len(text) - len(text.lstrip())
+        text = text.strip()
+        doc_start = buffer_start + start + lead
+        doc_end = doc_start + len(text)
+        return Document(page_content=text, metadata={
+            "source": source,
+            "page_start": page_at(doc_start),
+            "page_end": page_at(max(doc_start, doc_end - 1)),
+            "start_offset": doc_start,
+            "end_offset": doc_end,
+            "chunk_index": index,
+        })
+
+    def drain(final):
+        nonlocal buffer, buffer_start, emitted_end, index
+        while len(buffer) > chunk_size or (final and buffer_start + len(buffer) > emitted_end):
+            end = _break_point(buffer, chunk_size)
+            if buffer[:end].strip():
+                yield make_chunk(0, end)
+                index += 1
+            emitted_end = buffer_start + end
+            if end == len(buffer):
+                buffer_start += end
+                buffer = ""
+                break
+            # Step back by the overlap, starting the next chunk on a word boundary
+            start = max(1, end - chunk_overlap)
+            space = buffer.find(" ", start, end)
+            start = space + 1 if space != -1 and space + 1 < end else start
+            buffer_start += start
+            buffer = buffer[start:]
+            # Page starts before the buffer are only needed for the page the buffer begins on
+            keep = max(0, bisect_right(page_starts, buffer_start) - 1)
+            del page_starts[:keep], page_numbers[:keep]
+
+    for page in pages:
+        source = page.source
+        if page_starts:
+            buffer += PAGE_JOINER
+        page_starts.append(buffer_start + len(buffer))
+        page_numbers.append(page.page_number)
+        buffer += page.text
+        yield from drain(final=False)
+    yield from drain(final=True)
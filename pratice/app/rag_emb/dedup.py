@@ -0,0 +1,224 @@
+# app/rag_emb/dedup.py
+import hashlib
+import json
+import os
+import re
+import threading
+import zlib
+import numpy as np
+
+META_FILE = "dedup.json"
+SIGNATURES_FILE = "signatures.npy"
+WORD_RE = re.compile(r"\w+")
+MERSENNE_PRIME = 4294967291  # largest prime below 2**32, so signatures fit in uint32
+
+
+def normalize(text: str) -> str:
+    return " ".join(WORD_RE.findall(text.lower()))
+
+
+def exact_key(text: str) -> str:
+    """Hash of the text ignoring case, whitespace and punctuation."""
+    return hashlib.sha256(normalize(text).encode("utf-8")).hexdigest()
+
+
+class MinHasher:
+    """MinHash signatures over word shingles; the share of equal positions estimates Jaccard similarity."""
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 3, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, MERSENNE_PRIME, size=(num_perm, 1), dtype=np.uint64)
+        self.b = rng.randint(0, MERSENNE_PRIME, size=(num_perm, 1), dtype=np.uint64)
+
+    def signature(self, text: str):
+        """None when the text is too short to have a single shingle."""
+        words = normalize(text).split()
+        if len(words) < self.shingle_size:
+            return None
+        shingles = {" ".join(words[i:i + self.shingle_size]) for i in range(len(words) - self.shingle_size + 1)}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        return ((self.a * hashes + self.b) % MERSENNE_PRIME).min(axis=1).astype(np.uint32)
+
+
+class DedupIndex:
+    """
+    Finds chunks already stored under another ID: exact duplicates by
+    normalized-content hash, near duplicates by MinHash with LSH banding
+    (candidates share one band of the signature, and are confirmed when the
+    estimated Jaccard similarity reaches near_threshold).
+
+    Exact duplicates are matched across documents. Near duplicates are only
+    matched within the same document (a re-upload, or a passage repeated on
+    several pages): two CVs from one template differ in exactly the few words
+    that matter, such as the name and phone number.
+
+    A chunk is pending until commit(): only the ingestion job (and document)
+    that registered it can match it, so a job that fails can rollback() its
+    chunks without touching any chunk another file references. Only committed
+    chunks are saved.
+
+    Only canonical chunks, the ones actually embedded, are indexed. Like
+    BM25Index it is stored next to the vector index (a JSON sidecar plus a
+    .npy signature matrix) and is discarded when the ingestion settings
+    change, so a chunk is never matched to a vector built with other settings.
+    """
+
+    def __init__(self, index_dir: str, settings: dict, near_threshold: float = 0.9,
+                 num_perm: int = 64, bands: int = 16):
+        self.index_dir = index_dir
+        self.settings = settings
+        self.near_threshold = near_threshold
+        self.hasher = MinHasher(num_perm=num_perm)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._lock = threading.RLock()
+        os.makedirs(index_dir, exist_ok=True)
+        self._load()
+
+    # ---------- storage ----------
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_dir, name)
+
+    def _reset(self):
+        self.exact = {}  # exact key -> chunk ids with that content, oldest first
+        self.exact_of = {}  # chunk id -> exact key
+        self.signatures = {}  # chunk id -> MinHash signature
+        self.document_of = {}  # chunk id -> document id, for signed chunks
+        self.buckets = {}  # (document id, band, band bytes) -> set of chunk ids
+        self.pending = {}  # chunk id -> (job, document id) until committed
+
+    def _load(self):
+        self._reset()
+        try:
+            with open(self._path(META_FILE), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        if meta.get("settings") != self.settings or "documents" not in meta:
+            return
+        signatures = np.load(self._path(SIGNATURES_FILE)) if meta["signed"] else np.zeros((0, self.hasher.num_perm))
+        for chunk, key in zip(meta["ids"], meta["exact"]):
+            self._add_exact(chunk, key)
+        for chunk, document, signature in zip(meta["signed"], meta["documents"], signatures):
+            self._add_signature(chunk, signature.astype(np.uint32), document)
+
+    def save(self):
+        """Persist the committed chunks; pending ones may still be rolled back."""
+        with self._lock:
+            signed = [chunk for chunk in self.signatures if chunk not in self.pending]
+            ids = [chunk for chunk in self.exact_of if chunk not in self.pending]
+            if signed:
+                tmp = self._path(SIGNATURES_FILE + ".tmp")
+                with open(tmp, "wb") as f:
+                    np.save(f, np.stack([self.signatures[chunk] for chunk in signed]))
+                os.replace(tmp, self._path(SIGNATURES_FILE))
+            meta = {
+                "settings": self.settings,
+                "ids": ids,
+                "exact": [self.exact_of[c] for c in ids],
+                "signed": signed,
+                "documents": [self.document_of[c] for c in signed],
+            }
+            tmp = self._path(META_FILE + ".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(tmp, self._path(META_FILE))
+
+    # ---------- index maintenance ----------
+    def _band_keys(self, signature, document: str):
+        for band in range(self.bands):
+            yield document, band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def _add_exact(self, chunk: str, key: str):
+        self.exact.setdefault(key, []).append(chunk)
+        self.exact_of[chunk] = key
+
+    def _add_signature(self, chunk: str, signature, document: str):
+        self.signatures[chunk] = signature
+        self.document_of[chunk] = document
+        for band_key in self._band_keys(signature, document):
+            self.buckets.setdefault(band_key, set()).add(chunk)
+
+    def remove(self, ids):
+        """Forget chunks whose vectors were deleted, so nothing is matched to them any more."""
+        with self._lock:
+            for chunk in ids:
+                self.pending.pop(chunk, None)
+                key = self.exact_of.pop(chunk, None)
+                if key is not None:
+                    # Another chunk with the same content (e.g. registered while this one was pending) takes over
+                    self.exact[key].remove(chunk)
+                    if not self.exact[key]:
+                        del self.exact[key]
+                signature = self.signatures.pop(chunk, None)
+                if signature is not None:
+                    for band_key in self._band_keys(signature, self.document_of.pop(chunk)):
+                        bucket = self.buckets.get(band_key)
+                        if bucket is not None:
+                            bucket.discard(chunk)
+                            if not bucket:
+                                del self.buckets[band_key]
+
+    def commit(self, ids):
+        """Mark chunks as stored for good (their file is in the manifest); every job can match them now."""
+        with self._lock:
+            for chunk in ids:
+                self.pending.pop(chunk, None)
+
+    def rollback(self, job):
+        """Forget the chunks a failed job registered and never committed; no other job can reference them."""
+        with self._lock:
+            self.remove([chunk for chunk, (owner, _) in self.pending.items() if owner == job])
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+            self.save()
+
+    def __len__(self):
+        return len(self.exact_of)
+
+    # ---------- lookup ----------
+    def _visible(self, chunk: str, job, document: str) -> bool:
+        owner = self.pending.get(chunk)
+        return owner is None or owner == (job, document)
+
+    def _near_match(self, signature, job, document: str):
+        best, best_similarity = None, self.near_threshold
+        candidates = set()
+        for band_key in self._band_keys(signature, document):
+            candidates.update(self.buckets.get(band_key, ()))
+        for chunk in sorted(candidates):
+            if not self._visible(chunk, job, document):
+                continue
+            similarity = float(np.mean(self.signatures[chunk] == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = chunk, similarity
+        return best
+
+    def check_and_add(self, chunk: str, text: str, document: str, job=None):
+        """
+        (canonical chunk id, "exact" | "near") when text duplicates a chunk
+        this job may reference; otherwise registers chunk as a pending
+        canonical chunk of (job, document) and returns None.
+        """
+        key = exact_key(text)
+        signature = self.hasher.signature(text) if self.near_threshold < 1 else None
+        with self._lock:
+            canonical = next((c for c in self.exact.get(key, ()) if self._visible(c, job, document)), None)
+            if canonical is not None:
+                return canonical, "exact"
+            if signature is not None:
+                match = self._near_match(signature, job, document)
+                if match is not None:
+                    return match, "near"
+            if chunk in self.exact_of:
+                # The same content under the same ID, pending in another job: both store it
+                return None
+            self._add_exact(chunk, key)
+            self.pending[chunk] = (job, document)
+            if signature is not None:
+                self._add_signature(chunk, signature, document)
+        return None
@@ -1,26 +1,76 @@
 # app/rag_emb/embedding.py - Fixed version
 import os
-from pypdf import PdfReader
-from langchain_text_splitters import CharacterTextSplitter
+import shutil
+import threading
+import time
+import uuid
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_pinecone import PineconeVectorStore
-from pinecone import Pinecone, ServerlessSpec
-from app.config import PINECONE_API_KEY, PINECONE_ENV, PINECONE_INDEX_NAME, GOOGLE_API_KEY
+from app.config import (
+    PINECONE_API_KEY, PINECONE_ENV, PINECONE_INDEX_NAME, PINECONE_POOL_THREADS, GOOGLE_API_KEY,
+    PDF_EXTRACT_WORKERS, EMBED_BATCH_SIZE, EMBED_MAX_IN_FLIGHT, EMBED_REQUESTS_PER_MINUTE, EMBED_MAX_RETRIES,
+    EMBEDDING_STORE_DIR, EMBEDDING_STORE_RETENTION_SECONDS, LEXICAL_INDEX_DIR, DEDUP_INDEX_DIR, DEDUP_NEAR_THRESHOLD,
+    VECTOR_BACKEND, LOCAL_INDEX_DIR, LOCAL_INDEX_DTYPE, LOCAL_INDEX_ANN_THRESHOLD, LOCAL_INDEX_NPROBE
+)
+from app.rag.admission import get_limiter
+from app.rag.metrics import record, span
+from app.rag_emb.chunking import iter_chunks
+from app.rag_emb.dedup import DedupIndex
+from app.rag_emb.extraction import PDFExtractor, PageText
+from app.rag_emb.lexical import BM25Index
+from app.rag_emb.local_store import LocalVectorStore
+from app.rag_emb.pipeline import EmbeddingPipeline
+from app.rag_emb.embedding_store import EmbeddingStore, content_key
+from app.rag_emb.manifest import IngestionManifest, chunk_id, document_id, file_hash
+
+EMBEDDING_MODEL = "models/embedding-001"
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+CHUNKER_VERSION = "pages-v3"  # bump when chunk boundaries or metadata change
+MANIFEST_FILE = ".ingest_manifest.json"
+UPSERT_BATCH_SIZE = 100
+NAMESPACES_DIR = "namespaces"
+
+
+def scoped_dir(base: str, namespace=None) -> str:
+    """Directory of a namespace under an index or data directory; the base itself for the shared corpus."""
+    return base if namespace is None else os.path.join(base, NAMESPACES_DIR, namespace)
 
 
 class PDFEmbedder:
-    def __init__(self, data_dir="data"):
+    def __init__(self, data_dir="data", pinecone_client=None, vector_backend=VECTOR_BACKEND):
         self.data_dir = data_dir
+        self.vector_backend = vector_backend
         # Initialize embedding immediately
         self.embedding = GoogleGenerativeAIEmbeddings(
-            model="models/embedding-001",
+            model=EMBEDDING_MODEL,
             google_api_key=GOOGLE_API_KEY
         )
-        self.pinecone = None
+        # A shared client keeps one pooled set of connections for the whole process
+        self.pinecone = pinecone_client
+        self._index_ready = False
+        # Per namespace (None is the shared corpus): each tenant / session gets its own partition
+        self._local_stores = {}
+        self._lexical_indexes = {}
+        self._dedup_indexes = {}
+        self.extractor = PDFExtractor(max_workers=PDF_EXTRACT_WORKERS)
+        self.pipeline = EmbeddingPipeline(
+            self.embedding,
+            batch_size=EMBED_BATCH_SIZE,
+            max_in_flight=EMBED_MAX_IN_FLIGHT,
+            requests_per_minute=EMBED_REQUESTS_PER_MINUTE,
+            max_retries=EMBED_MAX_RETRIES,
+            store=EmbeddingStore(EMBEDDING_STORE_DIR, EMBEDDING_MODEL) if EMBEDDING_STORE_DIR else None,
+            limiter=get_limiter("embedding")
+        )
+        # Guards read-modify-write of the manifest between concurrent ingestions
+        self._manifest_lock = threading.Lock()
 
     def _init_pinecone(self):
+        # The Pinecone SDKs take over a second to import; a local-backend process never loads them
+        from pinecone import Pinecone, ServerlessSpec
         if not self.pinecone:
-            self.pinecone = Pinecone(api_key=PINECONE_API_KEY)
+            self.pinecone = Pinecone(api_key=PINECONE_API_KEY, pool_threads=PINECONE_POOL_THREADS)
+        if not self._index_ready:
             # Create index if it doesn't exist
             if PINECONE_INDEX_NAME not in [index.name for index in self.pinecone.list_indexes()]:
                 self.pinecone.create_index(
@@ -29,34 +79,448 @@ class PDFEmbedder:
                     metric="cosine",
                     spec=ServerlessSpec(cloud="aws", region=PINECONE_ENV)
                 )
+            self._index_ready = True
+
+    def get_index(self):
+        """Pinecone index handle bound to the shared client."""
+        self._init_pinecone()
+        return self.pinecone.Index(PINECONE_INDEX_NAME)
+
+    def get_vector_store(self, namespace=None):
+        """
+        Vector store for the configured backend, one partition per namespace:
+        a Pinecone namespace, or a local index under LOCAL_INDEX_DIR/namespaces/.
+        Local stores are shared per process.
+        """
+        if self.vector_backend == "local":
+            return self._scoped(self._local_stores, LOCAL_INDEX_DIR, namespace, lambda index_dir: LocalVectorStore(
+                index_dir,
+                embedding=self.embedding,
+                dtype=LOCAL_INDEX_DTYPE,
+                ann_threshold=LOCAL_INDEX_ANN_THRESHOLD,
+                nprobe=LOCAL_INDEX_NPROBE
+            ))
+        from langchain_pinecone import PineconeVectorStore
+        return PineconeVectorStore(index=self.get_index(), embedding=self.embedding, namespace=namespace)
+
+    def get_lexical_index(self, namespace=None):
+        """BM25 index over the same chunk IDs, or None when hybrid retrieval is off."""
+        if not LEXICAL_INDEX_DIR:
+            return None
+        return self._scoped(self._lexical_indexes, LEXICAL_INDEX_DIR, namespace, BM25Index)
+
+    def get_dedup_index(self, namespace=None):
+        """
+        Duplicate-chunk index over what is already stored, or None when deduplication
+        is off. Scoped like the vectors: a chunk never resolves to another namespace's.
+        """
+        if not DEDUP_INDEX_DIR:
+            return None
+        return self._scoped(self._dedup_indexes, DEDUP_INDEX_DIR, namespace, lambda index_dir: DedupIndex(
+            index_dir, self.settings(), near_threshold=DEDUP_NEAR_THRESHOLD
+        ))
+
+    def scoped_stores(self, namespace):
+        """(vector store, lexical index) searched for a namespace; see VectorHandler."""
+        return self.get_vector_store(namespace), self.get_lexical_index(namespace)
+
+    @staticmethod
+    def _scoped(cache, base_dir, namespace, factory):
+        index_dir = scoped_dir(base_dir, namespace)
+        if namespace is not None:
+            # Another worker may have evicted the namespace since this one opened it
+            os.makedirs(index_dir, exist_ok=True)
+        if namespace not in cache:
+            cache[namespace] = factory(index_dir)
+        return cache[namespace]
+
+    def close(self):
+        """Release the extraction process pool."""
+        self.extractor.close()
+
+    def settings(self):
+        """Everything that changes the vectors produced for the same file."""
+        return {
+            "chunk_size": CHUNK_SIZE,
+            "chunk_overlap": CHUNK_OVERLAP,
+            "chunker": CHUNKER_VERSION,
+            "embedding_model": EMBEDDING_MODEL,
+            "vector_backend": self.vector_backend,
+            # Turning the lexical index on re-ingests (from the embedding store) to backfill it
+            "lexical_index": bool(LEXICAL_INDEX_DIR),
+        }
+
+    def namespace_dir(self, namespace=None):
+        """Where a namespace's PDFs and manifest live: data/namespaces/<namespace>/, or data/ itself."""
+        return scoped_dir(self.data_dir, namespace)
+
+    def namespaces(self):
+        try:
+            return sorted(os.listdir(os.path.join(self.data_dir, NAMESPACES_DIR)))
+        except FileNotFoundError:
+            return []
+
+    def has_namespace(self, namespace) -> bool:
+        return os.path.isdir(self.namespace_dir(namespace))
+
+    def touch_namespace(self, namespace):
+        """Mark a namespace as in use; evict_expired_namespaces keys on this time."""
+        try:
+            os.utime(self.namespace_dir(namespace))
+        except OSError:
+            pass
+
+    def corpus_version(self):
+        """Changes whenever ingestion changes the index (shared by every worker via the manifest file)."""
+        try:
+            return os.stat(os.path.join(self.data_dir, MANIFEST_FILE)).st_mtime_ns
+        except OSError:
+            return 0
+
+    def pdf_paths(self, namespace=None):
+        data_dir = self.namespace_dir(namespace)
+        return [os.path.join(data_dir, f) for f in sorted(os.listdir(data_dir)) if f.endswith(".pdf")]
+
+    def iter_pages(self, paths=None):
+        """Lazily stream PageText (source, page_number, text, seconds) for the given PDFs."""
+        return self.extractor.iter_pages(self.pdf_paths() if paths is None else paths)
+
+    def load_text(self, path):
+        return "".join(page.text for page in self.extractor.iter_pages([path]))
 
     def load_texts(self):
-        texts = []
-        for file in os.listdir(self.data_dir):
-            if file.endswith(".pdf"):
-                path = os.path.join(self.data_dir, file)
-                reader = PdfReader(path)
-                text = "".join([page.extract_text() for page in reader.pages if page.extract_text()])
-                if text.strip():
-                    texts.append(text)
-        return texts
+        """Yield one full-text string per non-empty PDF in data/."""
+        for _, pages in self.extractor.iter_documents(self.pdf_paths()):
+            text = "".join(page.text for page in pages)
+            if text.strip():
+                yield text
+
+    def split_pages(self, pages):
+        """Lazily chunk a stream of PageText; chunks carry source, page span and offsets."""
+        return iter_chunks(pages, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
 
     def split_texts(self, texts):
-        splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        return splitter.create_documents(texts)
+        """Chunk plain strings, each treated as a single-page document."""
+        return [doc for text in texts for doc in self.split_pages([PageText(None, 1, text, 0.0)])]
+
+    def process_and_store(self, files=None, progress=None, namespace=None):
+        """
+        Incrementally sync PDFs from data/ into the vector store.
+
+        files:     optional file names inside data/ to ingest; None syncs the whole
+                   directory and also drops files that were deleted from it.
+        progress:  optional callable(stage, count), called with "pages", "chunks",
+                   "deduplicated", "embedded" and "upserted" as work completes.
+        namespace: optional tenant / session; its PDFs live in namespace_dir(namespace)
+                   and its chunks in a separate partition of every index.
 
-    def process_and_store(self):
+        Every chunk is tagged with its document_id (and namespace), so retrieval
+        can be narrowed to one document with a metadata filter. Chunks also
+        carry sources and document_ids lists naming every file that uses them,
+        kept current as files sharing a chunk are recorded or removed; filter
+        on those ({"document_ids": {"$in": [...]}}) to find shared chunks too.
+
+        Only new or changed PDFs are parsed, embedded and upserted; chunks of
+        replaced or deleted files are removed from the index. Parsing and
+        embedding run without a lock, so several ingestions can overlap; only
+        the manifest update and stale-chunk deletion are serialized.
+
+        Chunks that duplicate a stored chunk, exactly or nearly (see DedupIndex),
+        are not embedded: the file references the stored chunk's ID instead, and
+        the manifest keeps that chunk alive while any file references it. New
+        chunks are committed to the dedup index with their file's manifest entry;
+        if the job fails, only its uncommitted chunks are forgotten.
+        """
         # Initialize Pinecone when needed
-        self._init_pinecone()
+        if self.vector_backend == "pinecone":
+            self._init_pinecone()
+
+        report = progress or (lambda stage, count: None)
+        settings = self.settings()
+        summary = {"ingested": [], "skipped": [], "removed": [], "chunks_upserted": 0, "chunks_deleted": 0}
+        data_dir = self.namespace_dir(namespace)
+        paths = self.pdf_paths(namespace) if files is None else [os.path.join(data_dir, f) for f in files]
+
+        with self._manifest_lock:
+            manifest = self._load_manifest(namespace)
+        changed = {}
+        for path in paths:
+            file = os.path.basename(path)
+            content_hash = file_hash(path)
+            if manifest.is_current(file, content_hash):
+                summary["skipped"].append(file)
+            else:
+                changed[path] = content_hash
+
+        # Changed files are extracted in parallel; pages stream through the chunker
+        # into the embedding pipeline, so no file is ever held in memory whole
+        timings = {}
+        file_chunks = {}  # file -> (content hash, chunk ids), filled as files are chunked
+        fresh = {}  # file -> chunk IDs sent to the pipeline (the rest reference stored chunks)
+        dedup = self.get_dedup_index(namespace)
+        job = uuid.uuid4().hex  # owner of the chunks this call registers in the dedup index
+        summary["chunks_deduplicated"] = {"exact": 0, "near": 0}
+
+        def counted(pages):
+            for page in pages:
+                report("pages", 1)
+                yield page
+
+        def file_chunk_stream(file, content_hash, pages):
+            ids = file_chunks[file][1]
+            document = document_id(file, namespace)
+            tags = {"document_id": document}
+            if namespace is not None:
+                tags["namespace"] = namespace
+            for doc in self.split_pages(counted(pages)):
+                doc.metadata.update(tags, sources=[file], document_ids=[document])
+                chunk = chunk_id(content_hash, settings, len(ids))
+                report("chunks", 1)
+                duplicate = dedup.check_and_add(chunk, doc.page_content, document, job) if dedup is not None else None
+                if duplicate is not None:
+                    canonical, kind = duplicate
+                    ids.append(canonical)
+                    summary["chunks_deduplicated"][kind] += 1
+                    report("deduplicated", 1)
+                    continue
+                ids.append(chunk)
+                fresh[file].append(chunk)
+                yield chunk, doc
+
+        def chunked_files():
+            for path, pages in self.extractor.iter_files(changed, timings=timings):
+                file = os.path.basename(path)
+                file_chunks[file] = (changed[path], [])
+                fresh[file] = []
+                yield file, file_chunk_stream(file, changed[path], pages)
+
+        def record_file(file):
+            # Runs once all of a file's chunks are upserted, possibly on a pipeline thread
+            content_hash, ids = file_chunks.pop(file)
+            with self._manifest_lock:
+                manifest = self._load_manifest(namespace)
+                replaced_ids = manifest.record(file, content_hash, ids)
+                summary["chunks_deleted"] += self._delete_orphans(manifest, replaced_ids, namespace)
+                created = fresh.pop(file)
+                if dedup is not None:
+                    dedup.commit(created)
+                # Chunks shared with other files gain (or, if replaced, lose) this file as a source
+                self._refresh_sources(manifest, set(ids) | set(replaced_ids), namespace, unchanged={
+                    chunk: [file] for chunk in created
+                })
+                # Saving bumps the manifest mtime, which is the corpus version caches key on
+                manifest.save()
+                if dedup is not None:
+                    dedup.save()
+                summary["ingested"].append(file)
+                summary["chunks_upserted"] += len(created)
+
+        if changed:
+            vector_store = self.get_vector_store(namespace)
+            try:
+                summary["embedding"] = self.pipeline.run(
+                    chunked_files(),
+                    upsert=lambda ids, vectors, docs: self._upsert(vector_store, ids, vectors, docs, namespace),
+                    on_item_done=record_file,
+                    progress=report
+                )
+            except Exception:
+                # Chunks of unrecorded files may never have been stored; nothing may match them.
+                # Only this job could match them, so no other file references them.
+                if dedup is not None:
+                    dedup.rollback(job)
+                raise
+            # The ANN index is trained once per ingestion, not per upserted batch
+            if hasattr(vector_store, "build_ann"):
+                with span("ingest_ann_index"):
+                    vector_store.build_ann()
+
+        summary["extraction"] = {
+            file: {key: round(value, 4) for key, value in timing.items()}
+            for file, timing in timings.items()
+        }
+        for timing in timings.values():
+            record("ingest_extract", timing["seconds"])
+
+        with self._manifest_lock:
+            manifest = self._load_manifest(namespace)
+            if files is None:
+                present = {os.path.basename(path) for path in paths}
+                replaced_ids = []
+                for file in sorted(manifest.filenames() - present):
+                    replaced_ids.extend(manifest.forget(file))
+                    summary["removed"].append(file)
+                if summary["removed"]:
+                    summary["chunks_deleted"] += self._delete_orphans(manifest, replaced_ids, namespace)
+                    self._refresh_sources(manifest, replaced_ids, namespace)
+                    manifest.save()
+                    if dedup is not None:
+                        dedup.save()
+
+            if not any(manifest.chunk_ids(os.path.basename(path)) for path in paths):
+                raise ValueError("No PDF content found in data directory.")
+        return summary
+
+    def rebuild_index(self, namespace=None):
+        """
+        Re-ingest every PDF of a namespace (default: the shared corpus) from scratch,
+        e.g. after wiping the index or switching backend. Vectors come from the
+        embedding store; only misses are re-embedded. Stored embeddings of chunks
+        the rebuild no longer produces are compacted away once past retention.
+        """
+        with self._manifest_lock:
+            try:
+                os.remove(os.path.join(self.namespace_dir(namespace), MANIFEST_FILE))
+            except FileNotFoundError:
+                pass
+            # The chunks it knows may be gone from the index
+            if self.get_dedup_index(namespace) is not None:
+                self.get_dedup_index(namespace).clear()
+        summary = self.process_and_store(namespace=namespace)
+        summary["embeddings_dropped"] = self.compact_embedding_store()
+        return summary
+
+    def evict_namespace(self, namespace):
+        """
+        Drop a namespace entirely: its PDFs, manifest and every partition it has
+        in the vector, lexical and dedup indexes. The embedding store is keyed by
+        chunk text only and keeps the vectors until compact_embedding_store drops
+        them, so re-uploading the same CV within the retention window costs no API call.
+        """
+        if namespace is None:
+            raise ValueError("The shared corpus cannot be evicted.")
+        with self._manifest_lock:
+            manifest = self._load_manifest(namespace)
+            files = sorted(manifest.filenames())
+            chunks = {chunk for file in files for chunk in manifest.chunk_ids(file)}
+            with span("ingest_delete"):
+                if self.vector_backend == "local":
+                    self._local_stores.pop(namespace, None)
+                    shutil.rmtree(scoped_dir(LOCAL_INDEX_DIR, namespace), ignore_errors=True)
+                elif chunks:
+                    self.get_index().delete(delete_all=True, namespace=namespace)
+                if LEXICAL_INDEX_DIR:
+                    self._lexical_indexes.pop(namespace, None)
+                    shutil.rmtree(scoped_dir(LEXICAL_INDEX_DIR, namespace), ignore_errors=True)
+            if DEDUP_INDEX_DIR:
+                self._dedup_indexes.pop(namespace, None)
+                shutil.rmtree(scoped_dir(DEDUP_INDEX_DIR, namespace), ignore_errors=True)
+            shutil.rmtree(self.namespace_dir(namespace), ignore_errors=True)
+        return {"namespace": namespace, "files_removed": files, "chunks_deleted": len(chunks)}
+
+    def evict_expired_namespaces(self, ttl_seconds: float, keep=()):
+        """Evict namespaces untouched for ttl_seconds (abandoned sessions), except those in keep."""
+        cutoff = time.time() - ttl_seconds
+        evicted = []
+        for namespace in self.namespaces():
+            if namespace in keep:
+                continue
+            try:
+                last_used = os.stat(self.namespace_dir(namespace)).st_mtime
+            except OSError:
+                continue
+            if last_used < cutoff:
+                evicted.append(self.evict_namespace(namespace))
+        return evicted
+
+    def compact_embedding_store(self, retention_seconds: float = EMBEDDING_STORE_RETENTION_SECONDS) -> int:
+        """
+        Drop stored embeddings unused for retention_seconds whose chunk no index
+        holds any more (evicted namespaces, replaced files); returns the rows
+        dropped. Skipped when the chunks cannot be listed locally (Pinecone
+        without the lexical index), since live chunks would lose their vectors.
+        """
+        store = self.pipeline.store
+        if store is None or retention_seconds <= 0:
+            return 0
+        if self.vector_backend != "local" and not LEXICAL_INDEX_DIR:
+            return 0
+        return store.compact(retention_seconds, referenced=self._indexed_keys)
+
+    def _indexed_keys(self) -> set:
+        """Content keys of every chunk indexed in the shared corpus or a namespace."""
+        keys = set()
+        # Evictions and manifest updates wait, so no namespace disappears mid-scan
+        with self._manifest_lock:
+            for namespace in [None] + self.namespaces():
+                if self.vector_backend == "local":
+                    index = self.get_vector_store(namespace)
+                else:
+                    index = self.get_lexical_index(namespace)
+                keys.update(content_key(text) for text in index.iter_texts())
+        return keys
+
+    def discard_upload(self, filename: str, content_hash: str, namespace=None) -> bool:
+        """
+        Delete an uploaded PDF whose ingestion failed, so a bad upload does not
+        linger in data/ and fail every later sync. Kept when it replaced a file
+        that is already ingested, or when another upload has overwritten it since.
+        """
+        path = os.path.join(self.namespace_dir(namespace), filename)
+        with self._manifest_lock:
+            if filename in self._load_manifest(namespace).filenames():
+                return False
+            try:
+                if file_hash(path) != content_hash:
+                    return False
+                os.remove(path)
+            except FileNotFoundError:
+                return False
+        return True
+
+    def _load_manifest(self, namespace=None):
+        return IngestionManifest(os.path.join(self.namespace_dir(namespace), MANIFEST_FILE), self.settings())
+
+    def _delete_orphans(self, manifest, replaced_ids, namespace=None):
+        """Delete replaced chunk IDs no file still uses (identical content under another name keeps its IDs)."""
+        stale_ids = manifest.unreferenced(replaced_ids)
+        if stale_ids:
+            with span("ingest_delete"):
+                self.get_vector_store(namespace).delete(ids=stale_ids)
+                if self.get_lexical_index(namespace) is not None:
+                    self.get_lexical_index(namespace).delete(ids=stale_ids)
+            if self.get_dedup_index(namespace) is not None:
+                self.get_dedup_index(namespace).remove(stale_ids)
+        return len(stale_ids)
 
-        raw_texts = self.load_texts()
-        if not raw_texts:
-            raise ValueError("No PDF content found in data directory.")
+    def _refresh_sources(self, manifest, chunk_ids, namespace=None, unchanged=None):
+        """
+        Rewrite the sources / document_ids metadata of chunks still in use so it
+        lists every file that references them. unchanged maps chunk IDs to the
+        files their stored metadata already lists, to skip rewriting those.
+        """
+        updates = {}
+        for chunk, files in manifest.references(chunk_ids).items():
+            if (unchanged or {}).get(chunk) != files:
+                updates[chunk] = {"sources": files, "document_ids": [document_id(f, namespace) for f in files]}
+        if not updates:
+            return
+        with span("ingest_update_metadata"):
+            vector_store = self.get_vector_store(namespace)
+            if hasattr(vector_store, "update_metadata"):
+                vector_store.update_metadata(updates)
+            else:
+                for chunk, fields in updates.items():
+                    vector_store.index.update(id=chunk, set_metadata=fields, namespace=namespace)
+            if self.get_lexical_index(namespace) is not None:
+                self.get_lexical_index(namespace).update_metadata(updates)
 
-        docs = self.split_texts(raw_texts)
+    def _upsert(self, vector_store, ids, vectors, docs, namespace=None):
+        """Write precomputed embeddings to the configured store, and the chunks to the lexical index."""
+        if self.get_lexical_index(namespace) is not None:
+            with span("ingest_lexical_index"):
+                self.get_lexical_index(namespace).add_documents(ids, docs)
+        with span("ingest_upsert"):
+            self._upsert_vectors(vector_store, ids, vectors, docs, namespace)
 
-        PineconeVectorStore.from_documents(
-            documents=docs,
-            embedding=self.embedding,
-            index_name=PINECONE_INDEX_NAME,
-        )
\ No newline at end of file
+    def _upsert_vectors(self, vector_store, ids, vectors, docs, namespace=None):
+        if hasattr(vector_store, "add_vectors"):
+            vector_store.add_vectors(ids, vectors, [doc.page_content for doc in docs], [doc.metadata for doc in docs])
+            return
+        # Same record layout PineconeVectorStore writes: chunk text under the "text" metadata key
+        records = [
+            (chunk, vector, {**doc.metadata, "text": doc.page_content})
+            for chunk, vector, doc in zip(ids, vectors, docs)
+        ]
+        for start in range(0, len(records), UPSERT_BATCH_SIZE):
+            vector_store.index.upsert(vectors=records[start:start + UPSERT_BATCH_SIZE], namespace=namespace)
@@ -0,0 +1,179 @@
+# app/rag_emb/embedding_store.py
+import fcntl
+import hashlib
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+
+KEY_BYTES = 32  # raw sha256 digest per row
+
+
+def content_key(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingStore:
+    """
+    Persistent store of the chunk embeddings we have paid for, keyed by
+    (chunk content hash, embedding model).
+
+    Each model gets its own directory holding three fixed-width columns:
+    keys.bin (32-byte sha256 per row), vectors.f32 (float32 rows) and used.i64
+    (when each row was last stored or read, in epoch seconds). Reads and
+    appends take an exclusive file lock, so several workers can share the
+    store; a key is only appended if it is not stored yet, so no duplicate
+    rows accumulate.
+
+    Vectors outlive their chunks for a while, so re-uploading a CV or
+    rebuilding an index does not pay for an embedding twice. compact()
+    rewrites the columns without the rows that are unused for the retention
+    window and no longer referenced by any index.
+    """
+
+    def __init__(self, root_dir: str, model: str):
+        self.dir = os.path.join(root_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", model))
+        self.dim = None
+        self._rows = {}  # key -> row
+        self._row_count = 0
+        self._vectors = None
+        self._used = None
+        self._loaded = None  # (inode, size) of keys.bin at the last refresh
+        self._lock = threading.Lock()
+        os.makedirs(self.dir, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.dir, name)
+
+    @contextmanager
+    def _file_lock(self):
+        with open(self._path(".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _keys_stat(self):
+        try:
+            stat = os.stat(self._path("keys.bin"))
+            return stat.st_ino, stat.st_size
+        except OSError:
+            return None, 0
+
+    def _refresh(self):
+        """Pick up rows appended or compacted by this or another process since the last read (file lock held)."""
+        loaded = self._keys_stat()
+        if loaded == self._loaded:
+            return
+        if self._loaded is None or loaded[0] != self._loaded[0]:
+            # First read, or compacted underneath us: rebuild the row map from scratch
+            self._rows, self._row_count = {}, 0
+
+        rows = loaded[1] // KEY_BYTES
+        if rows and self.dim is None:
+            with open(self._path("dim")) as f:
+                self.dim = int(f.read())
+        new_keys = b""
+        if rows:
+            with open(self._path("keys.bin"), "rb") as f:
+                f.seek(self._row_count * KEY_BYTES)
+                new_keys = f.read((rows - self._row_count) * KEY_BYTES)
+            # Stores written before used.i64 existed count every row as used now
+            with open(self._path("used.i64"), "ab") as f:
+                missing = rows - f.tell() // 8
+                if missing > 0:
+                    f.write(np.full(missing, int(time.time()), dtype=np.int64).tobytes())
+        for i in range(len(new_keys) // KEY_BYTES):
+            self._rows[new_keys[i * KEY_BYTES:(i + 1) * KEY_BYTES]] = self._row_count + i
+        self._row_count = rows
+        self._vectors, self._used = (
+            (np.memmap(self._path("vectors.f32"), dtype=np.float32, mode="r", shape=(rows, self.dim)),
+             np.memmap(self._path("used.i64"), dtype=np.int64, mode="r+", shape=(rows,)))
+            if rows else (None, None)
+        )
+        self._loaded = loaded
+
+    def __len__(self):
+        with self._lock, self._file_lock():
+            self._refresh()
+            return len(self._rows)
+
+    def get_many(self, keys):
+        """Return {key: vector} for the keys that are stored, and mark them used."""
+        with self._lock, self._file_lock():
+            self._refresh()
+            found = {key: self._rows[key] for key in keys if key in self._rows}
+            if not found:
+                return {}
+            rows = np.asarray(list(found.values()))
+            vectors = np.asarray(self._vectors[rows])
+            self._used[rows] = int(time.time())
+            return {key: vectors[i].tolist() for i, key in enumerate(found)}
+
+    def put_many(self, keys, vectors):
+        """Append new embeddings; keys already stored are skipped."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock, self._file_lock():
+            self._refresh()
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                with open(self._path("dim"), "w") as f:
+                    f.write(str(self.dim))
+            # Also collapses repeated keys within this call
+            new = list({key: i for i, key in enumerate(keys) if key not in self._rows}.values())
+            if not new:
+                return
+            # Vectors and times first, keys last: the keys column is the commit point for readers.
+            # Truncating drops bytes left behind by a writer that died before its keys.
+            with open(self._path("vectors.f32"), "ab") as f:
+                f.truncate(self._row_count * self.dim * 4)
+                f.write(vectors[new].tobytes())
+            with open(self._path("used.i64"), "ab") as f:
+                f.truncate(self._row_count * 8)
+                f.write(np.full(len(new), int(time.time()), dtype=np.int64).tobytes())
+            with open(self._path("keys.bin"), "ab") as f:
+                f.write(b"".join(keys[i] for i in new))
+            self._refresh()
+
+    def compact(self, retention_seconds: float, referenced=None) -> int:
+        """
+        Drop rows unused for retention_seconds, unless referenced() (called only
+        when some row is that old) returns their key: those are marked used
+        instead, so the next sweep does not ask again. Returns the rows dropped.
+        """
+        with self._lock, self._file_lock():
+            self._refresh()
+            if not self._row_count:
+                return 0
+            now = int(time.time())
+            stale = np.flatnonzero(self._used < now - retention_seconds)
+            if not len(stale):
+                return 0
+            with open(self._path("keys.bin"), "rb") as f:
+                keys = f.read(self._row_count * KEY_BYTES)
+            keep_keys = referenced() if referenced is not None else ()
+            in_use = np.fromiter(
+                (keys[r * KEY_BYTES:(r + 1) * KEY_BYTES] in keep_keys for r in stale), dtype=bool, count=len(stale)
+            )
+            self._used[stale[in_use]] = now
+            if in_use.all():
+                return 0
+
+            keep = np.ones(self._row_count, dtype=bool)
+            keep[stale[~in_use]] = False
+            rows = np.flatnonzero(keep)
+            for name, column in (("vectors.f32", self._vectors), ("used.i64", self._used)):
+                with open(self._path(name + ".tmp"), "wb") as f:
+                    for start in range(0, len(rows), 65536):
+                        f.write(np.asarray(column[rows[start:start + 65536]]).tobytes())
+            with open(self._path("keys.bin.tmp"), "wb") as f:
+                f.write(b"".join(keys[r * KEY_BYTES:(r + 1) * KEY_BYTES] for r in rows))
+            # Readers key off keys.bin; its new inode tells them to reload fully
+            os.replace(self._path("vectors.f32.tmp"), self._path("vectors.f32"))
+            os.replace(self._path("used.i64.tmp"), self._path("used.i64"))
+            os.replace(self._path("keys.bin.tmp"), self._path("keys.bin"))
+            self._refresh()
+            return int((~keep).sum())
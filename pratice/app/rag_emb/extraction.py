@@ -0,0 +1,157 @@
+# app/rag_emb/extraction.py
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+from pypdf import PdfReader
+
+
+class PageText(NamedTuple):
+    source: str  # file name inside data/
+    page_number: int  # 1-based
+    text: str
+    seconds: float
+
+
+def extract_page_range(path: str, start: int, stop: int):
+    """
+    Worker: extract pages [start, stop) of one PDF, calling extract_text once per page.
+    Runs in a child process, so it must stay a top-level function.
+    """
+    reader = PdfReader(path)
+    pages = []
+    for index in range(start, stop):
+        began = time.perf_counter()
+        text = reader.pages[index].extract_text() or ""
+        pages.append((index + 1, text, time.perf_counter() - began))
+    return pages
+
+
+def pool_context():
+    """
+    Start method for the extraction pool. Forking the API process would copy
+    its threads, locks and SDK clients into every worker, so workers come from
+    a small forkserver (spawn where forkserver is unavailable) that has only
+    imported this module.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+class PDFExtractor:
+    """
+    Parallel PDF text extraction.
+
+    Files are split into page ranges that run across a process pool; results
+    are streamed back lazily, in file and page order, with a bounded number of
+    ranges in flight. Per-file timing is kept in self.timings.
+    """
+
+    def __init__(self, max_workers: int = None, pages_per_task: int = 8):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.pages_per_task = pages_per_task
+        self.timings = {}
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=pool_context())
+        return self._pool
+
+    def warmup(self):
+        """Create the pool and start its server process now (at service startup) instead of on the first upload."""
+        if self.max_workers > 1:
+            self._get_pool().submit(os.getpid).result()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _tasks(self, paths):
+        for path in paths:
+            page_count = len(PdfReader(path).pages)
+            if page_count == 0:
+                yield path, 0, 0
+            for start in range(0, page_count, self.pages_per_task):
+                yield path, start, min(start + self.pages_per_task, page_count)
+
+    def iter_pages(self, paths, timings=None):
+        """
+        Yield PageText for every page of every path, in order.
+        timings: optional dict filled with per-file stats; concurrent callers pass their own.
+        """
+        if timings is None:
+            timings = {}
+        # Stats of the most recent run, for callers that don't pass their own dict
+        self.timings = timings
+        tasks = self._tasks(paths)
+
+        if self.max_workers <= 1:
+            results = ((path, extract_page_range(path, start, stop)) for path, start, stop in tasks)
+        else:
+            results = self._run_parallel(tasks)
+
+        for path, pages in results:
+            name = os.path.basename(path)
+            timing = timings.setdefault(name, {"pages": 0, "seconds": 0.0, "slowest_page_seconds": 0.0})
+            for page_number, text, seconds in pages:
+                timing["pages"] += 1
+                timing["seconds"] += seconds
+                timing["slowest_page_seconds"] = max(timing["slowest_page_seconds"], seconds)
+                yield PageText(name, page_number, text, seconds)
+
+    def _run_parallel(self, tasks):
+        pool = self._get_pool()
+        window = deque()
+        # Keep the pool busy without materializing every page of the corpus at once
+        max_in_flight = self.max_workers * 2
+        for path, start, stop in tasks:
+            window.append((path, pool.submit(extract_page_range, path, start, stop)))
+            if len(window) >= max_in_flight:
+                path_done, future = window.popleft()
+                yield path_done, future.result()
+        while window:
+            path_done, future = window.popleft()
+            yield path_done, future.result()
+
+    def iter_files(self, paths, timings=None):
+        """
+        Yield (path, page iterator) per file, including files with no pages.
+        Pages stay lazy: each file's iterator should be consumed before moving to
+        the next file (anything left unread is skipped).
+        """
+        paths = list(paths)
+        pages = self.iter_pages(paths, timings=timings)
+        head = [next(pages, None)]
+
+        def file_pages(name):
+            while head[0] is not None and head[0].source == name:
+                page = head[0]
+                head[0] = next(pages, None)
+                yield page
+
+        for path in paths:
+            current = file_pages(os.path.basename(path))
+            yield path, current
+            for _ in current:
+                pass
+
+    def iter_documents(self, paths, timings=None):
+        """Yield (path, [PageText, ...]) per file, including files with no pages."""
+        paths = list(paths)
+        pending = iter(paths)
+        current, pages = next(pending, None), []
+        for page in self.iter_pages(paths, timings=timings):
+            while current is not None and os.path.basename(current) != page.source:
+                yield current, pages
+                current, pages = next(pending, None), []
+            pages.append(page)
+        while current is not None:
+            yield current, pages
+            current, pages = next(pending, None), []
@@ -0,0 +1,390 @@
+# app/rag_emb/lexical.py
+import json
+import math
+import os
+import re
+import threading
+import uuid
+from collections import Counter
+from typing import NamedTuple
+import numpy as np
+from langchain_core.documents import Document
+from app.rag_emb.local_store import TextColumn, manifest_key, merge_start, metadata_matches, remove_files, row_layout
+
+META_FILE = "lexical.json"
+# Keeps skills like "c++", "c#" and "node.js" as single terms
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[+#]+|(?:\.[a-z0-9]+)+)?")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it of on or that the this to was were what which who with".split()
+)
+
+
+def tokenize(text: str):
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class LexicalSegment:
+    """
+    One immutable batch of chunks. Postings are stored term-major in memory-mapped
+    .npy columns (local row, term frequency) with per-term offsets; chunk lengths
+    sit in another column, the segment's vocabulary, IDs and metadata in a small
+    JSON file and the texts in a TextColumn.
+    """
+
+    COLUMNS = ("offsets", "rows", "tfs", "lengths")
+    SUFFIXES = (".json",) + tuple(f"-{column}.npy" for column in COLUMNS) + TextColumn.SUFFIXES
+
+    def __init__(self, index_dir: str, name: str):
+        self.name = name
+        path = os.path.join(index_dir, name)
+        with open(path + ".json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.terms, self.ids, self.metadatas = meta["terms"], meta["ids"], meta["metadatas"]
+        self.term_index = {term: i for i, term in enumerate(self.terms)}
+        self.offsets, self.rows, self.tfs, self.lengths = (
+            np.load(f"{path}-{column}.npy", mmap_mode="r") for column in self.COLUMNS
+        )
+        self.texts = TextColumn(path)
+        self._rows = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def rows_of(self, ids):
+        """(id, local row) for the given IDs stored in this segment."""
+        if self._rows is None:
+            self._rows = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        return [(chunk_id, self._rows[chunk_id]) for chunk_id in ids if chunk_id in self._rows]
+
+    def postings(self, term: str):
+        """(local rows, term frequencies) of one term, or None if no chunk here uses it."""
+        t = self.term_index.get(term)
+        if t is None:
+            return None
+        start, stop = int(self.offsets[t]), int(self.offsets[t + 1])
+        return np.asarray(self.rows[start:stop], dtype=np.int64), np.asarray(self.tfs[start:stop])
+
+    def triplets(self, keep):
+        """Postings of the kept local rows as (term, row, tf) columns, rows renumbered by their position in keep."""
+        term_of = np.repeat(np.arange(len(self.terms)), np.diff(self.offsets))
+        remap = np.full(len(self.ids), -1, dtype=np.int64)
+        remap[keep] = np.arange(len(keep))
+        rows = remap[np.asarray(self.rows, dtype=np.int64)]
+        mask = rows >= 0
+        return term_of[mask], rows[mask], np.asarray(self.tfs, dtype=np.float32)[mask]
+
+    @classmethod
+    def write(cls, index_dir: str, name: str, vocabulary, terms, rows, tfs, ids, lengths, texts, metadatas):
+        """Write a segment from unsorted postings: term indices into vocabulary, local rows and tfs."""
+        # Term-major order; only the terms this segment uses are kept
+        order = np.lexsort((rows, terms))
+        terms, rows, tfs = terms[order], rows[order], tfs[order]
+        used = np.unique(terms)
+        offsets = np.searchsorted(np.searchsorted(used, terms), np.arange(len(used) + 1))
+
+        path = os.path.join(index_dir, name)
+        columns = {
+            "offsets": offsets.astype(np.int64),
+            "rows": rows.astype(np.int32),
+            "tfs": tfs.astype(np.float32),
+            "lengths": np.asarray(lengths, dtype=np.int32),
+        }
+        for column, values in columns.items():
+            with open(f"{path}-{column}.npy", "wb") as f:
+                np.save(f, values)
+        TextColumn.write(path, texts)
+        with open(path + ".json", "w", encoding="utf-8") as f:
+            json.dump({"terms": [vocabulary[t] for t in used], "ids": list(ids), "metadatas": list(metadatas)}, f)
+
+
+class LexicalSnapshot(NamedTuple):
+    """One consistent view of a BM25Index, replaced whole on reload and never mutated (see Snapshot)."""
+    key: tuple  # manifest_key of the manifest it was read from
+    generation: int
+    segments: list
+    deleted: dict  # segment name -> deleted local rows
+    starts: np.ndarray
+    alive: np.ndarray
+    live: int
+    lengths: np.ndarray
+
+    def names(self):
+        return [segment.name for segment in self.segments]
+
+    def locate(self, row):
+        """(segment, local row) of a global row."""
+        i = int(np.searchsorted(self.starts, row, side="right")) - 1
+        return self.segments[i], int(row - self.starts[i])
+
+
+class BM25Index:
+    """
+    Okapi BM25 over the same chunk IDs as the vector store.
+
+    Laid out like LocalVectorStore: chunks live in immutable LexicalSegments,
+    a write appends one segment and marks replaced or deleted rows in the small
+    lexical.json manifest, and segments are merged geometrically (see
+    merge_start), so ingesting a batch costs its own size. Document frequencies
+    and the average length are summed over live rows at query time. Readers
+    reload when the manifest changes and only read the postings of query terms
+    and the texts of returned chunks; a search works from one LexicalSnapshot,
+    so writes never change the rows under it.
+    """
+
+    def __init__(self, index_dir: str, k1: float = 1.5, b: float = 0.75):
+        self.index_dir = index_dir
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()  # writers
+        self._load_lock = threading.Lock()  # building the next snapshot
+        self._state = LexicalSnapshot(None, 0, [], {}, *row_layout([], {}), 0, np.zeros(0, dtype=np.int32))
+        os.makedirs(index_dir, exist_ok=True)
+        with self._lock:
+            self._migrate()
+        self._load()
+
+    # ---------- storage ----------
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_dir, name)
+
+    def _load(self) -> LexicalSnapshot:
+        """The current snapshot, rebuilt first if the manifest changed (here or in another process)."""
+        state = self._state
+        if manifest_key(self._path(META_FILE)) == state.key:
+            return state
+        with self._load_lock:
+            for attempt in range(3):
+                state, key = self._state, manifest_key(self._path(META_FILE))
+                if key == state.key:
+                    return state
+                try:
+                    self._state = self._read(key, state)
+                    return self._state
+                except FileNotFoundError:
+                    # Another process merged the segments this manifest listed; read the newer one
+                    if attempt == 2:
+                        raise
+
+    def _read(self, key, previous: LexicalSnapshot) -> LexicalSnapshot:
+        meta = {"generation": 0, "segments": [], "deleted": {}}
+        if key is not None:
+            with open(self._path(META_FILE), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        # Segments are immutable, so the ones already open are reused
+        loaded = {segment.name: segment for segment in previous.segments}
+        segments = [loaded.get(name) or LexicalSegment(self.index_dir, name) for name in meta["segments"]]
+        starts, alive = row_layout(segments, meta["deleted"])
+        lengths = np.concatenate([np.asarray(segment.lengths) for segment in segments] or [np.zeros(0, dtype=np.int32)])
+        return LexicalSnapshot(key, meta["generation"], segments, meta["deleted"], starts, alive, int(alive.sum()), lengths)
+
+    def _migrate(self):
+        """Rewrite an index in the old layout (one set of postings, every text in lexical.json) as a single segment."""
+        try:
+            with open(self._path(META_FILE), "r", encoding="utf-8") as f:
+                legacy = json.load(f)
+        except OSError:
+            return
+        if "segments" in legacy:
+            return
+        state = self._state._replace(generation=legacy["generation"])
+        names = []
+        if legacy["ids"]:
+            offsets, rows, tfs = np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+            if legacy.get("postings"):
+                offsets, rows, tfs = (
+                    np.load(self._path(f"{legacy['postings']}-{column}.npy")) for column in ("offsets", "rows", "tfs")
+                )
+            terms = np.repeat(np.arange(len(legacy["terms"])), np.diff(offsets))
+            names.append(self._write_segment(
+                state, legacy["terms"], terms, rows, tfs, legacy["ids"], legacy["lengths"],
+                [text.encode("utf-8") for text in legacy["texts"]], legacy["metadatas"]
+            ))
+        self._commit(state, names, {})
+        if legacy.get("postings"):
+            remove_files(self.index_dir, legacy["postings"], ("-offsets.npy", "-rows.npy", "-tfs.npy"))
+
+    def _write_segment(self, state: LexicalSnapshot, vocabulary, terms, rows, tfs, ids, lengths, texts, metadatas) -> str:
+        # Unreferenced until the manifest lists it, so a unique name is enough
+        name = f"seg-{state.generation + 1}-{uuid.uuid4().hex[:8]}"
+        LexicalSegment.write(self.index_dir, name, vocabulary, terms, rows, tfs, ids, lengths, texts, metadatas)
+        return name
+
+    def _commit(self, state: LexicalSnapshot, names, deleted) -> LexicalSnapshot:
+        """Switch the manifest from state to these segments; files that dropped out of it are removed."""
+        meta = {
+            "generation": state.generation + 1,
+            "segments": list(names),
+            "deleted": {name: rows for name, rows in deleted.items() if rows and name in names},
+        }
+        tmp_meta = self._path(META_FILE + ".tmp")
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_meta, self._path(META_FILE))
+
+        for name in state.names():
+            if name not in names:
+                remove_files(self.index_dir, name, LexicalSegment.SUFFIXES)
+        return self._load()
+
+    @staticmethod
+    def _tombstone(state: LexicalSnapshot, ids):
+        """The deleted-row map with every live row of these IDs added."""
+        deleted = {name: list(rows) for name, rows in state.deleted.items()}
+        wanted = set(ids)
+        for i, segment in enumerate(state.segments):
+            for _, row in segment.rows_of(wanted):
+                if state.alive[state.starts[i] + row]:
+                    deleted.setdefault(segment.name, []).append(row)
+        return deleted
+
+    def _maybe_merge(self, state: LexicalSnapshot):
+        start = merge_start(
+            [len(segment) for segment in state.segments],
+            [len(segment) - len(state.deleted.get(segment.name, ())) for segment in state.segments],
+        )
+        if start is not None:
+            self._merge(state, start)
+
+    def _merge(self, state: LexicalSnapshot, start: int):
+        """Rewrite segments[start:] as one segment without their deleted rows."""
+        merged = state.segments[start:]
+        keep = [
+            np.flatnonzero(state.alive[state.starts[start + i]:state.starts[start + i + 1]])
+            for i in range(len(merged))
+        ]
+        names = state.names()[:start]
+        if sum(len(kept) for kept in keep):
+            vocabulary = sorted(set().union(*(segment.terms for segment in merged)))
+            position = {term: i for i, term in enumerate(vocabulary)}
+            terms, rows, tfs, base = [], [], [], 0
+            for segment, kept in zip(merged, keep):
+                segment_terms, segment_rows, segment_tfs = segment.triplets(kept)
+                # Segment term indices -> indices in the merged vocabulary
+                segment_position = np.asarray([position[t] for t in segment.terms], dtype=np.int64)
+                terms.append(segment_position[segment_terms])
+                rows.append(segment_rows + base)
+                tfs.append(segment_tfs)
+                base += len(kept)
+            names.append(self._write_segment(
+                state, vocabulary, np.concatenate(terms), np.concatenate(rows), np.concatenate(tfs),
+                [segment.ids[r] for segment, kept in zip(merged, keep) for r in kept],
+                [int(segment.lengths[r]) for segment, kept in zip(merged, keep) for r in kept],
+                [segment.texts.raw(r) for segment, kept in zip(merged, keep) for r in kept],
+                [segment.metadatas[r] for segment, kept in zip(merged, keep) for r in kept],
+            ))
+        self._commit(state, names, state.deleted)
+
+    # ---------- writes (ingestion) ----------
+    def add_documents(self, ids, documents):
+        """Index chunks under their vector-store IDs; existing IDs are replaced."""
+        if not len(ids):
+            return []
+        # The last occurrence wins when a batch repeats an ID
+        keep = sorted({chunk_id: i for i, chunk_id in enumerate(ids)}.values())
+        counts = [Counter(tokenize(documents[i].page_content)) for i in keep]
+        vocabulary = sorted(set().union(*counts))
+        position = {term: i for i, term in enumerate(vocabulary)}
+        terms, rows, tfs = [], [], []
+        for row, counter in enumerate(counts):
+            for term, tf in counter.items():
+                terms.append(position[term])
+                rows.append(row)
+                tfs.append(tf)
+
+        with self._lock:
+            state = self._load()
+            deleted = self._tombstone(state, ids)
+            name = self._write_segment(
+                state, vocabulary, np.asarray(terms, dtype=np.int64), np.asarray(rows, dtype=np.int64),
+                np.asarray(tfs, dtype=np.float32),
+                [ids[i] for i in keep],
+                [sum(counter.values()) for counter in counts],
+                [documents[i].page_content.encode("utf-8") for i in keep],
+                [dict(documents[i].metadata) for i in keep],
+            )
+            self._maybe_merge(self._commit(state, state.names() + [name], deleted))
+        return list(ids)
+
+    def update_metadata(self, updates: dict):
+        """Merge {chunk id: fields} into stored metadata; the chunks are re-indexed from their stored text."""
+        with self._lock:
+            state = self._load()
+            rows = [
+                (segment, local)
+                for i, segment in enumerate(state.segments)
+                for _, local in segment.rows_of(updates)
+                if state.alive[state.starts[i] + local]
+            ]
+            if rows:
+                self.add_documents(
+                    [segment.ids[local] for segment, local in rows],
+                    [
+                        Document(
+                            page_content=segment.texts[local],
+                            metadata={**segment.metadatas[local], **updates[segment.ids[local]]},
+                        )
+                        for segment, local in rows
+                    ],
+                )
+
+    def delete(self, ids=None):
+        with self._lock:
+            state = self._load()
+            deleted = self._tombstone(state, ids or [])
+            if sum(map(len, deleted.values())) == sum(map(len, state.deleted.values())):
+                return
+            self._maybe_merge(self._commit(state, state.names(), deleted))
+
+    # ---------- reads (search) ----------
+    def __len__(self):
+        return self._load().live
+
+    def iter_texts(self):
+        """Texts of the live rows, e.g. to tell which stored embeddings are still in use."""
+        state = self._load()
+        for i, segment in enumerate(state.segments):
+            for local in np.flatnonzero(state.alive[state.starts[i]:state.starts[i + 1]]):
+                yield segment.texts[local]
+
+    @staticmethod
+    def _matches(state: LexicalSnapshot, row, filter):
+        segment, local = state.locate(row)
+        return metadata_matches(segment.metadatas[local], filter)
+
+    @staticmethod
+    def _document(state: LexicalSnapshot, row):
+        segment, local = state.locate(row)
+        return Document(page_content=segment.texts[local], metadata=dict(segment.metadatas[local]), id=segment.ids[local])
+
+    def search_with_score(self, query: str, k: int = 3, filter=None):
+        """Top-k (Document, BM25 score) pairs; chunks matching no query term are never returned."""
+        state = self._load()
+        n = state.live
+        if not n:
+            return []
+        average_length = float(state.lengths[state.alive].mean()) or 1.0
+        norm = self.k1 * (1 - self.b + self.b * state.lengths / average_length)
+        scores = np.zeros(len(state.alive), dtype=np.float32)
+        for term in set(tokenize(query)):
+            postings = []
+            for i, segment in enumerate(state.segments):
+                found = segment.postings(term)
+                if found is not None:
+                    rows, tfs = found
+                    rows = rows + state.starts[i]
+                    mask = state.alive[rows]
+                    postings.append((rows[mask], tfs[mask]))
+            df = sum(len(rows) for rows, _ in postings)
+            if not df:
+                continue
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for rows, tfs in postings:
+                scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + norm[rows])
+
+        candidates = np.nonzero(scores)[0]
+        if filter:
+            candidates = np.asarray([r for r in candidates if self._matches(state, r, filter)], dtype=np.int64)
+        if not len(candidates):
+            return []
+        top = candidates[np.argsort(-scores[candidates], kind="stable")[:k]]
+        return [(self._document(state, r), float(scores[r])) for r in top]
@@ -0,0 +1,619 @@
+# app/rag_emb/local_store.py
+import json
+import os
+import threading
+import uuid
+from typing import NamedTuple
+import numpy as np
+from langchain_core.documents import Document
+
+META_FILE = "meta.json"
+BLOCK_ROWS = 65536  # rows scored per block, keeps float16 -> float32 casts bounded
+MERGE_FACTOR = 2  # a segment is merged into its predecessor once it is at least 1/MERGE_FACTOR its size
+COMPACT_DEAD_RATIO = 0.3  # share of deleted rows that triggers a full rewrite
+ANN_STALE_RATIO = 0.1  # share of rows added since the IVF build that triggers a rebuild
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _top_k(scores, k):
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx])]
+
+
+def _assign(vectors, centroids):
+    """Nearest centroid (by cosine) for every row, computed in blocks."""
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), 8192):
+        block = np.asarray(vectors[start:start + 8192], dtype=np.float32)
+        out[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def build_ivf(vectors, nlist: int, iterations: int = 10, seed: int = 0):
+    """
+    Inverted-file ANN index: spherical k-means over a sample, then every row
+    is assigned to its nearest centroid. Returns (centroids, order, offsets);
+    rows of list c are order[offsets[c]:offsets[c + 1]].
+    """
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    sample_size = min(n, max(nlist * 32, 10000))
+    sample = np.asarray(vectors[np.sort(rng.choice(n, size=sample_size, replace=False))], dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        labels = _assign(sample, centroids)
+        for c in range(nlist):
+            members = sample[labels == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0)
+        centroids = _normalize(centroids)
+
+    labels = _assign(vectors, centroids)
+    order = np.argsort(labels, kind="stable")
+    offsets = np.searchsorted(labels[order], np.arange(nlist + 1))
+    return centroids, order, offsets
+
+
+def merge_start(segment_rows, live_rows):
+    """
+    Index of the first segment to merge into one, or None. The newest segments
+    are folded into their predecessor once they hold at least 1/MERGE_FACTOR of
+    its live rows, which keeps the segment count logarithmic; everything is
+    rewritten once COMPACT_DEAD_RATIO of all rows are deleted.
+    """
+    total = sum(segment_rows)
+    if total and (total - sum(live_rows)) / total > COMPACT_DEAD_RATIO:
+        return 0
+    start = len(live_rows) - 1
+    while start > 0 and live_rows[start - 1] <= MERGE_FACTOR * sum(live_rows[start:]):
+        start -= 1
+    return start if start < len(live_rows) - 1 else None
+
+
+def metadata_matches(metadata: dict, filter: dict) -> bool:
+    """
+    Pinecone-style metadata filter: {key: value}, {key: {"$eq": value}} or
+    {key: {"$in": [values]}}. A list field matches when any element does.
+    """
+    for key, condition in filter.items():
+        value = metadata.get(key)
+        values = value if isinstance(value, list) else [value]
+        if isinstance(condition, dict):
+            if set(condition) - {"$eq", "$in"}:
+                raise ValueError(f"Unsupported metadata filter: {condition}")
+            allowed = condition.get("$in", []) + ([condition["$eq"]] if "$eq" in condition else [])
+        else:
+            allowed = [condition]
+        if not any(v in allowed for v in values):
+            return False
+    return True
+
+
+class TextColumn:
+    """Chunk texts as one UTF-8 blob plus an offsets array; a text is only decoded when it is read."""
+
+    SUFFIXES = (".offsets.npy", ".txt")
+
+    def __init__(self, path: str):
+        self.offsets = np.load(path + ".offsets.npy")
+        # np.memmap refuses empty files
+        self.blob = np.memmap(path + ".txt", dtype=np.uint8, mode="r") if self.offsets[-1] else b""
+
+    def raw(self, row: int) -> bytes:
+        return bytes(self.blob[self.offsets[row]:self.offsets[row + 1]])
+
+    def __getitem__(self, row: int) -> str:
+        return self.raw(row).decode("utf-8")
+
+    @staticmethod
+    def write(path: str, texts):
+        """texts: encoded (bytes) chunk texts."""
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(text) for text in texts])
+        with open(path + ".offsets.npy", "wb") as f:
+            np.save(f, offsets)
+        with open(path + ".txt", "wb") as f:
+            f.write(b"".join(texts))
+
+
+def remove_files(index_dir: str, name: str, suffixes):
+    for suffix in suffixes:
+        try:
+            os.remove(os.path.join(index_dir, name + suffix))
+        except OSError:
+            pass
+
+
+class Segment:
+    """
+    One immutable batch of rows: the normalized vectors as a memory-mapped .npy
+    matrix, IDs and metadata in a small JSON file, and the chunk texts in a
+    TextColumn, so a text is only read when its document is returned.
+    """
+
+    SUFFIXES = (".npy", ".json") + TextColumn.SUFFIXES
+
+    def __init__(self, index_dir: str, name: str):
+        self.name = name
+        path = os.path.join(index_dir, name)
+        self.vectors = np.load(path + ".npy", mmap_mode="r")
+        with open(path + ".json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.ids, self.metadatas = meta["ids"], meta["metadatas"]
+        self.texts = TextColumn(path)
+        self._rows = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def rows_of(self, ids):
+        """(id, local row) for the given IDs stored in this segment."""
+        if self._rows is None:
+            self._rows = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+        return [(chunk_id, self._rows[chunk_id]) for chunk_id in ids if chunk_id in self._rows]
+
+    @classmethod
+    def write(cls, index_dir: str, name: str, blocks, shape, dtype, ids, texts, metadatas):
+        """Write a new segment from vector blocks (arrays totalling shape rows) and encoded texts."""
+        path = os.path.join(index_dir, name)
+        matrix = np.lib.format.open_memmap(path + ".npy", mode="w+", dtype=dtype, shape=shape)
+        start = 0
+        for block in blocks:
+            matrix[start:start + len(block)] = block
+            start += len(block)
+        matrix.flush()
+        del matrix
+
+        TextColumn.write(path, texts)
+        with open(path + ".json", "w", encoding="utf-8") as f:
+            json.dump({"ids": list(ids), "metadatas": list(metadatas)}, f)
+
+
+class SegmentRows:
+    """Read-only view of all segments as one matrix, indexed by global row number."""
+
+    def __init__(self, segments, starts, dim):
+        self.segments = segments
+        self.starts = starts
+        self.dim = dim
+
+    def __len__(self):
+        return int(self.starts[-1])
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                return self[np.arange(start, stop, step)]
+            parts = []
+            for i, segment in enumerate(self.segments):
+                lo, hi = max(start, self.starts[i]), min(stop, self.starts[i + 1])
+                if lo < hi:
+                    parts.append(segment.vectors[lo - self.starts[i]:hi - self.starts[i]])
+            if len(parts) == 1:
+                return parts[0]
+            return np.concatenate(parts) if parts else np.zeros((0, self.dim or 0), dtype=np.float32)
+
+        rows = np.asarray(key, dtype=np.int64)
+        out = np.empty((len(rows), self.dim or 0), dtype=np.float32)
+        owners = np.searchsorted(self.starts, rows, side="right") - 1
+        for i in np.unique(owners):
+            mask = owners == i
+            out[mask] = self.segments[i].vectors[rows[mask] - self.starts[i]]
+        return out
+
+
+def manifest_key(path: str):
+    """Identity of a manifest version: replacing the file changes its inode and mtime. None if it is missing."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_ino, stat.st_size
+
+
+def row_layout(segments, deleted):
+    """(starts, alive): first global row of each segment (plus the total), and the live-row mask."""
+    starts = np.zeros(len(segments) + 1, dtype=np.int64)
+    starts[1:] = np.cumsum([len(segment) for segment in segments])
+    alive = np.ones(int(starts[-1]), dtype=bool)
+    for i, segment in enumerate(segments):
+        if deleted.get(segment.name):
+            alive[starts[i] + np.asarray(deleted[segment.name], dtype=np.int64)] = False
+    return starts, alive
+
+
+class Snapshot(NamedTuple):
+    """
+    One consistent view of a LocalVectorStore. _load builds a new one and swaps
+    it in with a single assignment; searches capture it once, so a concurrent
+    write never changes the rows under them.
+    """
+    key: tuple  # manifest_key of the manifest it was read from
+    generation: int
+    segments: list
+    deleted: dict  # segment name -> deleted local rows
+    starts: np.ndarray
+    alive: np.ndarray
+    live: int
+    vectors: SegmentRows
+    ivf: tuple  # (centroids, order, offsets) or None
+    ivf_meta: dict  # {"file", "segments"} or None
+
+    def names(self):
+        return [segment.name for segment in self.segments]
+
+    def locate(self, row):
+        """(segment, local row) of a global row."""
+        i = int(np.searchsorted(self.starts, row, side="right")) - 1
+        return self.segments[i], int(row - self.starts[i])
+
+    def ivf_rows(self) -> int:
+        """Rows covered by the IVF index (a prefix of the segments)."""
+        return int(self.starts[len(self.ivf_meta["segments"])]) if self.ivf_meta else 0
+
+
+class LocalVectorStore:
+    """
+    Embedded vector index, a drop-in for PineconeVectorStore in this app.
+
+    Rows live in immutable segments (see Segment): a write appends one segment
+    and marks replaced or deleted rows in the small meta.json manifest, so an
+    ingestion batch costs its own size rather than the whole index. Segments are
+    merged geometrically (a segment is folded into its predecessor once it is at
+    least half its size) and rewritten without deleted rows once those pass
+    COMPACT_DEAD_RATIO, which keeps the segment count logarithmic.
+
+    Small corpora are searched with exact brute-force cosine top-k. Once the live
+    rows reach ann_threshold, build_ann() (run after each ingestion, not per
+    batch) trains an IVF index over the current segments and only the nprobe
+    closest lists are scanned; rows appended since are scanned exactly until the
+    next build.
+
+    The manifest switch is the commit point: readers reload when it changes and
+    keep old segments open by name, so several workers can share one directory.
+    Within a process, writers are serialized by a lock while searches only read
+    the current Snapshot, which is replaced whole and never mutated.
+    """
+
+    def __init__(self, index_dir: str, embedding=None, dtype: str = "float32",
+                 ann_threshold: int = 50000, nlist: int = None, nprobe: int = 8):
+        self.index_dir = index_dir
+        self.embedding = embedding
+        self.dtype = np.dtype(dtype)
+        self.ann_threshold = ann_threshold
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self._lock = threading.RLock()  # writers
+        self._load_lock = threading.Lock()  # building the next snapshot
+        self._state = Snapshot(None, 0, [], {}, *row_layout([], {}), 0, SegmentRows([], np.zeros(1, np.int64), None),
+                               None, None)
+        os.makedirs(index_dir, exist_ok=True)
+        with self._lock:
+            self._migrate()
+        self._load()
+
+    # ---------- storage ----------
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_dir, name)
+
+    def _load(self) -> Snapshot:
+        """The current snapshot, rebuilt first if the manifest changed (here or in another process)."""
+        state = self._state
+        if manifest_key(self._path(META_FILE)) == state.key:
+            return state
+        with self._load_lock:
+            for attempt in range(3):
+                state, key = self._state, manifest_key(self._path(META_FILE))
+                if key == state.key:
+                    return state
+                try:
+                    self._state = self._read(key, state)
+                    return self._state
+                except FileNotFoundError:
+                    # Another process merged the segments this manifest listed; read the newer one
+                    if attempt == 2:
+                        raise
+
+    def _read(self, key, previous: Snapshot) -> Snapshot:
+        meta = {"generation": 0, "segments": [], "deleted": {}, "ivf": None}
+        if key is not None:
+            with open(self._path(META_FILE), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        # Segments are immutable, so the ones already open are reused
+        loaded = {segment.name: segment for segment in previous.segments}
+        segments = [loaded.get(name) or Segment(self.index_dir, name) for name in meta["segments"]]
+        starts, alive = row_layout(segments, meta["deleted"])
+        dim = segments[0].vectors.shape[1] if segments else None
+
+        ivf = previous.ivf if meta["ivf"] == previous.ivf_meta else None
+        if meta["ivf"] and ivf is None:
+            with np.load(self._path(meta["ivf"]["file"])) as arrays:
+                ivf = (arrays["centroids"], arrays["order"], arrays["offsets"])
+        return Snapshot(
+            key, meta["generation"], segments, meta["deleted"], starts, alive, int(alive.sum()),
+            SegmentRows(segments, starts, dim), ivf, meta["ivf"]
+        )
+
+    def _migrate(self):
+        """Rewrite an index in the old layout (one matrix, every text in meta.json) as a single segment."""
+        try:
+            with open(self._path(META_FILE), "r", encoding="utf-8") as f:
+                legacy = json.load(f)
+        except OSError:
+            return
+        if "segments" in legacy:
+            return
+        state = self._state._replace(generation=legacy["generation"])
+        names = []
+        if legacy["ids"]:
+            vectors = np.load(self._path(legacy["vectors"]), mmap_mode="r")
+            blocks = (vectors[start:start + BLOCK_ROWS] for start in range(0, len(vectors), BLOCK_ROWS))
+            texts = [text.encode("utf-8") for text in legacy["texts"]]
+            names.append(self._write_segment(state, blocks, vectors.shape, legacy["ids"], texts, legacy["metadatas"]))
+        self._commit(state, names, {}, None)
+        for name in (legacy.get("vectors"), legacy.get("ivf")):
+            if name:
+                try:
+                    os.remove(self._path(name))
+                except OSError:
+                    pass
+
+    def _write_segment(self, state: Snapshot, blocks, shape, ids, texts, metadatas) -> str:
+        # Unreferenced until the manifest lists it, so a unique name is enough
+        name = f"seg-{state.generation + 1}-{uuid.uuid4().hex[:8]}"
+        Segment.write(self.index_dir, name, blocks, shape, self.dtype, ids, texts, metadatas)
+        return name
+
+    def _commit(self, state: Snapshot, names, deleted, ivf) -> Snapshot:
+        """Switch the manifest from state to these segments; files that dropped out of it are removed."""
+        meta = {
+            "generation": state.generation + 1,
+            "dtype": self.dtype.name,
+            "segments": list(names),
+            "deleted": {name: rows for name, rows in deleted.items() if rows and name in names},
+            "ivf": ivf,
+        }
+        tmp_meta = self._path(META_FILE + ".tmp")
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        # The manifest switch is the commit point for readers
+        os.replace(tmp_meta, self._path(META_FILE))
+
+        # Readers that still map a dropped segment keep its (unlinked) files alive
+        for name in state.names():
+            if name not in names:
+                remove_files(self.index_dir, name, Segment.SUFFIXES)
+        if state.ivf_meta and (ivf is None or ivf["file"] != state.ivf_meta["file"]):
+            try:
+                os.remove(self._path(state.ivf_meta["file"]))
+            except OSError:
+                pass
+        return self._load()
+
+    def _tombstone(self, state: Snapshot, ids):
+        """The deleted-row map with every live row of these IDs added."""
+        deleted = {name: list(rows) for name, rows in state.deleted.items()}
+        wanted = set(ids)
+        for i, segment in enumerate(state.segments):
+            for _, row in segment.rows_of(wanted):
+                if state.alive[state.starts[i] + row]:
+                    deleted.setdefault(segment.name, []).append(row)
+        return deleted
+
+    @staticmethod
+    def _ivf_valid(state: Snapshot, names):
+        """The current IVF index if it still covers a prefix of these segments."""
+        if state.ivf_meta and names[:len(state.ivf_meta["segments"])] == state.ivf_meta["segments"]:
+            return state.ivf_meta
+        return None
+
+    def _maybe_merge(self, state: Snapshot):
+        start = merge_start(
+            [len(segment) for segment in state.segments],
+            [len(segment) - len(state.deleted.get(segment.name, ())) for segment in state.segments],
+        )
+        if start is not None:
+            self._merge(state, start)
+
+    def _merge(self, state: Snapshot, start: int):
+        """Rewrite segments[start:] as one segment without their deleted rows."""
+        merged = state.segments[start:]
+        keep = [
+            np.flatnonzero(state.alive[state.starts[start + i]:state.starts[start + i + 1]])
+            for i in range(len(merged))
+        ]
+        names = state.names()[:start]
+        rows = sum(len(rows) for rows in keep)
+        if rows:
+            blocks = (
+                segment.vectors[np.asarray(kept[i:i + BLOCK_ROWS])]
+                for segment, kept in zip(merged, keep)
+                for i in range(0, len(kept), BLOCK_ROWS)
+            )
+            ids = [segment.ids[r] for segment, kept in zip(merged, keep) for r in kept]
+            texts = [segment.texts.raw(r) for segment, kept in zip(merged, keep) for r in kept]
+            metadatas = [segment.metadatas[r] for segment, kept in zip(merged, keep) for r in kept]
+            names.append(self._write_segment(state, blocks, (rows, state.vectors.dim), ids, texts, metadatas))
+        self._commit(state, names, state.deleted, self._ivf_valid(state, names))
+
+    # ---------- writes (ingestion) ----------
+    def add_vectors(self, ids, vectors, texts, metadatas=None):
+        """Upsert precomputed vectors: appended as a new segment, replaced IDs are marked deleted."""
+        if not len(ids):
+            return []
+        metadatas = metadatas or [{} for _ in ids]
+        new_vectors = _normalize(vectors)
+        with self._lock:
+            state = self._load()
+            if state.vectors.dim is not None and state.vectors.dim != new_vectors.shape[1]:
+                raise ValueError("Embedding dimension does not match the existing local index.")
+            # The last occurrence wins when a batch repeats an ID
+            keep = sorted({chunk_id: i for i, chunk_id in enumerate(ids)}.values())
+            deleted = self._tombstone(state, ids)
+            name = self._write_segment(
+                state, [new_vectors[keep]], (len(keep), new_vectors.shape[1]),
+                [ids[i] for i in keep],
+                [texts[i].encode("utf-8") for i in keep],
+                [metadatas[i] for i in keep],
+            )
+            names = state.names() + [name]
+            self._maybe_merge(self._commit(state, names, deleted, self._ivf_valid(state, names)))
+        return list(ids)
+
+    def add_documents(self, documents, ids=None):
+        texts = [doc.page_content for doc in documents]
+        rows = len(self._load().alive)
+        ids = ids or [str(i) for i in range(rows, rows + len(texts))]
+        vectors = self.embedding.embed_documents(texts)
+        return self.add_vectors(ids, vectors, texts, [dict(doc.metadata) for doc in documents])
+
+    def update_metadata(self, updates: dict):
+        """Merge {chunk id: fields} into stored metadata; the rows are re-appended with their vectors and text."""
+        with self._lock:
+            state = self._load()
+            rows = [
+                (segment, local)
+                for i, segment in enumerate(state.segments)
+                for _, local in segment.rows_of(updates)
+                if state.alive[state.starts[i] + local]
+            ]
+            if rows:
+                self.add_vectors(
+                    [segment.ids[local] for segment, local in rows],
+                    np.stack([np.asarray(segment.vectors[local], dtype=np.float32) for segment, local in rows]),
+                    [segment.texts[local] for segment, local in rows],
+                    [{**segment.metadatas[local], **updates[segment.ids[local]]} for segment, local in rows],
+                )
+
+    def delete(self, ids=None):
+        with self._lock:
+            state = self._load()
+            deleted = self._tombstone(state, ids or [])
+            if sum(map(len, deleted.values())) == sum(map(len, state.deleted.values())):
+                return
+            self._maybe_merge(self._commit(state, state.names(), deleted, state.ivf_meta))
+
+    def build_ann(self) -> bool:
+        """
+        Train the IVF index over all segments once the live rows reach
+        ann_threshold. Called after an ingestion rather than per batch; skipped
+        while the rows added since the last build stay under ANN_STALE_RATIO.
+        """
+        with self._lock:
+            state = self._load()
+            if state.live < self.ann_threshold:
+                return False
+            if state.ivf is not None and len(state.alive) - state.ivf_rows() <= ANN_STALE_RATIO * len(state.alive):
+                return False
+            nlist = self.nlist or max(1, int(np.sqrt(state.live)))
+            centroids, order, offsets = build_ivf(state.vectors, nlist)
+            # Deleted rows stay in the lists and are masked at search time
+            name = f"ivf-{state.generation + 1}-{uuid.uuid4().hex[:8]}.npz"
+            with open(self._path(name), "wb") as f:
+                np.savez(f, centroids=centroids, order=order, offsets=offsets)
+            self._commit(state, state.names(), state.deleted, {"file": name, "segments": state.names()})
+            return True
+
+    # ---------- reads (search) ----------
+    def warmup(self):
+        """Touch the mapped pages so the first query does not pay the page faults."""
+        state = self._load()
+        if len(state.alive):
+            float(np.asarray(state.vectors[::max(1, len(state.alive) // 1024)], dtype=np.float32).sum())
+
+    def __len__(self):
+        return self._load().live
+
+    def iter_texts(self):
+        """Texts of the live rows, e.g. to tell which stored embeddings are still in use."""
+        state = self._load()
+        for i, segment in enumerate(state.segments):
+            for local in np.flatnonzero(state.alive[state.starts[i]:state.starts[i + 1]]):
+                yield segment.texts[local]
+
+    def _candidate_rows(self, state: Snapshot, query):
+        """Row indices worth scoring: all rows, or the nprobe closest IVF lists plus rows added since the build."""
+        if state.ivf is None:
+            return None
+        centroids, order, offsets = state.ivf
+        lists = _top_k(centroids @ query, self.nprobe)
+        tail = np.arange(state.ivf_rows(), len(state.alive))
+        return np.concatenate([order[offsets[c]:offsets[c + 1]] for c in lists] + [tail])
+
+    @staticmethod
+    def _matches(state: Snapshot, row, filter):
+        segment, local = state.locate(row)
+        return metadata_matches(segment.metadatas[local], filter)
+
+    def _search_one(self, state: Snapshot, query, k, filter=None):
+        rows = self._candidate_rows(state, query)
+        if rows is None:
+            scores = np.empty(len(state.alive), dtype=np.float32)
+            for start in range(0, len(state.alive), BLOCK_ROWS):
+                block = np.asarray(state.vectors[start:start + BLOCK_ROWS], dtype=np.float32)
+                scores[start:start + len(block)] = block @ query
+            rows = np.arange(len(state.alive))
+        else:
+            rows = np.sort(rows)
+            scores = np.asarray(state.vectors[rows], dtype=np.float32) @ query
+
+        mask = state.alive[rows]
+        rows, scores = rows[mask], scores[mask]
+        if filter:
+            mask = np.fromiter((self._matches(state, r, filter) for r in rows), dtype=bool, count=len(rows))
+            rows, scores = rows[mask], scores[mask]
+
+        return [(int(rows[i]), float(scores[i])) for i in _top_k(scores, k)]
+
+    @staticmethod
+    def _document(state: Snapshot, row):
+        segment, local = state.locate(row)
+        return Document(page_content=segment.texts[local], metadata=dict(segment.metadatas[local]), id=segment.ids[local])
+
+    def search_batch_with_score(self, embeddings, k: int = 3, filter=None):
+        """Top-k for several query vectors at once; one matrix product per block when exact."""
+        state = self._load()
+        if not state.live:
+            return [[] for _ in embeddings]
+        queries = _normalize(embeddings)
+        if state.ivf is not None or filter:
+            return [
+                [(self._document(state, r), s) for r, s in self._search_one(state, q, k, filter)]
+                for q in queries
+            ]
+
+        scores = np.empty((len(queries), len(state.alive)), dtype=np.float32)
+        for start in range(0, len(state.alive), BLOCK_ROWS):
+            block = np.asarray(state.vectors[start:start + BLOCK_ROWS], dtype=np.float32)
+            scores[:, start:start + len(block)] = queries @ block.T
+        scores[:, ~state.alive] = -np.inf
+        k = min(k, state.live)
+        return [
+            [(self._document(state, int(i)), float(row_scores[i])) for i in _top_k(row_scores, k)]
+            for row_scores in scores
+        ]
+
+    def similarity_search_by_vector_with_score(self, embedding, k: int = 3, filter=None, **kwargs):
+        return self.search_batch_with_score([embedding], k=k, filter=filter)[0]
+
+    def similarity_search_by_vector(self, embedding, k: int = 3, filter=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter)]
+
+    def similarity_search_with_score(self, query: str, k: int = 3, filter=None, **kwargs):
+        return self.similarity_search_by_vector_with_score(self.embedding.embed_query(query), k=k, filter=filter)
+
+    def similarity_search(self, query: str, k: int = 3, filter=None, **kwargs):
+        return self.similarity_search_by_vector(self.embedding.embed_query(query), k=k, filter=filter)
@@ -0,0 +1,118 @@
+# app/rag_emb/manifest.py
+import hashlib
+import json
+import os
+import re
+
+NAMESPACE_PATTERN = r"^[A-Za-z0-9_-]{1,64}$"
+
+
+def file_hash(path: str, block_size: int = 1 << 20) -> str:
+    """Return the sha256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def settings_fingerprint(settings: dict) -> str:
+    """Stable short hash of the chunker / embedding settings."""
+    raw = json.dumps(settings, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+def chunk_id(content_hash: str, settings: dict, index: int) -> str:
+    """
+    Deterministic vector ID for the index-th chunk of a file.
+    The same file content under the same settings always maps to the same IDs,
+    so re-running ingestion overwrites instead of duplicating vectors.
+    """
+    base = hashlib.sha256(f"{content_hash}:{settings_fingerprint(settings)}".encode("utf-8")).hexdigest()
+    return f"{base[:32]}-{index:05d}"
+
+
+def valid_namespace(namespace) -> bool:
+    """Namespaces become directory names and Pinecone namespaces, so only a safe alphabet is allowed."""
+    return namespace is None or bool(re.match(NAMESPACE_PATTERN, namespace))
+
+
+def document_id(filename: str, namespace: str = None) -> str:
+    """
+    Stable ID of an uploaded document: the same file name in the same namespace
+    keeps its ID when the file is replaced, so clients can scope questions to it.
+    """
+    return hashlib.sha256(f"{namespace or ''}/{filename}".encode("utf-8")).hexdigest()[:16]
+
+
+class IngestionManifest:
+    """
+    Persistent record of what has already been embedded:
+    filename -> content hash + chunk IDs, plus the settings they were built with.
+    """
+
+    def __init__(self, path: str, settings: dict):
+        self.path = path
+        self.settings = settings
+        self.files = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            # A corrupt manifest only costs one full re-ingestion
+            return
+
+        self.files = data.get("files", {})
+        # Chunker or embedding model changed: nothing stored is current anymore
+        if data.get("settings") != self.settings:
+            for entry in self.files.values():
+                entry["hash"] = None
+
+    def is_current(self, filename: str, content_hash: str) -> bool:
+        entry = self.files.get(filename)
+        return bool(entry) and entry.get("hash") == content_hash
+
+    def filenames(self) -> set:
+        return set(self.files)
+
+    def chunk_ids(self, filename: str) -> list:
+        return list(self.files.get(filename, {}).get("chunk_ids", []))
+
+    def record(self, filename: str, content_hash: str, chunk_ids: list) -> list:
+        """Store the new chunk IDs for a file and return the IDs it replaced."""
+        previous = self.chunk_ids(filename)
+        self.files[filename] = {"hash": content_hash, "chunk_ids": list(chunk_ids)}
+        return previous
+
+    def forget(self, filename: str) -> list:
+        """Drop a file that is no longer in the data directory and return its IDs."""
+        return list(self.files.pop(filename, {}).get("chunk_ids", []))
+
+    def unreferenced(self, candidate_ids) -> list:
+        """Filter candidate IDs down to those no file in the manifest still uses."""
+        referenced = set()
+        for entry in self.files.values():
+            referenced.update(entry.get("chunk_ids", []))
+        return sorted(set(candidate_ids) - referenced)
+
+    def references(self, chunk_ids) -> dict:
+        """chunk ID -> sorted names of the files that use it, for those of chunk_ids still in use."""
+        wanted = set(chunk_ids)
+        files = {}
+        for filename in sorted(self.files):
+            for chunk in wanted.intersection(self.files[filename].get("chunk_ids", [])):
+                files.setdefault(chunk, []).append(filename)
+        return files
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"settings": self.settings, "files": self.files}, f, indent=2, sort_keys=True)
+        # Atomic replace so a crash never leaves a half-written manifest
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,188 @@
+# app/rag_emb/pipeline.py
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.rag.admission import BACKGROUND
+from app.rag.metrics import span
+from app.rag_emb.embedding_store import content_key
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        """Block until `tokens` are available, then take them."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def is_rate_limit_error(e: Exception) -> bool:
+    """Quota / 429 errors from the Google SDKs come in several exception types."""
+    text = f"{type(e).__name__} {e}".lower()
+    return any(marker in text for marker in ("429", "resourceexhausted", "resource exhausted", "quota", "rate limit"))
+
+
+class EmbeddingPipeline:
+    """
+    Batched, concurrent embedding + upsert stage for ingestion.
+
+    Chunks are grouped into batches of `batch_size`. Up to `max_in_flight`
+    batches are embedded at once, each batch is upserted by the same worker as
+    soon as its vectors arrive (so upserts overlap the next embeddings), and
+    the producer blocks when too many batches are queued. Embedding requests
+    are paced by a token bucket and retried with exponential backoff on 429s.
+    With an EmbeddingStore, chunks embedded before are loaded from disk and
+    only the misses reach the embedding API.
+    """
+
+    def __init__(self, embedding, batch_size: int = 64, max_in_flight: int = 4,
+                 requests_per_minute: float = 0, max_retries: int = 5, backoff_seconds: float = 1.0,
+                 store=None, limiter=None):
+        self.embedding = embedding
+        # Shared admission limiter; ingestion waits behind interactive /ask calls
+        self.limiter = limiter
+        self.store = store
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.bucket = TokenBucket(requests_per_minute / 60.0) if requests_per_minute else None
+
+    def embed_batch(self, texts, stats=None):
+        for attempt in range(self.max_retries + 1):
+            if self.bucket:
+                self.bucket.acquire()
+            try:
+                if self.limiter is None:
+                    with span("ingest_embed"):
+                        return self.embedding.embed_documents(texts)
+                with self.limiter.slot(BACKGROUND), span("ingest_embed"):
+                    return self.embedding.embed_documents(texts)
+            except Exception as e:
+                if attempt == self.max_retries or not is_rate_limit_error(e):
+                    raise
+                if stats is not None:
+                    stats["retries"] += 1
+                time.sleep(self.backoff_seconds * (2 ** attempt) * (1 + random.random()))
+
+    def embed_texts(self, texts, stats=None):
+        """Embeddings for texts, served from the store where possible."""
+        if self.store is None:
+            vectors = self.embed_batch(texts, stats)
+            if stats is not None:
+                stats["embedded"] += len(texts)
+            return vectors
+        keys = [content_key(text) for text in texts]
+        found = self.store.get_many(keys)
+        misses = [i for i, key in enumerate(keys) if key not in found]
+        if misses:
+            fresh = self.embed_batch([texts[i] for i in misses], stats)
+            self.store.put_many([keys[i] for i in misses], fresh)
+            found.update({keys[i]: vector for i, vector in zip(misses, fresh)})
+        if stats is not None:
+            stats["store_hits"] += len(texts) - len(misses)
+            stats["embedded"] += len(misses)
+        return [found[key] for key in keys]
+
+    def run(self, items, upsert, on_item_done=None, progress=None) -> dict:
+        """
+        items:        iterable of (key, chunks), chunks an iterable of (id, doc);
+                      both are consumed lazily, so a file never has to fit in memory.
+        upsert:       callable(ids, vectors, docs) writing one embedded batch.
+        on_item_done: callable(key), called once every chunk of that item is upserted.
+        progress:     callable(stage, count) for "embedded" and "upserted".
+        Returns throughput stats.
+        """
+        report = progress or (lambda stage, count: None)
+        done = on_item_done or (lambda key: None)
+        stats = {"chunks": 0, "batches": 0, "retries": 0, "store_hits": 0, "embedded": 0}
+        remaining = {}  # key -> chunks submitted but not yet upserted
+        open_keys = set()  # keys whose chunks are still being read
+        lock = threading.Lock()
+        errors = []
+        slots = threading.BoundedSemaphore(self.max_in_flight * 2)
+        started = time.perf_counter()
+
+        def work(batch):
+            try:
+                if errors:
+                    return
+                docs = [doc for _, _, doc in batch]
+                vectors = self.embed_texts([doc.page_content for doc in docs], stats)
+                report("embedded", len(batch))
+                upsert([chunk for _, chunk, _ in batch], vectors, docs)
+                report("upserted", len(batch))
+
+                finished = []
+                with lock:
+                    for key, _, _ in batch:
+                        remaining[key] -= 1
+                        if remaining[key] == 0 and key not in open_keys:
+                            del remaining[key]
+                            finished.append(key)
+                for key in finished:
+                    done(key)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                slots.release()
+
+        def submit(batch):
+            slots.acquire()
+            pool.submit(work, batch)
+            stats["batches"] += 1
+
+        pool = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="embed")
+        try:
+            batch = []
+            for key, chunks in items:
+                if errors:
+                    break
+                with lock:
+                    remaining[key] = 0
+                    open_keys.add(key)
+                for chunk, doc in chunks:
+                    with lock:
+                        remaining[key] += 1
+                    batch.append((key, chunk, doc))
+                    stats["chunks"] += 1
+                    if len(batch) == self.batch_size:
+                        submit(batch)
+                        batch = []
+                    if errors:
+                        break
+                with lock:
+                    open_keys.discard(key)
+                    finished = remaining[key] == 0
+                    if finished:
+                        del remaining[key]
+                if finished and not errors:
+                    done(key)
+            if batch and not errors:
+                submit(batch)
+        finally:
+            pool.shutdown(wait=True)
+
+        if errors:
+            raise errors[0]
+
+        seconds = time.perf_counter() - started
+        stats["seconds"] = round(seconds, 3)
+        stats["chunks_per_second"] = round(stats["chunks"] / seconds, 2) if seconds else 0.0
+        return stats
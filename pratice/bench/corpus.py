@@ -0,0 +1,95 @@
+# bench/corpus.py
+import os
+import random
+
+SKILLS = [
+    "python", "django", "fastapi", "java", "kotlin", "spring", "react", "typescript", "node.js", "c++",
+    "c#", "golang", "rust", "kubernetes", "docker", "terraform", "aws", "gcp", "azure", "postgresql",
+    "mongodb", "redis", "kafka", "spark", "airflow", "pytorch", "tensorflow", "langchain", "pinecone", "graphql",
+]
+ROLES = ["backend engineer", "data engineer", "ml engineer", "frontend developer", "devops engineer", "team lead"]
+COMPANIES = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark", "Wayne", "Tyrell", "Cyberdyne", "Soylent"]
+FILLER = (
+    "designed built maintained migrated improved reduced latency scaled services pipelines dashboards "
+    "customers platform reliability deployment testing monitoring mentoring architecture features"
+).split()
+QUESTION_TEMPLATES = [
+    "What experience does the candidate have with {skill}?",
+    "Which projects used {skill} and {other}?",
+    "Where did the candidate work as a {role}?",
+    "Summarize the {role} work at {company}.",
+    "How many years of {skill} experience are listed?",
+]
+
+LINES_PER_PAGE = 48
+WORDS_PER_LINE = 12
+
+
+def _escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages):
+    """Minimal PDF (Helvetica text, one content stream per page) that pypdf extracts line by line."""
+    page_ids = [4 + 2 * i for i in range(len(pages))]
+    out, offsets = [b"%PDF-1.4\n"], []
+
+    def add(number: int, content: bytes):
+        offsets.append(sum(len(part) for part in out))
+        out.append(f"{number} 0 obj\n".encode() + content + b"\nendobj\n")
+
+    add(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    add(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+    add(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for page_id, text in zip(page_ids, pages):
+        add(page_id, (
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>"
+        ).encode())
+        lines = " ".join(f"({_escape(line)}) '" for line in text.split("\n"))
+        stream = f"BT /F1 9 Tf 40 760 Td 11 TL {lines} ET".encode("latin-1", "replace")
+        add(page_id + 1, f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream")
+
+    xref = sum(len(part) for part in out)
+    table = "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    out.append(
+        f"xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n{table}"
+        f"trailer\n<< /Size {len(offsets) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    )
+    with open(path, "wb") as f:
+        f.write(b"".join(out))
+
+
+def _page(rng: random.Random, doc: int, page: int) -> str:
+    lines = [f"Candidate {doc} - page {page + 1}"]
+    while len(lines) < LINES_PER_PAGE:
+        role, company = rng.choice(ROLES), rng.choice(COMPANIES)
+        skills = rng.sample(SKILLS, 3)
+        words = [f"{role} at {company}:"] + rng.sample(FILLER, 5) + skills + [f"{rng.randint(1, 9)} years"]
+        line = " ".join(words)
+        lines.append(" ".join(line.split()[:WORDS_PER_LINE]))
+    return "\n".join(lines)
+
+
+def generate_corpus(directory: str, documents: int, pages: int, seed: int = 0):
+    """Write `documents` CV-like PDFs of `pages` pages each; returns their paths. Same seed, same bytes."""
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for doc in range(documents):
+        path = os.path.join(directory, f"candidate_{doc:03d}.pdf")
+        write_pdf(path, [_page(rng, doc, page) for page in range(pages)])
+        paths.append(path)
+    return paths
+
+
+def generate_questions(count: int, seed: int = 0):
+    rng = random.Random(f"questions:{seed}")
+    questions = []
+    for _ in range(count):
+        skill, other = rng.sample(SKILLS, 2)
+        questions.append(rng.choice(QUESTION_TEMPLATES).format(
+            skill=skill, other=other, role=rng.choice(ROLES), company=rng.choice(COMPANIES)
+        ))
+    return questions
@@ -0,0 +1,179 @@
+# bench/fakes.py
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import numpy as np
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+class InjectedFailure(Exception):
+    """Raised by a fake when failure injection fires."""
+
+
+class Profile:
+    """
+    Latency and failure model for one fake upstream: each call waits
+    latency_ms +- jitter_ms (uniform) and fails with probability
+    failure_rate. Draws come from a seeded generator, so a run with the
+    same settings sees the same sequence of delays and failures.
+    """
+
+    def __init__(self, name: str, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 failure_rate: float = 0.0, seed: int = 0):
+        self.name = name
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self._random = random.Random(f"{name}:{seed}")
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "failures": 0}
+
+    def _draw(self):
+        with self._lock:
+            self.stats["calls"] += 1
+            delay = self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)
+            failed = self._random.random() < self.failure_rate
+            if failed:
+                self.stats["failures"] += 1
+        return max(0.0, delay) / 1000, failed
+
+    def wait(self):
+        delay, failed = self._draw()
+        time.sleep(delay)
+        if failed:
+            raise InjectedFailure(f"{self.name}: injected failure")
+
+    async def await_(self):
+        delay, failed = self._draw()
+        await asyncio.sleep(delay)
+        if failed:
+            raise InjectedFailure(f"{self.name}: injected failure")
+
+
+def hashed_embedding(text: str, dimension: int):
+    """Deterministic bag-of-words vector: every word lands in a hashed bucket, then L2-normalized."""
+    vector = np.zeros(dimension, dtype=np.float32)
+    for word in WORD_RE.findall(text.lower()):
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dimension
+        vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+    norm = float(np.linalg.norm(vector))
+    if norm:
+        vector /= norm
+    else:
+        vector[0] = 1.0
+    return vector.tolist()
+
+
+class FakeEmbeddings:
+    """Stand-in for GoogleGenerativeAIEmbeddings (same method names and signatures)."""
+
+    def __init__(self, profile: Profile, dimension: int = 768, model: str = "models/embedding-001"):
+        self.profile = profile
+        self.dimension = dimension
+        self.model = model
+
+    def embed_documents(self, texts, task_type=None, **kwargs):
+        self.profile.wait()
+        return [hashed_embedding(text, self.dimension) for text in texts]
+
+    def embed_query(self, text, task_type=None, **kwargs):
+        self.profile.wait()
+        return hashed_embedding(text, self.dimension)
+
+    async def aembed_documents(self, texts, task_type=None, **kwargs):
+        await self.profile.await_()
+        return [hashed_embedding(text, self.dimension) for text in texts]
+
+    async def aembed_query(self, text, task_type=None, **kwargs):
+        await self.profile.await_()
+        return hashed_embedding(text, self.dimension)
+
+
+class _Response:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _Stream:
+    def __init__(self, pieces, profile: Profile):
+        self.pieces = pieces
+        self.profile = profile
+
+    async def __aiter__(self):
+        for piece in self.pieces:
+            # Spread the generation time over the stream, like a real model
+            await asyncio.sleep(self.profile.latency_ms / 1000 / max(1, len(self.pieces)))
+            yield _Response(piece)
+
+
+class FakeGenerativeModel:
+    """
+    Stand-in for genai.GenerativeModel as LLMHandler uses it. Intent prompts
+    get a fixed JSON classification; answer prompts get an answer built from
+    the first words of the context, so its length follows the context size.
+    """
+
+    def __init__(self, profile: Profile, answer_words: int = 60):
+        self.profile = profile
+        self.answer_words = answer_words
+
+    def _text(self, prompt: str) -> str:
+        if "intent classification system" in prompt:
+            return json.dumps({"Q": "benchmark query", "R": "benchmark request", "I": "skills_inquiry",
+                               "Reason": "fake model"})
+        context = prompt.split("Context:", 1)[-1].split("Question:", 1)[0]
+        words = context.split()[:self.answer_words]
+        return " ".join(words) or "No answer."
+
+    def generate_content(self, prompt, request_options=None, **kwargs):
+        self.profile.wait()
+        return _Response(self._text(prompt))
+
+    async def generate_content_async(self, prompt, stream: bool = False, **kwargs):
+        if not stream:
+            await self.profile.await_()
+            return _Response(self._text(prompt))
+        # Time to first token is 10% of the call, the rest is spread over the pieces
+        delay, failed = self.profile._draw()
+        await asyncio.sleep(delay * 0.1)
+        if failed:
+            raise InjectedFailure(f"{self.profile.name}: injected failure")
+        words = self._text(prompt).split()
+        pieces = [" ".join(words[i:i + 8]) + " " for i in range(0, len(words), 8)]
+        return _Stream(pieces, Profile(self.profile.name, latency_ms=delay * 900))
+
+    def count_tokens(self, text):
+        return {"total_tokens": math.ceil(len(str(text)) / 4)}
+
+
+class SlowVectorStore:
+    """
+    Wraps a local vector store (LocalVectorStore) and adds the latency and
+    failures of a remote one such as Pinecone to every query, upsert and delete.
+    """
+
+    def __init__(self, store, profile: Profile):
+        self._store = store
+        self.profile = profile
+
+    def similarity_search_by_vector_with_score(self, *args, **kwargs):
+        self.profile.wait()
+        return self._store.similarity_search_by_vector_with_score(*args, **kwargs)
+
+    def add_vectors(self, *args, **kwargs):
+        self.profile.wait()
+        return self._store.add_vectors(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        self.profile.wait()
+        return self._store.delete(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._store, name)
@@ -0,0 +1,120 @@
+# bench/import_time.py
+"""
+Import-time budget for the API process. Every uvicorn worker (and every
+autoscaled container) pays `import app.rag.main` before it accepts a
+connection, so the SDKs behind the RAG service (Gemini, LangChain, Pinecone)
+must only load in the background startup. Run from pratice/:
+
+    python -m bench.import_time
+    python -m bench.import_time --budget-ms 800 --output bench/results/import_time.json
+
+Each run imports the app in a fresh interpreter with -X importtime. The
+median import time is checked against the budget, and none of the DEFERRED
+packages may be imported at all; the exit status is 1 when either check
+fails, so CI can run it as a regression gate.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from bench.run import git_commit
+
+MODULE = "app.rag.main"
+BUDGET_MS = 1000.0  # default median import budget, also enforced by tests/test_import_time.py
+DEFERRED = ("langchain_google_genai", "langchain_pinecone", "langchain_core", "pinecone", "google", "pypdf")
+PRATICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(stderr: str):
+    """[(module, self us, cumulative us)] from -X importtime output, in import order."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # header line
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure(module: str = MODULE) -> dict:
+    """Import module once in a fresh interpreter; returns its import time, process time and per-package cost."""
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PRATICE_DIR, capture_output=True, text=True
+    )
+    process_ms = (time.perf_counter() - started) * 1000
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{completed.stderr[-2000:]}")
+
+    rows = parse_importtime(completed.stderr)
+    packages = {}
+    for name, self_us, _ in rows:
+        root = name.split(".")[0]
+        packages[root] = packages.get(root, 0) + self_us
+    return {
+        "import_ms": next(cumulative for name, _, cumulative in rows if name == module) / 1000,
+        "process_ms": process_ms,
+        "packages": packages,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=f"Import-time budget for {MODULE}")
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS, help="maximum median import time")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to measure")
+    parser.add_argument("--top", type=int, default=10, help="slowest packages to report")
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    runs = [measure() for _ in range(args.runs)]
+    median_ms = statistics.median(run["import_ms"] for run in runs)
+
+    packages = {}
+    for run in runs:
+        for root, self_us in run["packages"].items():
+            packages.setdefault(root, []).append(self_us / 1000)
+    slowest = sorted(packages.items(), key=lambda item: statistics.median(item[1]), reverse=True)[:args.top]
+    deferred = sorted(root for root in packages if root in DEFERRED)
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "module": MODULE,
+        "budget_ms": args.budget_ms,
+        "results": {
+            "import_ms": {"median": round(median_ms, 1), "runs": [round(run["import_ms"], 1) for run in runs]},
+            "process_ms": round(statistics.median(run["process_ms"] for run in runs), 1),
+            "slowest_packages_ms": [[root, round(statistics.median(times), 1)] for root, times in slowest],
+            "deferred_imported": deferred,
+        },
+    }
+    text = json.dumps(report, indent=2, sort_keys=True) + "\n"
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+    failures = []
+    if median_ms > args.budget_ms:
+        failures.append(f"median import time {median_ms:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+    if deferred:
+        failures.append(f"{MODULE} imports {', '.join(deferred)}; load them in the background startup instead")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
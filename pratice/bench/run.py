@@ -0,0 +1,335 @@
+# bench/run.py
+"""
+Offline benchmark for ingestion and question answering.
+
+Gemini, the embedding API and Pinecone are replaced by the fakes in
+bench/fakes.py (configurable latency and failure injection) and the real
+FastAPI app is driven in-process, so the numbers measure this code base
+rather than the network. Run from pratice/:
+
+    python -m bench.run --output bench/results/current.json
+    python -m bench.run --concurrency 1 8 32 --llm-latency 400 --compare bench/results/baseline.json
+
+Results are written as sorted, indented JSON so two runs can be diffed;
+--compare prints the change of every numeric metric against a saved run.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import resource  # not available on Windows
+except ImportError:
+    resource = None
+
+from bench.corpus import generate_corpus, generate_questions
+from bench.fakes import FakeEmbeddings, FakeGenerativeModel, Profile, SlowVectorStore
+
+
+def percentile(values, p: float):
+    """Nearest-rank percentile of a list of seconds, in milliseconds."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 2)
+
+
+def latency_summary(values) -> dict:
+    return {
+        "count": len(values),
+        "p50_ms": percentile(values, 0.50),
+        "p95_ms": percentile(values, 0.95),
+        "p99_ms": percentile(values, 0.99),
+        "mean_ms": round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+        "max_ms": round(max(values) * 1000, 2) if values else 0.0,
+    }
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+
+
+class MemoryProbe:
+    """Peak process RSS after a phase, plus the phase's Python heap peak when tracemalloc is on."""
+
+    def __init__(self, trace: bool):
+        self.trace = trace
+        if trace:
+            tracemalloc.start()
+
+    def start_phase(self):
+        if self.trace:
+            tracemalloc.reset_peak()
+
+    def end_phase(self) -> dict:
+        memory = {"peak_rss_mb": peak_rss_mb()}
+        if self.trace:
+            memory["python_heap_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+        return memory
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def configure_environment(workdir: str):
+    """Point every on-disk store at the scratch directory; must run before app.config is imported."""
+    os.environ["GOOGLE_API_KEY"] = os.environ.get("GOOGLE_API_KEY") or "bench"
+    os.environ["VECTOR_BACKEND"] = "local"
+    os.environ["LOCAL_INDEX_DIR"] = os.path.join(workdir, "index")
+    os.environ["LEXICAL_INDEX_DIR"] = os.path.join(workdir, "lexical")
+    os.environ["EMBEDDING_STORE_DIR"] = os.path.join(workdir, "embeddings")
+    os.environ["DEDUP_INDEX_DIR"] = os.path.join(workdir, "dedup")
+    os.environ["EMBEDDING_CACHE_DB"] = ""
+
+
+def build_service(workdir: str, profiles: dict):
+    """The real RAGService, with the embedding client, vector store and Gemini model swapped for fakes."""
+    from app.rag_emb import embedding as embedding_module
+    from app.rag_emb.local_store import LocalVectorStore
+    from app.rag.services import RAGService
+
+    embeddings = FakeEmbeddings(profiles["embedding"])
+    embedding_module.GoogleGenerativeAIEmbeddings = lambda **kwargs: embeddings
+    embedding_module.LocalVectorStore = lambda *args, **kwargs: SlowVectorStore(
+        LocalVectorStore(*args, **kwargs), profiles["vector"]
+    )
+    service = RAGService(data_dir=os.path.join(workdir, "data"))
+    service.llm_handler.structured_model = FakeGenerativeModel(profiles["llm"])
+    return service
+
+
+def reset_caches(service):
+    """Fresh query-embedding and answer caches, so every concurrency level starts cold."""
+    from app.config import EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_TTL, ANSWER_CACHE_SIZE, ANSWER_CACHE_THRESHOLD
+    from app.rag.cache import AnswerCache, EmbeddingCache
+    service.vector_handler.embedding_cache = EmbeddingCache(max_size=EMBEDDING_CACHE_SIZE, ttl_seconds=EMBEDDING_CACHE_TTL)
+    service.answer_cache = AnswerCache(max_size=ANSWER_CACHE_SIZE, threshold=ANSWER_CACHE_THRESHOLD)
+
+
+async def run_ingestion(client, paths, concurrency: int, poll_seconds: float = 0.02) -> dict:
+    """Upload every PDF (at most `concurrency` at once) and wait for each ingestion job to finish."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, jobs = [], []
+
+    async def ingest(path):
+        async with semaphore:
+            started = time.perf_counter()
+            with open(path, "rb") as f:
+                response = await client.post(
+                    "/upload", files={"file": (os.path.basename(path), f.read(), "application/pdf")}
+                )
+            response.raise_for_status()
+            job_id = response.json()["job_id"]
+            while True:
+                job = (await client.get(f"/upload/{job_id}")).json()
+                if job["status"] in ("succeeded", "failed"):
+                    break
+                await asyncio.sleep(poll_seconds)
+            latencies.append(time.perf_counter() - started)
+            jobs.append(job)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[ingest(path) for path in paths])
+    wall = time.perf_counter() - started
+    pages = sum(job["progress"].get("pages", 0) for job in jobs)
+    chunks = sum(job["progress"].get("chunks", 0) for job in jobs)
+    return {
+        "files": len(paths),
+        "failed": sum(job["status"] == "failed" for job in jobs),
+        "pages": pages,
+        "chunks": chunks,
+        "wall_seconds": round(wall, 3),
+        "pages_per_second": round(pages / wall, 2) if wall else 0.0,
+        "chunks_per_second": round(chunks / wall, 2) if wall else 0.0,
+        "job_latency": latency_summary(latencies),
+    }
+
+
+async def run_questions(client, questions, requests: int, concurrency: int, endpoint: str,
+                        include_intent: bool) -> dict:
+    """Send `requests` questions (cycling through the pool) from `concurrency` concurrent clients."""
+    latencies = []
+    outcomes = {"ok": 0, "cache_hit": 0, "error": 0, "overloaded": 0}
+    next_index = iter(range(requests))
+
+    async def ask(question):
+        body = {"question": question, "include_intent": include_intent}
+        if endpoint == "stream":
+            response = await client.post("/ask/stream", json=body)
+            if response.status_code != 200:
+                return response.status_code, None
+            done = [line for line in response.text.split("\n\n") if line.startswith("event: done")]
+            return 200, json.loads(done[0].split("data: ", 1)[1]) if done else {"intent": {"I": "error"}}
+        response = await client.post("/ask", json=body)
+        return response.status_code, response.json() if response.status_code == 200 else None
+
+    async def worker():
+        for index in next_index:
+            started = time.perf_counter()
+            status, result = await ask(questions[index % len(questions)])
+            latencies.append(time.perf_counter() - started)
+            if status in (429, 503):
+                outcomes["overloaded"] += 1
+            elif status != 200 or (result.get("intent") or {}).get("I") == "error":
+                outcomes["error"] += 1
+            elif result.get("cache_hit"):
+                outcomes["cache_hit"] += 1
+            else:
+                outcomes["ok"] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    wall = time.perf_counter() - started
+    return {
+        "requests": requests,
+        **outcomes,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(requests / wall, 2) if wall else 0.0,
+        "latency": latency_summary(latencies),
+    }
+
+
+async def benchmark(args, workdir: str) -> dict:
+    import httpx
+
+    profiles = {
+        "embedding": Profile("embedding", args.embed_latency, args.jitter * args.embed_latency,
+                             args.embed_failure_rate, args.seed),
+        "vector": Profile("vector", args.vector_latency, args.jitter * args.vector_latency,
+                          args.vector_failure_rate, args.seed),
+        "llm": Profile("llm", args.llm_latency, args.jitter * args.llm_latency, args.llm_failure_rate, args.seed),
+    }
+    memory = MemoryProbe(args.trace_memory)
+    corpus = generate_corpus(os.path.join(workdir, "corpus"), args.docs, args.pages, seed=args.seed)
+    questions = generate_questions(args.questions, seed=args.seed)
+
+    from app.config import INGEST_WORKERS
+    from app.rag.jobs import IngestionJobQueue
+    from app.rag.main import app
+
+    service = build_service(workdir, profiles)
+    jobs = IngestionJobQueue(service.pdf_embedder, workers=INGEST_WORKERS)
+    await jobs.start()
+    app.state.rag_service = service
+    app.state.ingestion_jobs = jobs
+    results = {}
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            memory.start_phase()
+            results["ingestion"] = await run_ingestion(client, corpus, args.upload_concurrency)
+            results["ingestion"]["memory"] = memory.end_phase()
+
+            results["ask"] = {}
+            for concurrency in args.concurrency:
+                reset_caches(service)
+                memory.start_phase()
+                level = await run_questions(
+                    client, questions, args.requests, concurrency, args.endpoint, not args.no_intent
+                )
+                level["memory"] = memory.end_phase()
+                results["ask"][f"concurrency_{concurrency}"] = level
+    finally:
+        await jobs.stop()
+        service.pdf_embedder.close()
+
+    results["upstream_calls"] = {name: dict(profile.stats) for name, profile in profiles.items()}
+    return results
+
+
+def flatten(data, prefix=""):
+    for key, value in data.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            yield from flatten(value, name)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield name, value
+
+
+def compare(baseline: dict, current: dict) -> str:
+    """One line per numeric metric present in both runs: baseline, current and relative change."""
+    old = dict(flatten(baseline.get("results", {})))
+    lines = [f"{'metric':<52} {'baseline':>12} {'current':>12} {'change':>9}"]
+    for name, value in flatten(current.get("results", {})):
+        if name not in old:
+            continue
+        change = f"{(value - old[name]) / old[name] * 100:+.1f}%" if old[name] else "n/a"
+        lines.append(f"{name:<52} {old[name]:>12} {value:>12} {change:>9}")
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline RAG benchmark with fake Gemini, embeddings and Pinecone")
+    parser.add_argument("--docs", type=int, default=10, help="PDFs in the generated corpus")
+    parser.add_argument("--pages", type=int, default=5, help="pages per PDF")
+    parser.add_argument("--questions", type=int, default=50, help="distinct questions in the pool")
+    parser.add_argument("--requests", type=int, default=200, help="questions sent per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="concurrent clients")
+    parser.add_argument("--upload-concurrency", type=int, default=4, help="uploads in flight")
+    parser.add_argument("--endpoint", choices=["ask", "stream"], default="ask")
+    parser.add_argument("--no-intent", action="store_true", help="send include_intent=false")
+    parser.add_argument("--embed-latency", type=float, default=50.0, help="ms per embedding call")
+    parser.add_argument("--vector-latency", type=float, default=30.0, help="ms per vector store call")
+    parser.add_argument("--llm-latency", type=float, default=300.0, help="ms per Gemini call")
+    parser.add_argument("--jitter", type=float, default=0.2, help="latency jitter as a fraction of the latency")
+    parser.add_argument("--embed-failure-rate", type=float, default=0.0)
+    parser.add_argument("--vector-failure-rate", type=float, default=0.0)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="also report per-phase Python heap peaks (tracemalloc slows the run)")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="saved results JSON to compare against")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directory")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix="rag-bench-")
+    configure_environment(workdir)
+    random.seed(args.seed)
+    try:
+        results = asyncio.run(benchmark(args, workdir))
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "settings": {key: value for key, value in sorted(vars(args).items()) if key not in ("output", "compare", "keep")},
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, sort_keys=True) + "\n"
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print(compare(json.load(f), report))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,20 @@
+import os
+import sys
 import chainlit as cl
-import requests
 
-API_URL = "http://localhost:8000"  # FastAPI backend URL
+# Run from pratice/: make the shared client package importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag_client.client import RAGClient, RAGClientError
 
-# -----------------------------------
-# ✅ Plugin-style wrapper class
-# -----------------------------------
-class RAGPluginClient:
-    def __init__(self, api_url: str):
-        self.api_url = api_url
+API_URL = os.getenv("RAG_API_URL", "http://localhost:8000")  # FastAPI backend URL
 
-    def upload_file(self, file_name: str, file_content: bytes) -> requests.Response:
-        files = {
-            "file": (file_name, file_content, "application/pdf")
-        }
-        return requests.post(f"{self.api_url}/upload", files=files)
+# ✅ One pooled async client shared by every chat session
+rag_client = RAGClient(API_URL)
 
-    def ask_question(self, question: str) -> requests.Response:
-        return requests.post(f"{self.api_url}/ask", params={"question": question})
 
-
-# ✅ Create plugin client instance globally
-rag_client = RAGPluginClient(API_URL)
+def session_namespace():
+    # ✅ Each chat session uploads into its own namespace, so questions only search that user's CV
+    return cl.user_session.get("id")
 
 
 @cl.on_chat_start
@@ -42,12 +35,15 @@ async def start_chat():
         file_content = f.read()
 
     try:
-        # ✅ Use plugin to upload _file
-        response = rag_client.upload_file(uploaded_file.name, file_content)
-        if response.status_code == 200:
+        # ✅ Upload, then wait until the CV is searchable (ingestion runs in the background)
+        job = await rag_client.aupload(uploaded_file.name, file_content, namespace=session_namespace())
+        job = await rag_client.await_job(job)
+        if job.get("status") == "succeeded":
             await cl.Message("✅ File uploaded! You can now ask questions.").send()
         else:
-            await cl.Message(f"❌ Upload failed ({response.status_code}).").send()
+            await cl.Message(f"❌ Processing failed: {job.get('error')}").send()
+    except RAGClientError as e:
+        await cl.Message(f"❌ Upload failed ({str(e)}).").send()
     except Exception as e:
         await cl.Message(f"❌ Upload error: {str(e)}").send()
 
@@ -57,13 +53,28 @@ async def handle_question(message: cl.Message):
     question = message.content.strip()
 
     try:
-        # ✅ Use plugin to send the question
-        response = rag_client.ask_question(question)
-
-        if response.status_code == 200:
-            answer = response.json().get("answer", "🤖 No answer found.")
-            await cl.Message(answer).send()
-        else:
-            await cl.Message(f"❌ Failed to get response ({response.status_code}).").send()
+        # ✅ Stream the answer on the event loop; Chainlit never shows intent, so skip that LLM call
+        reply = cl.Message(content="")
+        async for event, data in rag_client.astream(
+            question, include_intent=False, namespace=session_namespace()
+        ):
+            if event == "token":
+                await reply.stream_token(data["text"])
+            elif event == "error":
+                reply.content = data.get("answer", "🤖 No answer found.")
+        if not reply.content:
+            reply.content = "🤖 No answer found."
+        await reply.send()
+    except RAGClientError as e:
+        await cl.Message(f"❌ Failed to get response ({str(e)}).").send()
     except Exception as e:
         await cl.Message(f"❌ Request error: {str(e)}").send()
+
+
+@cl.on_chat_end
+async def end_chat():
+    # ✅ Drop the session's CV and its vectors; idle namespaces are also swept by the backend
+    try:
+        await rag_client.aevict_namespace(session_namespace())
+    except RAGClientError:
+        pass
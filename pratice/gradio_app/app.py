@@ -1,24 +1,42 @@
+import os
+import sys
 import gradio as gr
-import requests
 
-API_URL = "http://localhost:8000/ask"  # FastAPI endpoint
-chat_history = []
+# Run from pratice/: make the shared client package importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag_client.client import RAGClient, RAGClientError
+from rag_client.history import ChatHistory
 
+client = RAGClient()  # one pooled client for every user
 
-def chat_fn(message):
-    chat_history.append(("You", message))
+
+def as_pairs(history):
+    return [("You" if msg["role"] == "user" else "AI", msg["content"]) for msg in history]
+
+
+async def chat_fn(message, history):
+    """history is this user's own ChatHistory (gr.State), never shared between sessions."""
+    history.append("user", message)
+    history.append("bot", "")
 
     try:
-        response = requests.post(API_URL, params={"question": message})
-        if response.status_code == 200:
-            reply = response.json().get("answer", "🤖 No answer found.")
-        else:
-            reply = f"❌ Error: {response.status_code}"
+        reply = ""
+        # Gradio never shows intent, so skip that LLM call
+        async for event, data in client.astream(message, include_intent=False):
+            if event == "token":
+                reply += data["text"]
+                history.update_last(content=reply)
+                yield as_pairs(history), history
+            elif event in ("done", "error"):
+                reply = data.get("answer", reply)
+        reply = reply or "🤖 No answer found."
+    except RAGClientError as e:
+        reply = f"❌ Error: {str(e)}"
     except Exception as e:
         reply = f"❌ Exception: {str(e)}"
 
-    chat_history.append(("AI", reply))
-    return [(sender, msg) for sender, msg in chat_history]
+    history.update_last(content=reply)
+    yield as_pairs(history), history
 
 
 with gr.Blocks(
@@ -68,6 +86,7 @@ with gr.Blocks(
     )
 
     chatbot = gr.Chatbot(elem_id="chatbox", label="", height=550)
+    history = gr.State(ChatHistory())
 
     with gr.Row():
         user_input = gr.Textbox(
@@ -78,7 +97,7 @@ with gr.Blocks(
         )
         send_btn = gr.Button("Send", scale=1)
 
-    send_btn.click(fn=chat_fn, inputs=[user_input], outputs=[chatbot])
-    user_input.submit(fn=chat_fn, inputs=[user_input], outputs=[chatbot])
+    send_btn.click(fn=chat_fn, inputs=[user_input, history], outputs=[chatbot, history])
+    user_input.submit(fn=chat_fn, inputs=[user_input, history], outputs=[chatbot, history])
 
 demo.launch()
@@ -0,0 +1,268 @@
+# rag_client/client.py
+import asyncio
+import json
+import os
+import random
+import time
+import httpx
+
+DEFAULT_API_URL = os.getenv("RAG_API_URL", "http://localhost:8000")
+# Answers can take a while; the read timeout bounds the wait between two bytes, not the whole answer
+READ_TIMEOUT = float(os.getenv("RAG_CLIENT_TIMEOUT", "120"))
+RETRIES = int(os.getenv("RAG_CLIENT_RETRIES", "3"))
+
+RETRY_STATUSES = {429, 502, 503, 504}
+ACTIVE_JOB_STATUSES = ("queued", "running")
+
+
+class RAGClientError(Exception):
+    """The backend answered with an error status, or could not be reached after all retries."""
+
+    def __init__(self, message: str, status_code: int = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _parse_sse(lines):
+    event = "message"
+    for line in lines:
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            yield event, json.loads(line[len("data:"):].strip())
+
+
+async def _aparse_sse(lines):
+    event = "message"
+    async for line in lines:
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            yield event, json.loads(line[len("data:"):].strip())
+
+
+def _error(response: httpx.Response) -> RAGClientError:
+    try:
+        detail = response.json().get("detail", response.text)
+    except ValueError:
+        detail = response.text
+    return RAGClientError(f"{response.status_code}: {detail}", status_code=response.status_code)
+
+
+class RAGClient:
+    """
+    Client for the RAG backend shared by the Streamlit, Gradio and Chainlit
+    frontends. One instance keeps a pool of keep-alive connections (a
+    separate pool for the sync and async API) and is safe to share between
+    sessions; create it once per process.
+
+    Requests that fail to connect, time out or get 429/502/503/504 are
+    retried with exponential backoff, honoring Retry-After. Streams are only
+    retried before their first event.
+    """
+
+    def __init__(self, base_url: str = DEFAULT_API_URL, read_timeout: float = READ_TIMEOUT,
+                 retries: int = RETRIES, backoff_seconds: float = 0.5, max_backoff_seconds: float = 10.0,
+                 max_connections: int = 100, max_keepalive: int = 20):
+        self.base_url = base_url.rstrip("/")
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self._timeout = httpx.Timeout(connect=5.0, read=read_timeout, write=30.0, pool=10.0)
+        self._limits = httpx.Limits(
+            max_connections=max_connections, max_keepalive_connections=max_keepalive, keepalive_expiry=30.0
+        )
+        self._sync = None
+        self._async = None
+
+    # ---------- connection pools ----------
+    def _client(self) -> httpx.Client:
+        if self._sync is None:
+            self._sync = httpx.Client(base_url=self.base_url, timeout=self._timeout, limits=self._limits)
+        return self._sync
+
+    def _aclient(self) -> httpx.AsyncClient:
+        if self._async is None:
+            self._async = httpx.AsyncClient(base_url=self.base_url, timeout=self._timeout, limits=self._limits)
+        return self._async
+
+    def close(self):
+        if self._sync is not None:
+            self._sync.close()
+            self._sync = None
+
+    async def aclose(self):
+        if self._async is not None:
+            await self._async.aclose()
+            self._async = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    # ---------- retries ----------
+    def _delay(self, attempt: int, response: httpx.Response = None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(self.max_backoff_seconds, float(retry_after))
+            except ValueError:
+                pass
+        delay = min(self.max_backoff_seconds, self.backoff_seconds * (2 ** attempt))
+        return delay * (0.5 + random.random() / 2)
+
+    def _should_retry(self, attempt: int, response: httpx.Response) -> bool:
+        return response.status_code in RETRY_STATUSES and attempt < self.retries
+
+    def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        for attempt in range(self.retries + 1):
+            try:
+                response = self._client().request(method, path, **kwargs)
+            except httpx.TransportError as e:
+                if attempt == self.retries:
+                    raise RAGClientError(f"Backend unreachable: {e}") from e
+                time.sleep(self._delay(attempt))
+                continue
+            if self._should_retry(attempt, response):
+                time.sleep(self._delay(attempt, response))
+                continue
+            if response.is_error:
+                raise _error(response)
+            return response
+
+    async def _arequest(self, method: str, path: str, **kwargs) -> httpx.Response:
+        for attempt in range(self.retries + 1):
+            try:
+                response = await self._aclient().request(method, path, **kwargs)
+            except httpx.TransportError as e:
+                if attempt == self.retries:
+                    raise RAGClientError(f"Backend unreachable: {e}") from e
+                await asyncio.sleep(self._delay(attempt))
+                continue
+            if self._should_retry(attempt, response):
+                await asyncio.sleep(self._delay(attempt, response))
+                continue
+            if response.is_error:
+                raise _error(response)
+            return response
+
+    # ---------- request bodies ----------
+    @staticmethod
+    def _question(question: str, include_intent: bool, options: dict) -> dict:
+        """
+        JSON body for /ask and /ask/stream; options are source, document_id,
+        namespace, k, dense_weight and lexical_weight.
+        """
+        return {"question": question, "include_intent": include_intent,
+                **{key: value for key, value in options.items() if value is not None}}
+
+    @staticmethod
+    def _file(filename: str, content: bytes) -> dict:
+        return {"file": (os.path.basename(filename), content, "application/pdf")}
+
+    @staticmethod
+    def _form(namespace: str) -> dict:
+        return {"namespace": namespace} if namespace else {}
+
+    # ---------- sync API (Streamlit) ----------
+    def upload(self, filename: str, content: bytes, namespace: str = None) -> dict:
+        """
+        Upload a PDF; returns the queued ingestion job (see job_status) with the
+        document_id. A namespace keeps it private to that tenant or chat session.
+        """
+        response = self._request("POST", "/upload", files=self._file(filename, content), data=self._form(namespace))
+        return response.json()
+
+    def job_status(self, job_id: str) -> dict:
+        return self._request("GET", f"/upload/{job_id}").json()
+
+    def wait_for_job(self, job: dict, poll_seconds: float = 1.0) -> dict:
+        """Poll an upload's job until ingestion succeeded or failed."""
+        while job.get("status") in ACTIVE_JOB_STATUSES:
+            time.sleep(poll_seconds)
+            job = self.job_status(job["job_id"])
+        return job
+
+    def evict_namespace(self, namespace: str) -> dict:
+        """Delete everything uploaded to a namespace, e.g. when its chat session ends."""
+        return self._request("DELETE", f"/namespaces/{namespace}").json()
+
+    def ask(self, question: str, include_intent: bool = True, **options) -> dict:
+        return self._request("POST", "/ask", json=self._question(question, include_intent, options)).json()
+
+    def stream(self, question: str, include_intent: bool = True, **options):
+        """Yield (event, data) pairs from /ask/stream: retrieval, token, intent, then done or error."""
+        body = self._question(question, include_intent, options)
+        for attempt in range(self.retries + 1):
+            started = False
+            try:
+                with self._client().stream("POST", "/ask/stream", json=body) as response:
+                    if self._should_retry(attempt, response):
+                        delay = self._delay(attempt, response)
+                    else:
+                        if response.is_error:
+                            response.read()
+                            raise _error(response)
+                        for item in _parse_sse(response.iter_lines()):
+                            started = True
+                            yield item
+                        return
+            except httpx.TransportError as e:
+                if started or attempt == self.retries:
+                    raise RAGClientError(f"Backend unreachable: {e}") from e
+                delay = self._delay(attempt)
+            time.sleep(delay)
+
+    # ---------- async API (Gradio, Chainlit) ----------
+    async def aupload(self, filename: str, content: bytes, namespace: str = None) -> dict:
+        response = await self._arequest(
+            "POST", "/upload", files=self._file(filename, content), data=self._form(namespace)
+        )
+        return response.json()
+
+    async def ajob_status(self, job_id: str) -> dict:
+        return (await self._arequest("GET", f"/upload/{job_id}")).json()
+
+    async def await_job(self, job: dict, poll_seconds: float = 1.0) -> dict:
+        while job.get("status") in ACTIVE_JOB_STATUSES:
+            await asyncio.sleep(poll_seconds)
+            job = await self.ajob_status(job["job_id"])
+        return job
+
+    async def aevict_namespace(self, namespace: str) -> dict:
+        return (await self._arequest("DELETE", f"/namespaces/{namespace}")).json()
+
+    async def aask(self, question: str, include_intent: bool = True, **options) -> dict:
+        response = await self._arequest("POST", "/ask", json=self._question(question, include_intent, options))
+        return response.json()
+
+    async def astream(self, question: str, include_intent: bool = True, **options):
+        """Async version of stream()."""
+        body = self._question(question, include_intent, options)
+        for attempt in range(self.retries + 1):
+            started = False
+            try:
+                async with self._aclient().stream("POST", "/ask/stream", json=body) as response:
+                    if self._should_retry(attempt, response):
+                        delay = self._delay(attempt, response)
+                    else:
+                        if response.is_error:
+                            await response.aread()
+                            raise _error(response)
+                        async for item in _aparse_sse(response.aiter_lines()):
+                            started = True
+                            yield item
+                        return
+            except httpx.TransportError as e:
+                if started or attempt == self.retries:
+                    raise RAGClientError(f"Backend unreachable: {e}") from e
+                delay = self._delay(attempt)
+            await asyncio.sleep(delay)
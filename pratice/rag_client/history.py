@@ -0,0 +1,38 @@
+# rag_client/history.py
+import os
+from collections import deque
+
+MAX_MESSAGES = int(os.getenv("RAG_CHAT_HISTORY", "100"))
+
+
+class ChatHistory:
+    """
+    Chat transcript of one session, capped at max_messages: the oldest
+    messages are dropped, so memory per user stays flat however long the
+    conversation. Every message gets a stable "id", which UI keys should use
+    instead of list positions (those shift when old messages drop out).
+    """
+
+    def __init__(self, max_messages: int = MAX_MESSAGES):
+        self._messages = deque(maxlen=max_messages)
+        self._next_id = 0
+
+    def append(self, role: str, content: str = "", **fields) -> dict:
+        message = {"id": self._next_id, "role": role, "content": content, **fields}
+        self._next_id += 1
+        self._messages.append(message)
+        return message
+
+    def update_last(self, **fields) -> dict:
+        """Update the newest message in place, e.g. while its answer streams in."""
+        self._messages[-1].update(fields)
+        return self._messages[-1]
+
+    def clear(self):
+        self._messages.clear()
+
+    def __iter__(self):
+        return iter(list(self._messages))
+
+    def __len__(self):
+        return len(self._messages)
@@ -1,7 +1,13 @@
+import os
+import sys
 import streamlit as st
-import requests
 import json
 
+# Run from pratice/: make the shared client package importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag_client.client import RAGClient, RAGClientError
+from rag_client.history import ChatHistory
+
 # Set Streamlit config
 st.set_page_config(page_title="RAG Chatbot", layout="centered")
 
@@ -60,6 +66,15 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def get_client():
+    """One pooled client per Streamlit process, shared by every session."""
+    return RAGClient()
+
+
+client = get_client()
+
+
 st.markdown('<div class="title">🤖 RAG Chatbot with JSON Responses</div>', unsafe_allow_html=True)
 
 # Sidebar for PDF upload
@@ -69,14 +84,17 @@ with st.sidebar:
 
     if st.button("Upload & Process") and uploaded_file is not None:
         try:
-            files = {"file": (uploaded_file.name, uploaded_file.getvalue(), "application/pdf")}
-            response = requests.post("http://localhost:8000/upload", files=files)
-
-            if response.status_code == 200:
-                result = response.json()
-                st.success(f"✅ {result['message']}")
+            result = client.upload(uploaded_file.name, uploaded_file.getvalue())
+            st.info(f"📥 {result['message']}")
+            # Ingestion runs in the background; poll the job until it finishes
+            with st.spinner("Processing document..."):
+                job = client.wait_for_job(result)
+            if job.get("status") == "succeeded":
+                st.success(f"✅ {result['filename']} processed ({job['progress']['chunks']} chunks).")
             else:
-                st.error(f"❌ Upload failed: {response.text}")
+                st.error(f"❌ Processing failed: {job.get('error')}")
+        except RAGClientError as e:
+            st.error(f"❌ Upload failed: {str(e)}")
         except Exception as e:
             st.error(f"❌ Error: {str(e)}")
 
@@ -84,17 +102,18 @@ with st.sidebar:
 with st.expander("⚙️ Display Settings"):
     show_raw_json = st.checkbox("Show Raw JSON Response", value=False)
 
-# Initialize chat history
+# Initialize chat history (bounded: the oldest messages drop out)
 if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
+    st.session_state.chat_history = ChatHistory()
 
-# Track which messages have intent shown
+# Track which messages (by id) have intent shown
 if "show_intent_for" not in st.session_state:
     st.session_state.show_intent_for = set()
 
 # Chat messages UI
 st.markdown('<div class="chat-container">', unsafe_allow_html=True)
-for i, msg in enumerate(st.session_state.chat_history):
+for msg in st.session_state.chat_history:
+    i = msg["id"]
     if msg["role"] == "user":
         st.markdown(f'<div class="msg user"><strong>You:</strong> {msg["content"]}</div>', unsafe_allow_html=True)
     else:
@@ -123,7 +142,7 @@ for i, msg in enumerate(st.session_state.chat_history):
                 st.markdown(intent_html, unsafe_allow_html=True)
 
         # Bot message
-        st.markdown(f'<div class="msg bot"><strong>Bot:</strong> {msg["answer"]}</div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="msg bot"><strong>Bot:</strong> {msg["content"]}</div>', unsafe_allow_html=True)
 
         # Show raw JSON if enabled
         if show_raw_json and "raw_response" in msg:
@@ -144,38 +163,28 @@ with st.form(key="chat_form", clear_on_submit=True):
 
 if submitted and user_input.strip():
     # Add user message to history
-    st.session_state.chat_history.append({"role": "user", "content": user_input})
+    st.session_state.chat_history.append("user", user_input)
 
-    # Send request to FastAPI backend
+    # Stream the answer from the FastAPI backend, rendering tokens as they arrive
     try:
-        payload = {"question": user_input}
-        response = requests.post("http://localhost:8000/ask", json=payload)
-
-        if response.status_code == 200:
-            result = response.json()
-            bot_reply = {
-                "role": "bot",
-                "answer": result.get("answer", "No answer returned."),
-                "intent": result.get("intent", {}),
-                "raw_response": result
-            }
-        else:
-            bot_reply = {
-                "role": "bot",
-                "answer": f"Error: {response.status_code} - {response.text}",
-                "intent": {},
-                "raw_response": {}
-            }
+        placeholder = st.empty()
+        answer, result = "", {}
+        for event, data in client.stream(user_input):
+            if event == "token":
+                answer += data["text"]
+                placeholder.markdown(f'<div class="msg bot"><strong>Bot:</strong> {answer}</div>',
+                                     unsafe_allow_html=True)
+            elif event in ("done", "error"):
+                result = data
+        reply = result.get("answer", answer or "No answer returned.")
+        intent = result.get("intent") or {}
+    except RAGClientError as e:
+        reply, intent, result = f"Error: {str(e)}", {}, {}
     except Exception as e:
-        bot_reply = {
-            "role": "bot",
-            "answer": f"API Error: {str(e)}",
-            "intent": {},
-            "raw_response": {}
-        }
+        reply, intent, result = f"API Error: {str(e)}", {}, {}
 
     # Add bot response to history
-    st.session_state.chat_history.append(bot_reply)
+    st.session_state.chat_history.append("bot", reply, intent=intent, raw_response=result)
 
     # Rerun to show new message
     st.rerun()
@@ -193,6 +202,6 @@ st.markdown("""
 
 # Clear chat history button
 if st.button("🗑️ Clear Chat History"):
-    st.session_state.chat_history = []
+    st.session_state.chat_history.clear()
     st.session_state.show_intent_for = set()
     st.rerun()
@@ -0,0 +1,6 @@
+# tests/conftest.py
+import os
+import sys
+
+# The app is imported as `app.*` from the pratice directory, as uvicorn does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,64 @@
+# tests/test_admission.py
+import threading
+
+import pytest
+
+from app.rag.admission import BACKGROUND, INTERACTIVE, PriorityLimiter, QueueFull, QueueTimeout
+
+
+def _limiter(**kwargs):
+    options = dict(limit=1, max_queue=1, queue_timeout=0.05, call_timeout=1.0)
+    options.update(kwargs)
+    return PriorityLimiter("test", **options)
+
+
+def test_full_queue_and_queue_timeout_reject_interactive_callers():
+    limiter = _limiter(max_queue=0)
+    limiter.acquire()
+    with pytest.raises(QueueFull):
+        limiter.acquire()
+
+    limiter = _limiter()
+    limiter.acquire()
+    with pytest.raises(QueueTimeout):
+        limiter.acquire()
+    assert limiter.stats["rejected_queue_timeout"] == 1
+
+
+def test_reserved_slots_stay_free_for_interactive_callers():
+    limiter = _limiter(limit=4, reserve=1)
+    for _ in range(3):
+        limiter.acquire(BACKGROUND)
+    blocked = threading.Thread(target=limiter.acquire, args=(BACKGROUND,))
+    blocked.start()
+    blocked.join(0.05)
+    assert blocked.is_alive()
+
+    limiter.acquire(INTERACTIVE)  # the reserved slot
+    limiter.release()
+    assert blocked.is_alive()
+    limiter.release()  # a background slot frees up
+    blocked.join(1.0)
+    assert not blocked.is_alive()
+
+
+def test_interactive_waiters_go_first():
+    limiter = _limiter(queue_timeout=1.0)
+    limiter.acquire()
+    order = []
+
+    def wait(priority):
+        limiter.acquire(priority)
+        order.append(priority)
+        limiter.release()
+
+    background = threading.Thread(target=wait, args=(BACKGROUND,))
+    background.start()
+    background.join(0.05)
+    interactive = threading.Thread(target=wait, args=(INTERACTIVE,))
+    interactive.start()
+    interactive.join(0.05)
+    limiter.release()
+    background.join(1.0)
+    interactive.join(1.0)
+    assert order == [INTERACTIVE, BACKGROUND]
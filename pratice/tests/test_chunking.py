@@ -0,0 +1,33 @@
+# tests/test_chunking.py
+from app.rag_emb.chunking import PAGE_JOINER, iter_chunks
+from app.rag_emb.extraction import PageText
+
+
+def _pages():
+    return [
+        PageText("cv.pdf", number, " ".join(f"p{number}w{i}" for i in range(120)), 0.0)
+        for number in (1, 2, 3)
+    ]
+
+
+def test_chunks_carry_offsets_and_pages():
+    pages = _pages()
+    text = PAGE_JOINER.join(page.text for page in pages)
+    chunks = list(iter_chunks(iter(pages), chunk_size=300, chunk_overlap=60))
+
+    assert [chunk.metadata["chunk_index"] for chunk in chunks] == list(range(len(chunks)))
+    for chunk in chunks:
+        metadata = chunk.metadata
+        assert len(chunk.page_content) <= 300
+        assert text[metadata["start_offset"]:metadata["end_offset"]] == chunk.page_content
+        assert f"p{metadata['page_start']}w" in chunk.page_content.split()[0]
+        assert f"p{metadata['page_end']}w" in chunk.page_content.split()[-1]
+    # Consecutive chunks overlap, and together they cover the whole text
+    assert all(b.metadata["start_offset"] < a.metadata["end_offset"] for a, b in zip(chunks, chunks[1:]))
+    assert chunks[0].metadata["start_offset"] == 0 and chunks[-1].metadata["end_offset"] == len(text)
+
+
+def test_short_document_is_one_chunk():
+    chunks = list(iter_chunks([PageText("cv.pdf", 1, "  John Doe. Email j@x.io \n", 0.0)]))
+    assert [chunk.page_content for chunk in chunks] == ["John Doe. Email j@x.io"]
+    assert (chunks[0].metadata["start_offset"], chunks[0].metadata["end_offset"]) == (2, 24)
@@ -0,0 +1,42 @@
+# tests/test_context.py
+from langchain_core.documents import Document
+
+from app.rag.context import pack_context
+
+
+def _chunk(text, start, source="cv.pdf"):
+    return Document(page_content=text, metadata={"source": source, "start_offset": start, "end_offset": start + len(text)})
+
+
+def test_short_single_chunk_is_kept():
+    packed = pack_context([(_chunk("John Doe. Email j@x.io", 0), 0.9)], token_budget=100)
+    assert packed.text == "John Doe. Email j@x.io"
+    assert (packed.passages, packed.dropped) == (1, 0)
+
+
+def test_short_chunks_without_overlap_are_kept():
+    results = [(_chunk("Skills: Python", 0), 0.9), (_chunk("Phone: 555", 100), 0.8), (_chunk("Skills: Python", 0, "b.pdf"), 0.7)]
+    packed = pack_context(results, token_budget=100)
+    assert packed.text.split("\n\n") == ["Skills: Python", "Phone: 555", "Skills: Python"]
+
+
+def test_overlap_sliver_is_dropped_and_long_remainder_kept():
+    text = "x" * 100 + " " + "y" * 60
+    first = _chunk(text[:90], 0)
+    sliver = _chunk(text[60:110], 60)  # 20 uncovered characters
+    remainder = _chunk(text[80:], 80)  # 51 uncovered characters
+    packed = pack_context([(first, 0.9), (sliver, 0.8), (remainder, 0.7)], token_budget=1000)
+    assert packed.passages == 2 and packed.dropped == 1
+    assert packed.text.split("\n\n")[1] == text[110:].strip()
+
+
+def test_exact_duplicates_without_offsets_are_dropped():
+    results = [(Document(page_content="same  text"), 0.9), (Document(page_content="same text"), 0.5)]
+    assert pack_context(results, token_budget=100).passages == 1
+
+
+def test_budget_cuts_last_passage_at_word_boundary():
+    results = [(Document(page_content="alpha beta gamma delta epsilon"), 0.9)]
+    packed = pack_context(results, token_budget=4)
+    assert packed.text == "alpha beta"
+    assert packed.tokens <= 4
@@ -0,0 +1,33 @@
+# tests/test_dedup.py
+from app.rag_emb.dedup import DedupIndex
+
+SETTINGS = {"chunker": "test"}
+TEXT = " ".join(f"word{i}" for i in range(80))
+NEAR = TEXT.replace("word40", "other40")
+
+
+def test_exact_copies_match_across_documents(tmp_path):
+    index = DedupIndex(str(tmp_path), SETTINGS)
+    assert index.check_and_add("a-0", TEXT, "doc-a", job="j1") is None
+    index.commit(["a-0"])
+    assert index.check_and_add("b-0", "  " + TEXT.upper(), "doc-b", job="j2") == ("a-0", "exact")
+
+
+def test_near_copies_match_only_within_a_document(tmp_path):
+    index = DedupIndex(str(tmp_path), SETTINGS, near_threshold=0.8)
+    index.check_and_add("a-0", TEXT, "doc-a", job="j1")
+    index.commit(["a-0"])
+    assert index.check_and_add("a-1", NEAR, "doc-a", job="j2") == ("a-0", "near")
+    assert index.check_and_add("b-0", NEAR, "doc-b", job="j2") is None
+
+
+def test_pending_chunks_are_private_until_commit(tmp_path):
+    index = DedupIndex(str(tmp_path), SETTINGS)
+    index.check_and_add("a-0", TEXT, "doc-a", job="j1")
+    assert index.check_and_add("b-0", TEXT, "doc-b", job="j2") is None
+
+    index.rollback("j1")
+    index.commit(["b-0"])
+    assert index.check_and_add("c-0", TEXT, "doc-c", job="j3") == ("b-0", "exact")
+    index.save()
+    assert DedupIndex(str(tmp_path), SETTINGS).check_and_add("d-0", TEXT, "doc-d", job="j4") == ("b-0", "exact")
@@ -0,0 +1,34 @@
+# tests/test_embedding_store.py
+import time
+
+import numpy as np
+
+from app.rag_emb.embedding_store import EmbeddingStore, content_key
+
+
+def test_put_get_and_skip_stored(tmp_path):
+    store = EmbeddingStore(str(tmp_path), "models/test")
+    keys = [content_key("a"), content_key("b")]
+    store.put_many(keys, np.eye(2))
+    store.put_many([keys[0], keys[0]], np.ones((2, 2)))
+    assert len(store) == 2
+    assert store.get_many([keys[0], content_key("c")]) == {keys[0]: [1.0, 0.0]}
+
+
+def test_compact_drops_only_old_unreferenced_rows(tmp_path):
+    store = EmbeddingStore(str(tmp_path), "models/test")
+    old, referenced, recent = content_key("old"), content_key("referenced"), content_key("recent")
+    store.put_many([old, referenced, recent], np.arange(6, dtype=np.float32).reshape(3, 2))
+    with store._file_lock():
+        store._refresh()
+        store._used[:2] = int(time.time()) - 1000
+
+    assert store.compact(500, referenced=lambda: {referenced}) == 1
+    assert len(store) == 2
+    assert store.get_many([old, referenced, recent]) == {referenced: [2.0, 3.0], recent: [4.0, 5.0]}
+    # The referenced row was marked used, so nothing is stale any more
+    assert store.compact(500, referenced=lambda: set()) == 0
+
+    # Another process sees the rewritten columns
+    other = EmbeddingStore(str(tmp_path), "models/test")
+    assert other.get_many([recent]) == {recent: [4.0, 5.0]}
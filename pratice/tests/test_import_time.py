@@ -0,0 +1,13 @@
+# tests/test_import_time.py
+import statistics
+
+from bench.import_time import BUDGET_MS, DEFERRED, MODULE, measure
+
+
+def test_import_stays_within_budget():
+    """The same gate as `python -m bench.import_time`, over three fresh interpreters."""
+    runs = [measure() for _ in range(3)]
+    imported = sorted({root for run in runs for root in run["packages"]} & set(DEFERRED))
+    assert imported == [], f"{MODULE} imports {', '.join(imported)}; load them in the background startup instead"
+    median_ms = statistics.median(run["import_ms"] for run in runs)
+    assert median_ms <= BUDGET_MS, f"median import time {median_ms:.0f} ms is over the {BUDGET_MS:.0f} ms budget"
@@ -0,0 +1,73 @@
+# tests/test_lexical.py
+import sys
+import threading
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.rag_emb.lexical import BM25Index, tokenize
+
+WORDS = "python java kotlin react docker aws sql golang rust scala".split()
+
+
+def _text(i):
+    return " ".join(WORDS[(i * j) % len(WORDS)] for j in range(1, 8)) + f" id{i}"
+
+
+def test_tokenize_keeps_skill_names():
+    assert tokenize("C++, C# and Node.js in the cloud") == ["c++", "c#", "node.js", "cloud"]
+
+
+def test_replace_delete_and_filter(tmp_path):
+    index = BM25Index(str(tmp_path))
+    index.add_documents(["a", "b"], [Document(page_content="python developer"), Document(page_content="java developer")])
+    index.add_documents(["a"], [Document(page_content="kotlin developer", metadata={"source": "x.pdf"})])
+    assert len(index) == 2
+    assert index.search_with_score("python") == []
+    assert [doc.id for doc, _ in index.search_with_score("kotlin", filter={"source": "x.pdf"})] == ["a"]
+
+    index.delete(["b"])
+    assert [doc.id for doc, _ in index.search_with_score("developer", k=5)] == ["a"]
+
+
+def test_search_during_writes(tmp_path):
+    """Searches read one snapshot, so concurrent upserts, deletes and merges never break them."""
+    index = BM25Index(str(tmp_path))
+    index.add_documents([f"c{i}" for i in range(50)], [Document(page_content=_text(i)) for i in range(50)])
+    errors, done = [], threading.Event()
+
+    def write():
+        try:
+            rng = np.random.default_rng(1)
+            for _ in range(60):
+                ids = rng.choice(400, size=20, replace=False)
+                index.add_documents(
+                    [f"c{i}" for i in ids],
+                    [Document(page_content=_text(i), metadata={"page": int(i % 3)}) for i in ids],
+                )
+                index.delete([f"c{i}" for i in rng.choice(400, size=10, replace=False)])
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            done.set()
+
+    def search():
+        try:
+            while not done.is_set():
+                for doc, _ in index.search_with_score("python docker rust", k=5):
+                    assert doc.page_content == _text(int(doc.id[1:]))
+                index.search_with_score("kotlin", k=5, filter={"page": 1})
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=write)] + [threading.Thread(target=search) for _ in range(4)]
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # switch threads often enough to land inside a reload
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert errors == []
@@ -0,0 +1,76 @@
+# tests/test_local_store.py
+import sys
+import threading
+
+import numpy as np
+
+from app.rag_emb.local_store import LocalVectorStore, metadata_matches
+
+
+def _vectors(n, dim=16, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+def test_upsert_replaces_and_delete_removes(tmp_path):
+    store = LocalVectorStore(str(tmp_path))
+    vectors = _vectors(3)
+    store.add_vectors(["a", "b", "c"], vectors, ["A", "B", "C"])
+    store.add_vectors(["a"], vectors[1:2], ["A2"], [{"source": "x.pdf"}])
+    assert len(store) == 3
+
+    hits = store.similarity_search_by_vector_with_score(vectors[1], k=2)
+    assert {doc.id for doc, _ in hits} == {"a", "b"}
+
+    store.delete(["b"])
+    assert len(store) == 2
+    docs = store.similarity_search_by_vector(vectors[1], k=3, filter={"source": "x.pdf"})
+    assert [(doc.id, doc.page_content) for doc in docs] == [("a", "A2")]
+
+
+def test_metadata_matches():
+    metadata = {"source": ["a.pdf", "b.pdf"], "page": 2}
+    assert metadata_matches(metadata, {"source": "b.pdf"})
+    assert metadata_matches(metadata, {"source": {"$in": ["c.pdf", "a.pdf"]}, "page": {"$eq": 2}})
+    assert not metadata_matches(metadata, {"page": 3})
+
+
+def test_search_during_writes(tmp_path):
+    """Searches read one snapshot, so concurrent upserts, deletes and merges never break them."""
+    store = LocalVectorStore(str(tmp_path))
+    vectors = _vectors(400)
+    store.add_vectors([f"c{i}" for i in range(50)], vectors[:50], [f"T{i}" for i in range(50)])
+    errors, done = [], threading.Event()
+
+    def write():
+        try:
+            rng = np.random.default_rng(1)
+            for _ in range(60):
+                ids = rng.choice(400, size=20, replace=False)
+                store.add_vectors([f"c{i}" for i in ids], vectors[ids], [f"T{i}" for i in ids],
+                                  [{"page": int(i % 3)} for i in ids])
+                store.delete([f"c{i}" for i in rng.choice(400, size=10, replace=False)])
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            done.set()
+
+    def search():
+        try:
+            while not done.is_set():
+                for docs in store.search_batch_with_score(vectors[:4], k=5):
+                    assert all(doc.page_content == f"T{doc.id[1:]}" for doc, _ in docs)
+                store.similarity_search_by_vector(vectors[5], k=5, filter={"page": 1})
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=write)] + [threading.Thread(target=search) for _ in range(4)]
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # switch threads often enough to land inside a reload
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert errors == []